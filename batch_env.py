@@ -0,0 +1,474 @@
+import numpy as np
+
+from heat import phase_table
+from model import Model, GameEvent
+
+"""batch_env.py: Steps many independent games at once with their state held in stacked NumPy arrays.
+
+Each game follows the rules of Model.update (march, last stand, death countdown, weapon heat, power boxes) and the
+scene flow SpaceWindow drives on top of it (next level, restart after a lost life, game over). It diverges from Model
+in these ways, so runs agree with Model statistically rather than frame for frame (tests/test_batch_env.py compares
+the score and survival distributions of the two over a few hundred seeds):
+- movement is held-key style: each step's action sets the player's direction, where Model tracks key presses and
+  releases
+- power boxes are removed once off the bottom of the screen; Model never removes a box that wasn't collected
+- every alien slot rolls to fire each march, dead aliens included, before the alive mask is applied, so the random
+  stream advances by the whole formation where Model rolls once per live alien
+- each game draws from its own splitmix stream rather than Python's random, so a seed doesn't give Model's game,
+  but it gives the same game whatever batch it is stepped in
+- bullets and power boxes live in fixed-capacity slots and surplus shots are dropped
+- the list-mutation ordering quirks of the object model are not reproduced"""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+# Action bits, combine with |.
+NOOP, LEFT, RIGHT, FIRE_Q, FIRE_W = 0, 1, 2, 4, 8
+
+EVENT_INDEX = {ev: i for i, ev in enumerate(GameEvent.EventType)}
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _splitmix(z):
+    z = (z ^ (z >> np.uint64(30))) * _MIX_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    return z ^ (z >> np.uint64(31))
+
+
+class BatchEnv:
+    W, H = Model.MODEL_WIDTH, Model.MODEL_HEIGHT
+    ALIEN_W, ALIEN_H = Model.ALIEN_WIDTH, Model.ALIEN_HEIGHT
+    MARCH_STEP = Model.MODEL_WIDTH / 40
+    DEATH_TIME = 3  # seconds, as passed to Model.real_timer
+    START_LIVES = Model.START_LIVES
+
+    def __init__(self, n, seed=0, difficulty=0, bullet_capacity=24, box_capacity=16, auto_reset=True,
+                 dt=1 / 60, tick_speed=25, alien_shoot_chance=0.1, power_box_spawn_chance=0.15, alien_bullet_max=3,
+                 overheat_threshold=Model.OVERHEAT_THRESHOLD, countdown=1000, overheat_constant=60, overheat_base=2,
+                 bullet_max=6):
+        self.n = n
+        self.auto_reset = auto_reset
+        self.tick_speed = tick_speed
+        self.alien_shoot_chance = alien_shoot_chance
+        self.power_box_spawn_chance = power_box_spawn_chance
+        self.overheat_threshold = overheat_threshold
+        self.countdown = countdown
+        self.overheat_constant = overheat_constant
+        self.overheat_base = overheat_base
+        self.death_ticks = int(round(self.DEATH_TIME / dt))
+        self.heat_phases = np.array(phase_table(countdown, overheat_constant, overheat_base, bullet_max))
+        self.bullet_height = Model.MODEL_HEIGHT / 19
+        self.player_bullet_dy = Model.PLAYER_BULLET_SPEED * self.H
+
+        positions, box_start, box_end = Model.formation_layout()
+        self.spawn_x = np.array([p[0] for p in positions])
+        self.spawn_y = np.array([p[1] for p in positions])
+        self.spawn_box = (box_start, box_end)
+        a = len(positions)
+        # The block is a regular grid, so a point maps straight to the one alien slot that could contain it.
+        self.columns = int((self.spawn_y == self.spawn_y[0]).sum())
+        self.rows = a // self.columns
+        self.column_step = self.ALIEN_W * 1.5
+        self.row_step = self.ALIEN_H * 1.3
+        self.row_y = self.spawn_y[::self.columns]
+
+        self.player_w, self.player_h = self.ALIEN_W, self.ALIEN_H
+        self.player_y = self.W / 20
+        self.gun_x = np.array([self.player_w / 32, self.player_w / 1.04065])
+        self.gun_y = self.player_h / 1.6
+
+        f8, b1, i8 = np.float64, np.bool_, np.int64
+        self.rng_state = np.zeros(n, np.uint64)
+        self.seeds = np.zeros(n, np.uint64)
+        self.episodes = np.zeros(n, i8)
+
+        self.points = np.zeros(n, i8)
+        self.difficulty = np.zeros(n, i8)
+        self.lives = np.zeros(n, i8)
+        self.done = np.zeros(n, b1)
+        self.tick = np.zeros(n, i8)
+        self.frames = np.zeros(n, i8)  # ticks played this episode
+
+        self.player_x = np.zeros(n, f8)
+        self.player_dx = np.zeros(n, f8)
+        self.blown = np.zeros(n, b1)
+        self.double_blown = np.zeros(n, b1)
+        self.active = np.zeros(n, b1)
+        self.input = np.zeros(n, b1)
+        self.counting = np.zeros(n, b1)  # False once Model.aliens has been set to "-"
+        self.death_timer = np.zeros(n, i8)  # -1 while not counting down
+
+        self.formation_x = np.zeros(n, f8)  # the whole block moves together, aliens sit at spawn + formation
+        self.formation_y = np.zeros(n, f8)
+        self.alien_alive = np.zeros((n, a), b1)
+        self.aliens = np.zeros(n, i8)
+        self.box_start = np.zeros(n, f8)
+        self.box_end = np.zeros(n, f8)
+        self.move_right = np.zeros(n, b1)
+        self.alien_bullet_dy = np.zeros(n, f8)
+
+        self.bullet_x = np.zeros((n, bullet_capacity), f8)
+        self.bullet_y = np.zeros((n, bullet_capacity), f8)
+        self.bullet_alive = np.zeros((n, bullet_capacity), b1)
+        self.alien_bullet_x = np.zeros((n, alien_bullet_max), f8)
+        self.alien_bullet_y = np.zeros((n, alien_bullet_max), f8)
+        self.alien_bullet_alive = np.zeros((n, alien_bullet_max), b1)
+        self.pickup_x = np.zeros((n, box_capacity), f8)
+        self.pickup_y = np.zeros((n, box_capacity), f8)
+        self.pickup_alive = np.zeros((n, box_capacity), b1)
+
+        # Weapon heat, column 0 is the Q gun and column 1 the W gun.
+        self.gun_countdown = np.zeros((n, 2), f8)
+        self.overheat_variable = np.zeros((n, 2), f8)
+        self.heat_phase = np.zeros((n, 2), i8)
+        self.jam = np.zeros((n, 2), b1)
+
+        self.step_events = np.zeros((n, len(EVENT_INDEX)), i8)
+        self.episode_events = np.zeros((n, len(EVENT_INDEX)), i8)
+        self.dropped_shots = 0
+
+        seeds = seed + np.arange(n) if np.isscalar(seed) else seed
+        self.reset(seeds=seeds, difficulty=difficulty)
+
+    def uniform(self, games, cols):
+        """(len(games), cols) draws in [0, 1). Each game has its own splitmix64 stream that only advances when that
+        game draws, so a game replays identically from its seed whatever else shares the batch."""
+        z = _splitmix(self.rng_state[games, None] + _GOLDEN * np.arange(1, cols + 1, dtype=np.uint64))
+        self.rng_state[games] += np.uint64(int(_GOLDEN) * int(cols) & 0xFFFFFFFFFFFFFFFF)
+        return (z >> np.uint64(11)) * (1.0 / (1 << 53))
+
+    def uniform_each(self, games):
+        """One draw per entry of a sorted index array, repeats taking successive draws from that game's stream."""
+        owners, first, counts = np.unique(games, return_index=True, return_counts=True)
+        nth = np.arange(1, len(games) + 1) - np.repeat(first, counts)
+        z = _splitmix(self.rng_state[games] + _GOLDEN * nth.astype(np.uint64))
+        self.rng_state[owners] += _GOLDEN * counts.astype(np.uint64)
+        return (z >> np.uint64(11)) * (1.0 / (1 << 53))
+
+    def reset(self, games=None, seeds=None, difficulty=0):
+        """Starts fresh games (all of them by default). Without seeds each game derives one from its own stream."""
+        games = np.arange(self.n) if games is None else np.asarray(games)
+        if seeds is None:
+            seeds = _splitmix(self.rng_state[games] ^ self.seeds[games])
+        self.seeds[games] = np.asarray(seeds, dtype=np.uint64)
+        self.rng_state[games] = self.seeds[games]
+        self.episodes[games] += 1
+        self.points[games] = 0
+        self.lives[games] = self.START_LIVES
+        self.done[games] = False
+        self.frames[games] = 0
+        self.episode_events[games] = 0
+        self.reset_level(games, difficulty)
+        return games
+
+    def reset_level(self, games, difficulty):
+        """What building a new Model(points, difficulty) does for the given games."""
+        self.difficulty[games] = difficulty
+        self.tick[games] = 1
+        self.player_x[games] = self.W / 2
+        self.player_dx[games] = 0
+        self.blown[games] = False
+        self.double_blown[games] = False
+        self.active[games] = True
+        self.input[games] = True
+        self.counting[games] = True
+        self.death_timer[games] = -1
+        self.formation_x[games] = 0
+        self.formation_y[games] = 0
+        self.alien_alive[games] = True
+        self.aliens[games] = len(self.spawn_x)
+        self.box_start[games], self.box_end[games] = self.spawn_box
+        self.move_right[games] = True
+        self.alien_bullet_dy[games] = (Model.BASE_ALIEN_BULLET_SPEED + self.difficulty[games] *
+                                       Model.DELTA_BULLET_SPEED_ON_DIFF) * self.H
+        self.bullet_alive[games] = False
+        self.alien_bullet_alive[games] = False
+        self.pickup_alive[games] = False
+        self.gun_countdown[games] = self.countdown
+        self.overheat_variable[games] = self.overheat_base
+        self.heat_phase[games] = 0
+        self.jam[games] = False
+
+    @property
+    def alien_x(self):
+        return self.spawn_x + self.formation_x[:, None]
+
+    @property
+    def alien_y(self):
+        return self.spawn_y + self.formation_y[:, None]
+
+    def lowest_alien_y(self):
+        """Bottom edge y of each game's lowest surviving row, +inf when the block is empty."""
+        row_alive = self.alien_alive.reshape(self.n, self.rows, self.columns).any(axis=2)
+        lowest = self.rows - 1 - np.argmax(row_alive[:, ::-1], axis=1)
+        return np.where(row_alive.any(axis=1), self.row_y[lowest] + self.formation_y, np.inf)
+
+    def emit(self, event_type, games, count=1):
+        """Counts an event for the games picked by a mask or index array."""
+        self.step_events[games, EVENT_INDEX[event_type]] += count
+
+    def emit_counts(self, event_type, counts):
+        self.step_events[:, EVENT_INDEX[event_type]] += counts
+
+    @staticmethod
+    def fill_slots(slot_alive, slot_x, slot_y, games, want, want_x, want_y):
+        """Places spawns wanted by the listed games, in column order, into each game's free slots.
+
+        want, want_x and want_y are (len(games), k). Returns the mask of those placed."""
+        rank = np.cumsum(want, axis=1) - 1
+        free = (~slot_alive[games]).sum(axis=1)
+        take = want & (rank < free[:, None])
+        rows, cols = np.nonzero(take)
+        if len(rows):
+            owners = games[rows]
+            free_order = np.argsort(slot_alive[owners], axis=1, kind='stable')  # free slots first, in index order
+            slots = free_order[np.arange(len(rows)), rank[rows, cols]]
+            slot_alive[owners, slots] = True
+            slot_x[owners, slots] = want_x[rows, cols]
+            slot_y[owners, slots] = want_y[rows, cols]
+        return take
+
+    def step(self, actions):
+        """Applies one action per game (bits of LEFT, RIGHT, FIRE_Q, FIRE_W) then advances one tick.
+
+        Returns (rewards, dones): points gained this step and which games ended. With auto_reset, ended games
+        restart straight away, read final scores from the returned rewards or episode arrays before the next step."""
+        actions = np.asarray(actions)
+        start_points = self.points.copy()
+        self.step_events[:] = 0
+        live = ~self.done
+
+        self.apply_actions(actions, live)
+        next_level, restart, game_over = self.update(live)
+
+        self.frames += live
+        self.episode_events += self.step_events
+        rewards = self.points - start_points
+        if next_level.any():
+            self.reset_level(np.nonzero(next_level)[0], self.difficulty[next_level] + 1)
+        if restart.any():
+            self.reset_level(np.nonzero(restart)[0], 0)
+        self.done |= game_over
+        dones = game_over
+        if self.auto_reset and dones.any():
+            self.reset(np.nonzero(dones)[0])
+        return rewards, dones
+
+    def apply_actions(self, actions, live):
+        can_act = live & self.input
+        move = ((actions & RIGHT) > 0).astype(np.float64) - ((actions & LEFT) > 0)
+        self.player_dx = np.where(can_act, move * Model.PLAYER_SPEED, self.player_dx)
+
+        for gun, bit in enumerate((FIRE_Q, FIRE_W)):
+            fire = can_act & ((actions & bit) > 0)
+            countdown = self.gun_countdown[:, gun]
+            variable = self.overheat_variable[:, gun]
+            jammed = fire & self.jam[:, gun]
+            hot = fire & ~self.jam[:, gun] & (countdown > 0)
+            cold = fire & ~self.jam[:, gun] & (countdown <= 0)
+            if gun == 0:
+                self.emit(GameEvent.EventType.GUN_JAM, jammed)  # only the Q gun reports jams
+            self.jam[:, gun] &= ~(jammed & (countdown <= 0))
+
+            added = np.where(variable == self.overheat_base, self.countdown, 0) + self.overheat_constant / variable
+            countdown += np.where(hot, added, 0)
+            variable += hot
+            limit = self.overheat_base + self.overheat_threshold + Model.LAST_STAND_THREASHOLD_RISE * self.blown
+            self.jam[:, gun] |= hot & (variable >= limit)
+
+            shooters = np.nonzero(hot | cold)[0]
+            if len(shooters):
+                self.emit(GameEvent.EventType.PLAYER_FIRE, shooters)
+                placed = self.fill_slots(self.bullet_alive, self.bullet_x, self.bullet_y, shooters,
+                                         np.ones((len(shooters), 1), np.bool_),
+                                         self.player_x[shooters, None] + self.gun_x[gun],
+                                         np.full((len(shooters), 1), self.player_y + self.gun_y))
+                self.dropped_shots += int((~placed).sum())
+
+    def update(self, live):
+        self.player_death_check(live)
+        next_level, restart, game_over = self.screen_change(live)
+
+        march_tick = live & (self.tick % self.tick_speed == 0)
+        self.tick[march_tick] = 0
+        self.alien_update(np.nonzero(march_tick & ~self.blown)[0])
+        last_stand = np.nonzero(march_tick & self.blown & ~self.double_blown & (self.aliens > 0) & self.active)[0]
+        self.emit(GameEvent.EventType.EXPLOSION, last_stand)
+        self.alien_ending(last_stand, shoot=True)
+
+        self.position_update_central(live)
+        return next_level, restart, game_over
+
+    def hits_player(self, x, y, w, h):
+        px, py = self.player_x[:, None], self.player_y
+        pw, ph = self.player_w, self.player_h
+        in_x = ((px <= x) & (x <= px + pw)) | ((px <= x + w) & (x + w <= px + pw))
+        in_y = ((py <= y) & (y <= py + ph)) | ((py <= y + h) & (y + h <= py + ph))
+        return in_x & in_y
+
+    def player_death_check(self, live):
+        near = live & (self.lowest_alien_y() <= self.player_y + self.player_h)
+        if not near.any():
+            return
+        alive = self.alien_alive & near[:, None]
+        touching = self.hits_player(self.alien_x, self.alien_y, self.ALIEN_W, self.ALIEN_H) & \
+            (self.alien_y <= self.player_y + self.player_h)
+        dead = ((alive & (self.alien_y <= 0)) | (alive & touching)).any(axis=1)
+        self.blown |= dead
+        self.double_blown |= dead
+
+    def screen_change(self, live):
+        dying = live & self.double_blown
+        self.death_timer[dying & (self.death_timer < 0)] = self.death_ticks
+        expired = dying & (self.death_timer == 0)
+        counting_down = dying & (self.death_timer > 0)
+        self.death_timer[counting_down] -= 1
+
+        crumble = counting_down & (self.tick % 10 == 0)
+        first = crumble & self.input
+        self.active[first] = False
+        self.counting[first] = False
+        self.emit(GameEvent.EventType.PLAYER_DEATH, first)
+        self.input[crumble] = False
+        self.player_dx[crumble] = 0
+        self.alien_ending(np.nonzero(crumble)[0], shoot=False)
+
+        self.lives -= expired
+        self.emit(GameEvent.EventType.LIFE_LOST, expired)
+        game_over = expired & (self.lives <= 0)
+        self.emit(GameEvent.EventType.GAME_OVER, game_over)
+        restart = expired & ~game_over
+        self.emit(GameEvent.EventType.RESET_SCREEN, restart)
+
+        next_level = live & ~self.double_blown & self.active & self.counting & (self.aliens <= 0)
+        self.emit(GameEvent.EventType.NEXT_LEVEL, next_level)
+        return next_level, restart, game_over
+
+    def alien_shoot(self, games):
+        """One shot roll per alien, taken in formation order until the alien bullet slots are full."""
+        rolls = self.uniform(games, self.alien_alive.shape[1])
+        alien_x = self.spawn_x + self.formation_x[games, None]
+        alien_y = self.spawn_y + self.formation_y[games, None]
+        want = self.alien_alive[games] & (rolls <= self.alien_shoot_chance) & (alien_y >= self.H / 3)
+        fired = self.fill_slots(self.alien_bullet_alive, self.alien_bullet_x, self.alien_bullet_y, games, want,
+                                alien_x + self.ALIEN_W / 2, alien_y + self.ALIEN_H / 2)
+        self.emit(GameEvent.EventType.ALIEN_1_FIRE, games, fired.sum(axis=1))
+
+    def alien_update(self, games):
+        if not len(games):
+            return
+        right = self.move_right[games]
+        step = np.where(right, self.MARCH_STEP, -self.MARCH_STEP)
+        self.box_start[games] += step
+        self.box_end[games] += step
+        drop_right = right & (self.box_end[games] >= self.W - Model.ALIEN_X_OFF)
+        drop_left = ~right & (self.box_start[games] <= Model.ALIEN_X_OFF)
+        drop = drop_right | drop_left
+
+        self.formation_x[games] += np.where(drop, 0, step)
+        self.formation_y[games] += np.where(drop_right, -self.ALIEN_H / 2, 0) + np.where(drop_left, -self.ALIEN_H, 0)
+        self.move_right[games] = right ^ drop
+        self.alien_shoot(games)
+
+    def alien_ending(self, games, shoot):
+        if not len(games):
+            return
+        if shoot:
+            self.alien_shoot(games)
+        alien_y = self.spawn_y + self.formation_y[games, None]
+        gone = self.alien_alive[games] & (alien_y + self.ALIEN_H < 0)
+        self.alien_alive[games] &= ~gone
+        self.aliens[games] -= np.where(self.double_blown[games], 0, gone.sum(axis=1))
+        self.formation_y[games] -= self.H / 20
+
+    def position_update_central(self, live):
+        np.clip(self.player_dx, -Model.PLAYER_SPEED, Model.PLAYER_SPEED, out=self.player_dx)
+        at_left = (self.player_x <= 0) & (self.player_dx < 0)
+        at_right = (self.player_x + self.player_w >= self.W) & (self.player_dx > 0)
+        self.player_dx[at_left | at_right] = 0
+        self.player_x += np.where(live, self.player_dx, 0)
+
+        self.power_box_update(live)
+        self.bullet_update(live)
+        self.alien_bullet_update(live)
+        self.overheat_variable_logic(live)
+        self.timekeeper(live)
+
+    def power_box_update(self, live):
+        boxes = self.pickup_alive & live[:, None]
+        self.pickup_y -= np.where(boxes, 3, 0)
+        size_w, size_h = self.ALIEN_W * 0.5, self.ALIEN_H * 0.5
+        collected = boxes & self.hits_player(self.pickup_x, self.pickup_y, size_w, size_h)
+        self.pickup_alive &= ~collected & ~(self.pickup_y + size_h < 0)
+        count = collected.sum(axis=1)
+        self.points += 500 * count
+        self.emit_counts(GameEvent.EventType.POWER_UP_COLLECT, count)
+
+    def bullet_update(self, live):
+        bullets = self.bullet_alive & live[:, None]
+        self.bullet_y += np.where(bullets, self.player_bullet_dy, 0)
+        self.bullet_alive &= ~(bullets & (self.bullet_y >= self.H))
+
+        # Each bullet tip, taken relative to its game's formation, indexes the only alien slot it could be in.
+        games, slots = np.nonzero(self.bullet_alive & live[:, None])
+        if not len(games):
+            return
+        tip_x = self.bullet_x[games, slots] - self.formation_x[games]
+        tip_y = self.bullet_y[games, slots] + self.bullet_height - self.formation_y[games]
+        col = np.floor((tip_x - self.spawn_x[0]) / self.column_step).astype(np.int64)
+        row = np.ceil((self.spawn_y[0] - tip_y) / self.row_step).astype(np.int64)
+        inside = (col >= 0) & (col < self.columns) & (row >= 0) & (row < self.rows)
+        games, slots, tip_x, tip_y = games[inside], slots[inside], tip_x[inside], tip_y[inside]
+        aliens = row[inside] * self.columns + col[inside]
+        ax, ay = self.spawn_x[aliens], self.spawn_y[aliens]
+        hit = self.alien_alive[games, aliens] & (ax <= tip_x) & (tip_x <= ax + self.ALIEN_W) & \
+            (ay <= tip_y) & (tip_y <= ay + self.ALIEN_H)
+        games, slots, aliens = games[hit], slots[hit], aliens[hit]
+        if not len(games):
+            return
+        _, first = np.unique(games * self.alien_alive.shape[1] + aliens, return_index=True)  # lower slot wins
+        games, slots, aliens = games[first], slots[first], aliens[first]
+        self.bullet_alive[games, slots] = False
+        self.alien_alive[games, aliens] = False
+        kills = np.bincount(games, minlength=self.n)
+        self.points += 100 * kills
+        self.aliens -= np.where(self.double_blown, 0, kills)
+        self.emit_counts(GameEvent.EventType.ALIEN_DEATH, kills)
+
+        drop = self.uniform_each(games) < self.power_box_spawn_chance
+        games, aliens = games[drop], aliens[drop]
+        if len(games):
+            self.fill_slots(self.pickup_alive, self.pickup_x, self.pickup_y, games, np.ones((len(games), 1), np.bool_),
+                            (self.spawn_x[aliens] + self.formation_x[games] + self.ALIEN_W * 0.25)[:, None],
+                            (self.spawn_y[aliens] + self.formation_y[games] + self.ALIEN_H * 0.25)[:, None])
+
+    def alien_bullet_update(self, live):
+        bullets = self.alien_bullet_alive & live[:, None]
+        self.alien_bullet_y -= np.where(bullets, self.alien_bullet_dy[:, None], 0)
+        x, y = self.alien_bullet_x, self.alien_bullet_y
+        hit = bullets & (self.player_x[:, None] <= x) & (x <= self.player_x[:, None] + self.player_w) & \
+            (self.player_y <= y) & (y <= self.player_y + self.player_h)
+        self.alien_bullet_alive &= ~(hit | (bullets & (y <= 0)))
+        hits = hit.sum(axis=1)
+        self.double_blown |= (hits > 0) & self.blown | (hits > 1)
+        self.blown |= hits > 0
+
+    def overheat_variable_logic(self, live):
+        phase = np.searchsorted(self.heat_phases, self.gun_countdown, side='left') - 1
+        change = live[:, None] & (phase >= 0) & (phase < len(self.heat_phases) - 1) & (phase != self.heat_phase)
+        self.overheat_variable[change] = phase[change] + self.overheat_base
+        self.heat_phase[change] = phase[change]
+
+    def timekeeper(self, live):
+        live = live[:, None]
+        cooling = live & (self.gun_countdown > 0)
+        recovered = live & ~cooling
+        self.gun_countdown -= np.where(cooling, Model.HEAT_RECOVERY_RATE, 0)
+        self.gun_countdown[recovered] = self.countdown
+        self.jam &= ~recovered
+        self.tick += live[:, 0]
@@ -0,0 +1,615 @@
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pyglet
+
+pyglet.options['shadow_window'] = False  # view's effects are measured without a display
+
+import view
+from controls import Key, KEY_PRESS, KEY_RELEASE
+from db_adapter import DataBaseAdapter, MemoryDataBaseAdapter
+from env import SpaceCloneEnv, N_ACTIONS
+from headless import RandomInput
+from stats import RunStats
+from model import Model, Alien, Box, GameEvent, BulletArray, EventQueue, Swarm
+from particles import ParticleSystem
+from view import SpaceWindow, FadingPoints
+
+"""bench.py: Benchmarks for the model and the view's CPU side, and a regression gate over them.
+
+The suite times each case a few rounds, keeps the best round, writes the results as JSON and, given a baseline from
+an earlier run, exits non-zero if any case got worse than the tolerance allows. A baseline that can't be read fails
+the run before it starts, and baseline cases the run didn't cover are listed as missing. Particles are timed up to
+the vertex data they write, so no display or GL context is needed.
+
+Usage: python bench.py suite [--out bench_results.json] [--baseline baseline.json] [--tolerance 0.1] [--only model]
+       python bench.py snapshot [--games 20] [--repeat 200]
+       python bench.py memory [--games 20] [--repeat 10000]
+       python bench.py events [--games 56] [--repeat 20000]"""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+def sample_models(games, ticks_apart=150, seed=0):
+    """Mid-game models from seeded random play, a few snapshots' worth of ticks apart."""
+    models = []
+    for g in range(games):
+        model = Model(0, g % 3, db_adapter=MemoryDataBaseAdapter(), seed=seed + g)
+        inputs = RandomInput(seed + g, fire_chance=0.2)
+        for tick in range(ticks_apart * (1 + g % 4)):
+            for key_val, action_type in inputs.poll(tick, model):
+                model.action(key_val, action_type)
+            model.update(1 / 60)
+            model.events.clear()
+        models.append(model)
+    return models
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_snapshot(games=20, repeat=200, check_ticks=300):
+    """Times snapshot() and restore() against deepcopy, and checks a restored model replays identically."""
+    models = sample_models(games)
+    snap_us = restore_us = deepcopy_us = size = 0
+    target = Model(db_adapter=MemoryDataBaseAdapter(), seed=0)
+    for model in models:
+        blob = model.snapshot()
+        size += len(blob)
+        snap_us += per_call_us(model.snapshot, repeat)
+        restore_us += per_call_us(lambda: target.restore(blob), repeat)
+        deepcopy_us += per_call_us(lambda: copy.deepcopy(model), max(1, repeat // 20))
+
+        # Round trip: the restored copy must pack to the same bytes and play on exactly like the original.
+        twin = Model(db_adapter=MemoryDataBaseAdapter(), seed=0)
+        twin.restore(blob)
+        assert twin.snapshot() == blob, 'restore() did not reproduce the snapshot'
+        for _ in range(check_ticks):
+            model.update(1 / 60)
+        expected = model.snapshot()
+        twin.restore(blob)
+        for _ in range(check_ticks):
+            twin.update(1 / 60)
+        assert twin.snapshot() == expected, 'restored model diverged from the original'
+    return {'snapshot_us': snap_us / games, 'restore_us': restore_us / games, 'deepcopy_us': deepcopy_us / games,
+            'bytes': size / games}
+
+
+def bytes_per(make, n):
+    """Traced bytes each of n objects from make(i) keeps alive, not counting the list holding them."""
+    gc.collect()
+    tracemalloc.start()
+    keep = [make(i) for i in range(n)]
+    used = tracemalloc.get_traced_memory()[0] - sys.getsizeof(keep)
+    tracemalloc.stop()
+    del keep
+    return used / n
+
+
+def bytes_per_bullet(n):
+    gc.collect()
+    tracemalloc.start()
+    bullets = BulletArray()
+    for i in range(n):
+        bullets.append(i * 0.5, i * 0.25)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used / n
+
+
+class GcCounter:
+    """Counts garbage collector runs by generation while active."""
+
+    def __init__(self):
+        self.runs = [0, 0, 0]
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self.runs[info['generation']] += 1
+
+    def __enter__(self):
+        gc.collect()
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        gc.callbacks.remove(self)
+
+
+def explosion_scene(ticks, rand):
+    """The view's particle traffic in a heavy scene: an alien kill (15 pixel spills and a points label) every 4 ticks
+    and a ship explosion (80 falling blocks) every 60, through SpaceWindow's own trigger and update methods."""
+    stub = ViewStub()
+    for tick in range(ticks):
+        stub.tick = tick
+        if tick % 4 == 0:
+            x, y = rand.randint(0, 1600), rand.randint(300, 700)
+            SpaceWindow.trigger_pixel_spill(stub, x, y, SpaceWindow.FLAME_COLOURS, 1, 1)
+            SpaceWindow.trigger_pts_lbl(stub, '100', x, y)
+        if tick % 60 == 0:
+            SpaceWindow.trigger_falling_parts(stub, 800, 400, SpaceWindow.DEBRIS_COLOUR, 10)
+        SpaceWindow.update_particles(stub)
+
+
+def bench_memory(games=20, repeat=10000):
+    """Bytes per entity, then peak traced memory and garbage collector runs while the model plays 1000 ticks of
+    each of `games` games, and over as many ticks of a heavy explosion scene."""
+    result = {
+        'alien_bytes': bytes_per(lambda i: Alien(i, i, 32, 40, "alien.png"), repeat),
+        'box_bytes': bytes_per(lambda i: Box(i, i, 16, 20, "pickup.png", Box.BoxType.SHOOT_FAST), repeat),
+        'event_bytes': bytes_per(lambda i: GameEvent(GameEvent.EventType.ALIEN_DEATH, (i, i), args=[100]), repeat),
+        'bullet_bytes': bytes_per_bullet(repeat),
+        'particle_bytes': ParticleSystem(repeat).nbytes / repeat,
+        'fading_points_bytes': bytes_per(lambda i: FadingPoints('100', i, i), repeat),
+    }
+
+    ticks = 1000 * games
+    with GcCounter() as counter:
+        tracemalloc.start()
+        for g in range(games):
+            sample_models(1, ticks_apart=1000, seed=g)
+        result['model_peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    result['model_gc_runs_per_1000_ticks'] = sum(counter.runs) / ticks * 1000
+
+    with GcCounter() as counter:
+        tracemalloc.start()
+        explosion_scene(ticks, random.Random(0))
+        result['scene_peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    result['scene_gc_runs_per_1000_ticks'] = sum(counter.runs) / ticks * 1000
+    return result
+
+
+def bench_events(games=56, repeat=20000):
+    """Emits a burst of `games` alien deaths plus a shot and an alien shot per frame, drains it, `repeat` times.
+    Compares the pooled EventQueue with the old list of fresh GameEvents, then counts what a burst too large for
+    one channel drops."""
+    death, fire, alien_fire = (GameEvent.EventType.ALIEN_DEATH, GameEvent.EventType.PLAYER_FIRE,
+                               GameEvent.EventType.ALIEN_1_FIRE)
+    burst = min(games, Model.EVENT_CAPACITY)
+    queue = EventQueue(Model.EVENT_CAPACITY)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(burst):
+            queue.emit(death, (i, i), args=[100])
+        queue.emit(fire, sound="laser1.mp3")
+        queue.emit(alien_fire, sound="bomb1.mp3")
+        for ev in queue.drain():
+            pass
+    pooled = (time.perf_counter() - start) / repeat / (burst + 2)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        events = [GameEvent(death, (i, i), args=[100]) for i in range(burst)]
+        events.append(GameEvent(fire, sound="laser1.mp3"))
+        events.append(GameEvent(alien_fire, sound="bomb1.mp3"))
+        for ev in events:
+            pass
+    listed = (time.perf_counter() - start) / repeat / (burst + 2)
+
+    overfull = EventQueue(Model.EVENT_CAPACITY)
+    for i in range(Model.EVENT_CAPACITY * 2):
+        overfull.emit(death, (i, i))
+    return {'pooled_events_per_s': 1 / pooled, 'list_events_per_s': 1 / listed,
+            'overflow_of_2x_burst': overfull.overflows}
+
+
+BENCHMARKS = {'snapshot': bench_snapshot, 'memory': bench_memory, 'events': bench_events}
+
+
+def best_of(rounds, fn):
+    """Fastest of `rounds` calls of fn, which times its own work and returns seconds."""
+    return min(fn() for _ in range(rounds))
+
+
+def set_formation_size(model, aliens):
+    """Keeps the first `aliens` aliens, top row first."""
+    for mob in model.objects[aliens:]:
+        model.alien_grid.remove(mob)
+    del model.objects[aliens:]
+    model.aliens = len(model.objects)
+
+
+def case_model_update(aliens, bullets, ticks=600):
+    """Model.update with `aliens` in the formation and the player's bullets topped up to `bullets` every tick."""
+    model = Model(0, 0, db_adapter=MemoryDataBaseAdapter(), seed=1)
+    model.bullet_max = max(model.bullet_max, bullets)
+    set_formation_size(model, aliens)
+    start = model.snapshot()
+
+    def run():
+        model.restore(start)
+        rand = random.Random(2)
+        begin = time.perf_counter()
+        for _ in range(ticks):
+            while len(model.bullets) < bullets:
+                model.bullets.append(rand.uniform(0, Model.MODEL_WIDTH), model.player.y)
+            model.update(1 / 60)
+            model.events.clear()
+        return time.perf_counter() - begin
+    return ticks / best_of(7, run)
+
+
+def case_swarm_update(spec, ticks=120):
+    """Model.update in swarm mode, alien bullets capped at 100 and the player firing both guns every tick."""
+    model = Model(0, 0, db_adapter=MemoryDataBaseAdapter(), seed=1, swarm=Swarm.from_spec(spec))
+    start = model.snapshot()
+
+    def run():
+        model.restore(start)
+        begin = time.perf_counter()
+        for _ in range(ticks):
+            model.fire_bullet(model.player.x, model.player.y)
+            model.update(1 / 60)
+            model.events.clear()
+        return time.perf_counter() - begin
+    return ticks / best_of(5, run)
+
+
+def case_env_step(steps=3000, frame_skip=4):
+    """SpaceCloneEnv.step with random actions, resetting on game over."""
+    environment = SpaceCloneEnv(frame_skip, seed=1)
+    actions = random.Random(2).choices(range(N_ACTIONS), k=steps)
+
+    def run():
+        environment.reset(1)
+        begin = time.perf_counter()
+        for action in actions:
+            if environment.step(action)[2]:
+                environment.reset()
+        return time.perf_counter() - begin
+    return steps / best_of(5, run)
+
+
+def cool_guns(model):
+    model.heat.reset()
+    model.bullets.clear()
+    model.events.clear()
+
+
+def case_model_fire(shots=20000):
+    """Model.action firing presses (with their releases), guns cooled every four shots so none of them jam."""
+    model = Model(0, 0, db_adapter=MemoryDataBaseAdapter(), seed=1)
+
+    def run():
+        begin = time.perf_counter()
+        for i in range(shots):
+            gun = Key.Q if i & 1 else Key.W
+            model.action(gun, KEY_PRESS)
+            model.action(gun, KEY_RELEASE)
+            if i & 3 == 3:
+                cool_guns(model)
+        return time.perf_counter() - begin
+    return shots / best_of(7, run)
+
+
+class ViewStub:
+    """The attributes of SpaceWindow its particle and star methods use, without opening a window."""
+    Scene = SpaceWindow.Scene
+    STAR_LAYERS = SpaceWindow.STAR_LAYERS
+    BLOOD_COLOUR = SpaceWindow.BLOOD_COLOUR
+    FLAME_COLOURS = SpaceWindow.FLAME_COLOURS
+
+    def __init__(self, width=1920, height=1030):
+        self.rand = random.Random(3)
+        self.main_width = self.width = width
+        self.main_height = height
+        self.scene = SpaceWindow.Scene.MAIN_MENU
+        self.cooldown = 0
+        self.tick = 0
+        self.numbers = np.random.RandomState(3)
+        self.pixel_spills = ParticleSystem(SpaceWindow.SPILL_CAPACITY, size_decay=SpaceWindow.SPILL_SIZE_DECAY)
+        self.falling_parts = ParticleSystem(SpaceWindow.DEBRIS_CAPACITY, tick_rate=SpaceWindow.DEBRIS_TICK_RATE,
+                                            gravity=1)
+        self.pt_lbls = []
+        self.stars = None
+
+
+for _name in dir(SpaceWindow):
+    if _name.startswith(('SPILL_', 'DEBRIS_')):
+        setattr(ViewStub, _name, getattr(SpaceWindow, _name))
+
+
+def case_trigger_particles(bursts=400):
+    """Particles spawned per second by an alien kill's trigger_pixel_spill plus a death's trigger_falling_parts,
+    one burst each per call."""
+    stub = ViewStub()
+    colour = [SpaceWindow.BLOOD_COLOUR]
+
+    def run():
+        stub.pixel_spills.clear()
+        stub.falling_parts.clear()
+        begin = time.perf_counter()
+        for i in range(bursts):
+            SpaceWindow.trigger_pixel_spill(stub, 400 + i % 50, 300, colour, 0.5, 1)
+            SpaceWindow.trigger_falling_parts(stub, 400, 300 + i % 50, SpaceWindow.DEBRIS_COLOUR, 40)
+        return time.perf_counter() - begin
+    run()
+    return (len(stub.pixel_spills) + len(stub.falling_parts)) / best_of(3, run)
+
+
+class EventViewStub(ViewStub):
+    """ViewStub plus what SpaceWindow.trigger_events and its handlers touch; sounds are counted, not played."""
+    EVENT_HANDLERS = SpaceWindow.EVENT_HANDLERS
+    MAX_GLOW_INTENSITY = SpaceWindow.MAX_GLOW_INTENSITY
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.player_glow_intensity = 0
+        self.player_glow_colour = [255, 255, 255]
+        self.sounds = 0
+        self.stats = RunStats()
+
+    def play_sound(self, sound_name, x=None):
+        self.sounds += 1
+
+
+for _name in ('trigger_events', 'trigger_pixel_spill', 'trigger_falling_parts', 'trigger_pts_lbl', 'to_screen_x',
+              'to_screen_y', *SpaceWindow.EVENT_HANDLERS.values()):
+    setattr(EventViewStub, _name, getattr(SpaceWindow, _name))
+
+
+def case_trigger_events(ticks=200, deaths=20, alien_shots=30):
+    """Events per second through SpaceWindow.trigger_events over busy ticks of alien deaths and alien and player
+    shots, particles included."""
+    model = Model(0, 0, db_adapter=MemoryDataBaseAdapter(), seed=1)
+    model.events = EventQueue(max(Model.EVENT_CAPACITY, alien_shots))
+    stub = EventViewStub(model)
+    saved = getattr(view.GameFrame, 'dev_mode', False)
+    view.GameFrame.dev_mode = False
+
+    def run():
+        stub.pixel_spills.clear()
+        stub.pt_lbls = []
+        begin = time.perf_counter()
+        for _ in range(ticks):
+            for i in range(deaths):
+                model.events.emit(GameEvent.EventType.ALIEN_DEATH, (i * 30, 400), args=[100])
+            for i in range(alien_shots):
+                model.events.emit(GameEvent.EventType.ALIEN_1_FIRE, sound="bomb1.mp3")
+            model.events.emit(GameEvent.EventType.PLAYER_FIRE, sound="laser1.mp3", args=0)
+            stub.trigger_events()
+        return time.perf_counter() - begin
+    try:
+        return ticks * (deaths + alien_shots + 1) / best_of(3, run)
+    finally:
+        view.GameFrame.dev_mode = saved
+
+
+def case_draw(method, calls=200):
+    """Microseconds per call of a SpaceWindow draw/update method over a generated star field."""
+    stub = ViewStub()
+    SpaceWindow.generate_stars(stub)
+    fn = getattr(SpaceWindow, method)
+
+    def run():
+        begin = time.perf_counter()
+        for _ in range(calls):
+            fn(stub)
+        return time.perf_counter() - begin
+    return best_of(3, run) / calls * 1e6
+
+
+def case_particles(stage, live=10000, calls=40):
+    """Microseconds per tick of SpaceWindow.update_particles, or per frame of filling the vertex data the particle
+    draws upload, with `live` particles from chained explosions alive, a tenth of them debris. All of them outlive
+    the calls."""
+    stub = ViewStub()
+    rand = np.random.RandomState(1)
+    spill_bursts, debris_bursts = 9 * live // 10 // SpaceWindow.SPILL_BURST, live // 10 // SpaceWindow.DEBRIS_BURST
+    buffers = [(system, np.zeros((system.capacity, 8), np.float32), np.zeros((system.capacity, 12), np.uint8))
+               for system in (stub.pixel_spills, stub.falling_parts)]
+
+    def run():
+        stub.pixel_spills.clear()
+        stub.falling_parts.clear()
+        SpaceWindow.trigger_pixel_spill(stub, rand.randint(0, 1900, spill_bursts),
+                                        rand.randint(200, 800, spill_bursts), SpaceWindow.FLAME_COLOURS, 1, 0.66)
+        SpaceWindow.trigger_falling_parts(stub, rand.randint(0, 1900, debris_bursts), 600,
+                                          SpaceWindow.DEBRIS_COLOUR, 40)
+        begin = time.perf_counter()
+        for tick in range(calls):
+            if stage == 'update':
+                stub.tick = tick
+                SpaceWindow.update_particles(stub)
+            else:
+                for system, vertices, colours in buffers:
+                    system.fill(vertices, colours)
+        return time.perf_counter() - begin
+    return best_of(3, run) / calls * 1e6
+
+
+def case_star_field(stars=20000, calls=20):
+    """Milliseconds to generate a star field of `stars` over SpaceWindow's layer mix, which is all the CPU work it
+    costs: scrolling moves one offset per layer and the vertices are uploaded once, on the first draw."""
+    total = sum(layer[0] for layer in SpaceWindow.STAR_LAYERS)
+    layers = [(count * stars // total, *rest) for count, *rest in SpaceWindow.STAR_LAYERS]
+    rand = random.Random(1)
+
+    def run():
+        begin = time.perf_counter()
+        for _ in range(calls):
+            view.StarField(1920, 1030, layers, rand)
+        return time.perf_counter() - begin
+    return best_of(3, run) / calls * 1000
+
+
+def case_db(op, calls=50, rows=0):
+    """Milliseconds per DataBaseAdapter call against a scratch copy of the game database holding rows extra random
+    scores. 'read' is served from the cached high score once warm, 'read_uncached' and 'top_ten' drop their cache
+    before every call so each one queries the file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'space_clones.db')
+        shutil.copy(DataBaseAdapter.DB_FILE_NAME, path)
+        adapter = DataBaseAdapter(path)
+        try:
+            if rows:
+                rand = random.Random(1)
+                with adapter.create_connection() as connection:
+                    connection.executemany(DataBaseAdapter.INSERT_SCORE,
+                                           ((None, rand.randrange(10 ** 6)) for _ in range(rows)))
+                adapter.due = rows  # no trim while timing
+            if op == 'read':
+                fn = adapter.get_high_score
+            elif op == 'read_uncached':
+                def fn():
+                    adapter.high_score = None
+                    adapter.get_high_score()
+            elif op == 'top_ten':
+                def fn():
+                    adapter.tops.clear()
+                    adapter.top_n(10)
+            elif op == 'rank':
+                fn = lambda: adapter.rank(500000)
+            elif op == 'add_score':
+                fn = lambda: adapter.add_score(12345)
+            else:
+                fn = lambda: adapter.set_high_score(12345)
+
+            def run():
+                begin = time.perf_counter()
+                for _ in range(calls):
+                    fn()
+                return time.perf_counter() - begin
+            return best_of(3, run) / calls * 1000
+        finally:
+            adapter.close()
+
+
+# name -> (function, unit, whether higher is better)
+SUITE = {}
+for _aliens in (14, 28, 56):
+    for _bullets in (0, 6, 24):
+        SUITE[f'model_update[aliens={_aliens},bullets={_bullets}]'] = \
+            (lambda a=_aliens, b=_bullets: case_model_update(a, b), 'ticks/s', True)
+for _spec in ('20x50', '40x75'):
+    SUITE[f'swarm_update[{_spec}]'] = (lambda s=_spec: case_swarm_update(s), 'ticks/s', True)
+SUITE['env_step[frame_skip=4]'] = (case_env_step, 'steps/s', True)
+SUITE['model_action_fire'] = (case_model_fire, 'shots/s', True)
+SUITE['trigger_particles'] = (case_trigger_particles, 'particles/s', True)
+SUITE['trigger_events'] = (case_trigger_events, 'events/s', True)
+SUITE['view_update_stars'] = (lambda: case_draw('update_stars'), 'us/call', False)  # draw_stars is all GL
+for _stage in ('update', 'fill'):
+    SUITE[f'particles_{_stage}[live=10000]'] = (lambda st=_stage: case_particles(st), 'us/call', False)
+SUITE['star_field_generate[stars=20000]'] = (case_star_field, 'ms/call', False)
+SUITE['db_read_high_score'] = (lambda: case_db('read'), 'ms/call', False)
+SUITE['db_read_high_score_uncached'] = (lambda: case_db('read_uncached'), 'ms/call', False)
+SUITE['db_write_high_score'] = (lambda: case_db('write'), 'ms/call', False)
+for _op in ('top_ten', 'rank', 'add_score'):
+    SUITE[f'db_{_op}[rows=200000]'] = (lambda o=_op: case_db(o, rows=200000), 'ms/call', False)
+
+
+def selected(name, only):
+    return not only or any(part in name for part in only)
+
+
+def run_suite(only=None):
+    results = {}
+    for name, (fn, unit, higher_is_better) in SUITE.items():
+        if not selected(name, only):
+            continue
+        results[name] = {'value': fn(), 'unit': unit, 'higher_is_better': higher_is_better}
+    return {'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                     'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def compare(results, baseline, tolerance):
+    """[(name, value, baseline value, relative change for the better, regressed)] for cases in both runs."""
+    rows = []
+    for name, entry in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or not base['value']:
+            continue
+        change = entry['value'] / base['value'] - 1
+        if not entry['higher_is_better']:
+            change = base['value'] / entry['value'] - 1 if entry['value'] else float('inf')
+        rows.append((name, entry['value'], base['value'], change, change < -tolerance))
+    return rows
+
+
+def load_baseline(path):
+    """The results of an earlier run, or None with the reason printed when they can't be read."""
+    try:
+        with open(path) as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f'cannot read baseline {path}: {e}', file=sys.stderr)
+        return None
+    if not isinstance(baseline, dict) or not isinstance(baseline.get('results'), dict):
+        print(f'cannot read baseline {path}: no results in it', file=sys.stderr)
+        return None
+    return baseline
+
+
+def suite_main(args):
+    baseline = None
+    if args.baseline:  # read first, so a bad path fails before the suite runs rather than skipping the gate
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            return 2
+    results = run_suite(args.only)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    rows = {row[0]: row for row in compare(results, baseline, args.tolerance)} if baseline else {}
+    for name, entry in results['results'].items():
+        line = f"{name:<40}{entry['value']:>14.2f} {entry['unit']:<12}"
+        if name in rows:
+            _, _, base, change, regressed = rows[name]
+            line += f"baseline {base:>12.2f}  {change:+7.1%}{'  REGRESSED' if regressed else ''}"
+        print(line)
+    missing = [name for name in (baseline['results'] if baseline else ()) if
+               name not in results['results'] and selected(name, args.only)]
+    for name in missing:
+        print(f'{name:<40}{"missing":>14} (in the baseline, not in this run)')
+    print(f'results written to {args.out}')
+    if missing:
+        print(f"{len(missing)} baseline case(s) not run, so not compared: {', '.join(missing)}", file=sys.stderr)
+    regressions = [row[0] for row in rows.values() if row[4]]
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}: "
+              f"{', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite or a single micro-benchmark.")
+    parser.add_argument('name', choices=['suite'] + sorted(BENCHMARKS))
+    parser.add_argument('--games', type=int)
+    parser.add_argument('--repeat', type=int)
+    parser.add_argument('--out', default='bench_results.json', help="suite: where to write this run's results")
+    parser.add_argument('--baseline', help="suite: results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="suite: allowed slowdown against the baseline as a fraction, default 0.1")
+    parser.add_argument('--only', nargs='+', help="suite: run only cases whose name contains one of these")
+    args = parser.parse_args(argv)
+    if args.name == 'suite':
+        sys.exit(suite_main(args))
+    options = {k: v for k, v in (('games', args.games), ('repeat', args.repeat)) if v is not None}
+    for key, value in BENCHMARKS[args.name](**options).items():
+        print(f'{key}: {value:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+from db_adapter import MemoryDataBaseAdapter
+from headless import RandomInput
+from model import Model
+
+"""calibrate.py: Measures how hard each difficulty level is and picks tuning constants per level.
+
+Every (difficulty, tuning) combination plays the same seeded scripted games, so combinations are compared on equal
+footing. Games run on a process pool using every core, each finished game is appended to <out>.jsonl straight away,
+and a rerun with the same --out skips games already recorded with the same tuning and --max-ticks, so a long sweep
+can be stopped and resumed. Results depend only on the seeds, not on worker count or completion order.
+
+Usage: python calibrate.py --difficulties 0 1 2 3 --shoot-chance 0.05 0.1 0.2 --targets 40 30 20 15"""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+TUNABLES = ('alien_shoot_chance', 'tick_speed', 'OVERHEAT_THRESHOLD', 'power_box_spawn_chance')
+TICKS_PER_SECOND = 60
+
+
+def play_level(difficulty, tuning, seed, max_ticks):
+    """Plays one life at one difficulty. Returns (ticks survived, points, whether the wave was cleared)."""
+    model = Model(0, difficulty, db_adapter=MemoryDataBaseAdapter(), seed=seed)
+    for name, value in tuning.items():
+        setattr(model, name, value)
+    inputs = RandomInput(seed)
+    dt = 1 / TICKS_PER_SECOND
+    for tick in range(max_ticks):
+        for key_val, action_type in inputs.poll(tick, model):
+            model.action(key_val, action_type)
+        model.update(dt)
+        model.events.clear()
+        if model.player.is_double_blown:
+            return tick + 1, model.points, False
+        if model.aliens <= 0:
+            return tick + 1, model.points, True
+    return max_ticks, model.points, False
+
+
+def config_key(difficulty, tuning, max_ticks):
+    # Everything a game's row depends on besides its seed, so a resumed sweep never reuses rows played otherwise.
+    return json.dumps([difficulty, tuning, max_ticks], sort_keys=True)
+
+
+def run_job(job):
+    key, difficulty, tuning, seed, max_ticks = job
+    ticks, points, cleared = play_level(difficulty, tuning, seed, max_ticks)
+    return {'key': key, 'seed': seed, 'ticks': ticks, 'points': points, 'cleared': cleared}
+
+
+def build_jobs(difficulties, grid, games, seed, max_ticks):
+    jobs = []
+    for difficulty in difficulties:
+        for values in itertools.product(*(grid[name] for name in TUNABLES)):
+            tuning = dict(zip(TUNABLES, values))
+            key = config_key(difficulty, tuning, max_ticks)
+            jobs.extend((key, difficulty, tuning, seed + g, max_ticks) for g in range(games))
+    return jobs
+
+
+def load_results(path):
+    """Results already streamed to path, tolerating a half-written last line from an interrupted run."""
+    results = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                results[(row['key'], row['seed'])] = row
+    return results
+
+
+def end_last_line(path):
+    """Finishes a half-written last line with a newline, so the first row appended after it still parses."""
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+
+def run_sweep(jobs, path, workers=None):
+    results = load_results(path)
+    todo = [job for job in jobs if (job[0], job[3]) not in results]
+    print(f'{len(jobs) - len(todo)} of {len(jobs)} games already recorded, {len(todo)} to play', file=sys.stderr)
+    if todo:
+        end_last_line(path)
+        with open(path, 'a') as out, Pool(workers or os.cpu_count()) as pool:
+            for i, row in enumerate(pool.imap_unordered(run_job, todo, chunksize=4), 1):
+                out.write(json.dumps(row) + '\n')
+                out.flush()
+                results[(row['key'], row['seed'])] = row
+                if i % 100 == 0 or i == len(todo):
+                    print(f'{i}/{len(todo)}', file=sys.stderr)
+    return results
+
+
+def summarise(jobs, results):
+    by_key = {}
+    for key, difficulty, tuning, seed, max_ticks in jobs:
+        row = results.get((key, seed))
+        if row is not None:
+            by_key.setdefault(key, (difficulty, tuning, []))[2].append(row)
+
+    stats = []
+    for key in sorted(by_key):
+        difficulty, tuning, rows = by_key[key]
+        survival = np.array([row['ticks'] for row in rows]) / TICKS_PER_SECOND
+        points = np.array([row['points'] for row in rows])
+        entry = {'difficulty': difficulty}
+        entry.update(tuning)
+        entry.update({'games': len(rows),
+                      'survival_mean': float(survival.mean()),
+                      'survival_p10': float(np.percentile(survival, 10)),
+                      'survival_p50': float(np.percentile(survival, 50)),
+                      'survival_p90': float(np.percentile(survival, 90)),
+                      'score_mean': float(points.mean()),
+                      'score_p10': float(np.percentile(points, 10)),
+                      'score_p50': float(np.percentile(points, 50)),
+                      'score_p90': float(np.percentile(points, 90)),
+                      'clear_rate': float(np.mean([row['cleared'] for row in rows]))})
+        stats.append(entry)
+    return stats
+
+
+def pick_table(stats, targets):
+    """For each difficulty, the tuning whose median survival (seconds) is closest to that level's target."""
+    table = []
+    for difficulty, target in targets.items():
+        rows = [row for row in stats if row['difficulty'] == difficulty]
+        if rows:
+            best = min(rows, key=lambda row: (abs(row['survival_p50'] - target), -row['games']))
+            table.append(dict(best, target_survival=target))
+    return table
+
+
+def write_csv(path, rows):
+    if not rows:
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: round(v, 4) if isinstance(v, float) else v for k, v in row.items()})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep difficulty and tuning constants over scripted games.")
+    parser.add_argument('--difficulties', type=int, nargs='+', default=[0, 1, 2, 3])
+    parser.add_argument('--shoot-chance', type=float, nargs='+', default=[0.1])
+    parser.add_argument('--tick-speed', type=int, nargs='+', default=[25])
+    parser.add_argument('--overheat', type=int, nargs='+', default=[Model.OVERHEAT_THRESHOLD])
+    parser.add_argument('--box-chance', type=float, nargs='+', default=[0.15])
+    parser.add_argument('--games', type=int, default=50, help="games per combination")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-ticks', type=int, default=60 * TICKS_PER_SECOND)
+    parser.add_argument('--targets', type=float, nargs='+', help="target median survival in seconds, per difficulty")
+    parser.add_argument('--workers', type=int, default=None, help="defaults to every core")
+    parser.add_argument('--out', default='calibration')
+    args = parser.parse_args(argv)
+
+    grid = {'alien_shoot_chance': args.shoot_chance, 'tick_speed': args.tick_speed,
+            'OVERHEAT_THRESHOLD': args.overheat, 'power_box_spawn_chance': args.box_chance}
+    jobs = build_jobs(args.difficulties, grid, args.games, args.seed, args.max_ticks)
+    results = run_sweep(jobs, args.out + '.jsonl', args.workers)
+    stats = summarise(jobs, results)
+    write_csv(args.out + '_stats.csv', stats)
+    if args.targets:
+        table = pick_table(stats, dict(zip(args.difficulties, args.targets)))
+        write_csv(args.out + '_table.csv', table)
+        for row in table:
+            print(', '.join(f'{k}={round(v, 3) if isinstance(v, float) else v}' for k, v in row.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+from math import floor
+from operator import attrgetter
+
+"""collision.py: Broadphase grid and typed hit tests for the model."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+def point_in_box(px, py, box):
+    return box.x <= px <= box.x + box.width and box.y <= py <= box.y + box.height
+
+
+def corner_in_box(hitter, hitee):
+    """True when any corner of hitter lies inside hitee (edges inclusive)."""
+    x1, y1 = hitter.x, hitter.y
+    x2, y2 = x1 + hitter.width, y1 + hitter.height
+    return (hitee.x <= x1 <= hitee.x + hitee.width or hitee.x <= x2 <= hitee.x + hitee.width) and \
+           (hitee.y <= y1 <= hitee.y + hitee.height or hitee.y <= y2 <= hitee.y + hitee.height)
+
+
+class SpatialGrid:
+    """Uniform grid bucketing objects (anything with x, y, width, height) by the cells their box covers.
+
+    Call move() after changing an object's position so its buckets follow it. Queries return candidates only,
+    pair them with point_in_box / corner_in_box for the exact test. x_attr and y_attr name the coordinates objects
+    are bucketed by, e.g. offsets within a formation, and queries are then in those coordinates too."""
+
+    def __init__(self, cell_width, cell_height, x_attr='x', y_attr='y'):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.position = attrgetter(x_attr, y_attr)
+        self.rows = {}  # row -> {col -> [objects]}
+        self.keys = {}  # object -> tuple of (col, row) it occupies
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, obj):
+        return obj in self.keys
+
+    def cells_for(self, x, y, width, height):
+        c1, c2 = floor(x / self.cell_width), floor((x + width) / self.cell_width)
+        r1, r2 = floor(y / self.cell_height), floor((y + height) / self.cell_height)
+        return tuple((c, r) for r in range(r1, r2 + 1) for c in range(c1, c2 + 1))
+
+    def insert(self, obj):
+        keys = self.cells_for(*self.position(obj), obj.width, obj.height)
+        self.keys[obj] = keys
+        for col, row in keys:
+            self.rows.setdefault(row, {}).setdefault(col, []).append(obj)
+
+    def remove(self, obj):
+        for col, row in self.keys.pop(obj):
+            cols = self.rows[row]
+            cell = cols[col]
+            cell.remove(obj)
+            if not cell:
+                del cols[col]
+                if not cols:
+                    del self.rows[row]
+
+    def move(self, obj):
+        keys = self.cells_for(*self.position(obj), obj.width, obj.height)
+        if keys != self.keys[obj]:
+            self.remove(obj)
+            self.insert(obj)
+
+    def clear(self):
+        self.rows.clear()
+        self.keys.clear()
+
+    def query_point(self, x, y):
+        cols = self.rows.get(floor(y / self.cell_height))
+        if cols is None:
+            return ()
+        return cols.get(floor(x / self.cell_width), ())
+
+    def query_rect(self, x, y, width, height):
+        found = {}  # dict keeps insertion order while dropping objects seen in several cells
+        for col, row in self.cells_for(x, y, width, height):
+            cols = self.rows.get(row)
+            if cols is not None:
+                for obj in cols.get(col, ()):
+                    found[obj] = None
+        return list(found)
+
+    def query_below(self, y):
+        """Every object occupying a row at or below y."""
+        found = {}
+        limit = floor(y / self.cell_height)
+        for row, cols in self.rows.items():
+            if row <= limit:
+                for cell in cols.values():
+                    for obj in cell:
+                        found[obj] = None
+        return list(found)
@@ -0,0 +1,28 @@
+"""controls.py: Key symbols understood by the model.
+
+Values mirror pyglet.window.key so the window can forward symbols untouched, while the model itself loads without
+pyglet (importing pyglet.window opens a GL shadow window)."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+KEY_PRESS, KEY_RELEASE = 0, 1
+
+
+class Key:
+    SPACE = 0x020
+    G = 0x067
+    P = 0x070
+    Q = 0x071
+    R = 0x072
+    T = 0x074
+    W = 0x077
+    Y = 0x079
+    ESCAPE = 0xff1b
+    LEFT = 0xff51
+    RIGHT = 0xff53
+
+    NAMES = {'SPACE': SPACE, 'G': G, 'P': P, 'Q': Q, 'R': R, 'T': T, 'W': W, 'Y': Y,
+             'ESCAPE': ESCAPE, 'LEFT': LEFT, 'RIGHT': RIGHT}
@@ -1,47 +1,469 @@
+import atexit
+import math
 import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
 
-"""db_adapter.py: Manages access to sqlite database """
+from log import get_logger
+
+"""db_adapter.py: Manages access to sqlite database
+
+One connection per database file stays open for the life of the process (DataBaseAdapter.shared()), in WAL mode so
+readers never wait on the writer. Statements are fixed, parameterised SQL, so sqlite compiles each once and reuses
+it from the connection's statement cache. The high score is read through a cache; after the first read only writes
+touch the disk.
+
+The highscores table is a leaderboard of every finished game, indexed on score so the high score, top_n() and rank()
+are index lookups however many games it holds, and trimmed in bulk to the best RETAINED_SCORES.
+
+The runs table keeps one row of statistics per finished game (see stats.py), written a batch at a time. run_levels
+holds running sums per level reached, so per-level averages read one row per level, and (level, column) indexes
+serve percentiles by stepping to the right offset from the nearer end.
+
+The game talks to WriteBehindAdapter, which answers from memory and leaves every read and write of the file to a
+persistence thread, so a locked database never stalls a frame."""
 
 __author__ = "Daniel Skyrme, Joe Lovell"
 __licence__ = "GNU General Public License v3.0"
 __email__ = "danielskyrme@hotmail.com"
 __credits__ = ["Joe Lovell"]
 
+logger = get_logger(__name__)
+
 
 class DataBaseAdapter:
     DB_FILE_NAME = "res/space_clones.db"
     HIGH_SCORE_DB_NAME = "highscores"
     COLUMN_SCORE = "score"
+    RETAINED_SCORES = 100000  # leaderboard rows kept, the rest are trimmed in bulk
+    TRIM_EVERY = 1000  # scores added between trims
+    CREATE_TABLE = f"create table if not exists {HIGH_SCORE_DB_NAME} (_id integer primary key autoincrement, " \
+                   f"name text, {COLUMN_SCORE} integer not null);"
+    CREATE_INDEX = f"create index if not exists {HIGH_SCORE_DB_NAME}_{COLUMN_SCORE} " \
+                   f"on {HIGH_SCORE_DB_NAME} ({COLUMN_SCORE} desc);"
+    SELECT_HIGH_SCORE = f"select max({COLUMN_SCORE}) from {HIGH_SCORE_DB_NAME};"
+    SELECT_TOP_N = f"select name, {COLUMN_SCORE} from {HIGH_SCORE_DB_NAME} order by {COLUMN_SCORE} desc, _id limit ?;"
+    SELECT_RANK = f"select count(*) + 1 from {HIGH_SCORE_DB_NAME} where {COLUMN_SCORE} > ?;"
+    DELETE_ABOVE = f"delete from {HIGH_SCORE_DB_NAME} where {COLUMN_SCORE} > ?;"
+    DELETE_ALL = f"delete from {HIGH_SCORE_DB_NAME};"
+    DELETE_BELOW_NTH = f"delete from {HIGH_SCORE_DB_NAME} where {COLUMN_SCORE} < (select {COLUMN_SCORE} " \
+                       f"from {HIGH_SCORE_DB_NAME} order by {COLUMN_SCORE} desc limit 1 offset ?);"
+    INSERT_SCORE = f"insert into {HIGH_SCORE_DB_NAME} (name, {COLUMN_SCORE}) values (?, ?);"
+    RUNS_DB_NAME = "runs"
+    RUN_LEVELS_DB_NAME = "run_levels"
+    PERCENTILE_COLUMNS = ('points', 'accuracy', 'duration')
+    CREATE_RUNS = f"create table if not exists {RUNS_DB_NAME} (_id integer primary key, finished integer not null, " \
+                  "level integer not null, points integer not null, duration real not null, kills integer not null, " \
+                  "power_ups integer not null, jams integer not null, shots integer not null, accuracy real not null);"
+    CREATE_RUN_LEVELS = f"create table if not exists {RUN_LEVELS_DB_NAME} (level integer primary key, " \
+                        "runs integer not null, points integer not null, duration real not null, " \
+                        "kills integer not null, power_ups integer not null, jams integer not null, " \
+                        "shots integer not null, accuracy real not null);"
+    CREATE_RUN_INDEX = "create index if not exists " + RUNS_DB_NAME + "_level_{column} on " + RUNS_DB_NAME + \
+                       " (level, {column});"
+    SELECT_RUN_LEVELS = f"select * from {RUN_LEVELS_DB_NAME} order by level;"
+    SELECT_LEVEL_RUNS = f"select runs from {RUN_LEVELS_DB_NAME} where level = ?;"
+    SELECT_NTH = "select {column} from " + RUNS_DB_NAME + " where level = ? order by {column} {order} limit 1 offset ?;"
+    adapters = {}  # path -> the adapter shared() hands out
+
+    def __init__(self, path=None):
+        self.path = DataBaseAdapter.DB_FILE_NAME if path is None else path
+        self.lock = threading.RLock()  # the connection is shared between threads, one statement at a time
+        self.connection = None
+        self.high_score = None  # cached, None until read or after a failed write
+        self.tops = {}  # n -> cached top_n(n), emptied by every write
+        self.due = 0  # scores to add before the next trim, a process's first one trims
+        self.run_columns = None  # columns of runs, read when the connection opens
+        self.run_inserts = {}  # run columns -> (insert into runs, upsert into run_levels)
+
+    @classmethod
+    def shared(cls, path=None):
+        """The process-wide adapter for path (DB_FILE_NAME by default), closed at exit."""
+        path = cls.DB_FILE_NAME if path is None else path
+        adapter = cls.adapters.get(path)
+        if adapter is None:
+            adapter = cls.adapters[path] = cls(path)
+            atexit.register(adapter.close)
+        return adapter
 
     def create_connection(self):
+        """Opens the connection on first use, creating the leaderboard and its index, and returns it from then on."""
+        if self.connection is None:
+            try:
+                connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                connection.execute("pragma journal_mode=wal;")
+                connection.execute("pragma synchronous=normal;")
+                with connection:
+                    connection.execute(DataBaseAdapter.CREATE_TABLE)
+                    connection.execute(DataBaseAdapter.CREATE_INDEX)
+                    connection.execute(DataBaseAdapter.CREATE_RUNS)
+                    connection.execute(DataBaseAdapter.CREATE_RUN_LEVELS)
+                    for column in DataBaseAdapter.PERCENTILE_COLUMNS:
+                        connection.execute(DataBaseAdapter.CREATE_RUN_INDEX.format(column=column))
+                self.run_columns = {row[1] for row in connection.execute(
+                    f"pragma table_info({DataBaseAdapter.RUNS_DB_NAME});")}
+                self.connection = connection
+            except sqlite3.Error as e:
+                logger.error('cannot open %s: %s', self.path, e)
+        return self.connection
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def get_high_score(self):
+        with self.lock:
+            if self.high_score is None:
+                logger.debug(DataBaseAdapter.SELECT_HIGH_SCORE)
+                self.high_score = self.create_connection().execute(DataBaseAdapter.SELECT_HIGH_SCORE).fetchone()[0] or 0
+            return self.high_score
+
+    def set_high_score(self, value):
+        """Makes value the high score: every score above it is deleted and value is added as a score of its own.
+        0 or less empties the leaderboard instead, which reads back as a high score of 0."""
+        with self.lock:
+            connection = self.create_connection()
+            self.high_score = None
+            self.tops.clear()
+            with connection:  # one transaction, committed on success and rolled back on error
+                if value <= 0:
+                    logger.debug(DataBaseAdapter.DELETE_ALL)
+                    connection.execute(DataBaseAdapter.DELETE_ALL)
+                else:
+                    logger.debug('%s %s %s', DataBaseAdapter.DELETE_ABOVE, DataBaseAdapter.INSERT_SCORE, value)
+                    connection.execute(DataBaseAdapter.DELETE_ABOVE, (value,))
+                    connection.execute(DataBaseAdapter.INSERT_SCORE, (None, value))
+            self.high_score = max(value, 0)
+
+    def add_score(self, score, name=None):
+        """Records a finished game on the leaderboard."""
+        self.add_scores([(score, name)])
+
+    def add_scores(self, scores):
+        """Records finished games, [(score, name)], in one transaction."""
+        with self.lock:
+            connection = self.create_connection()
+            high_score = self.high_score
+            self.high_score = None
+            self.tops.clear()
+            logger.debug('%s %s', DataBaseAdapter.INSERT_SCORE, scores)
+            with connection:
+                connection.executemany(DataBaseAdapter.INSERT_SCORE, [(name, score) for score, name in scores])
+            if high_score is not None:
+                self.high_score = max(high_score, *(score for score, _ in scores))
+            self.due -= len(scores)
+            if self.due < 0:
+                self.trim()
+
+    def add_runs(self, runs):
+        """Records finished games' statistics, dicts of column -> value as stats.RunStats.row() makes them, with
+        one batched insert into runs and one into the per-level sums, in one transaction. A column new to the table
+        (a gun's shots_ count) is added to both tables first."""
+        with self.lock:
+            connection = self.create_connection()
+            columns = tuple(runs[0])  # finished and level first, the same for every run from one build of the game
+            statements = self.run_inserts.get(columns)
+            if statements is None:
+                statements = self.run_inserts[columns] = self.run_statements(connection, columns)
+            sums = columns[2:]
+            logger.debug('%s x%d', statements[0], len(runs))
+            with connection:
+                connection.executemany(statements[0], [tuple(run[column] for column in columns) for run in runs])
+                connection.executemany(statements[1], [(run['level'], *(run[column] for column in sums))
+                                                       for run in runs])
+
+    def run_statements(self, connection, columns):
+        with connection:
+            for column in columns:
+                if column not in self.run_columns:
+                    for table in (DataBaseAdapter.RUNS_DB_NAME, DataBaseAdapter.RUN_LEVELS_DB_NAME):
+                        connection.execute(f"alter table {table} add column {column} integer not null default 0;")
+                    self.run_columns.add(column)
+        sums = columns[2:]  # all but finished and level, which lead every row
+        insert = f"insert into {DataBaseAdapter.RUNS_DB_NAME} ({', '.join(columns)}) " \
+                 f"values ({', '.join('?' * len(columns))});"
+        upsert = f"insert into {DataBaseAdapter.RUN_LEVELS_DB_NAME} (level, runs, {', '.join(sums)}) " \
+                 f"values (?, 1, {', '.join('?' * len(sums))}) on conflict (level) do update set runs = runs + 1, " \
+                 f"{', '.join(f'{column} = {column} + excluded.{column}' for column in sums)};"
+        return insert, upsert
+
+    def level_averages(self):
+        """{level reached: {'runs': count, column: mean}}, read from the running sums."""
+        with self.lock:
+            cursor = self.create_connection().execute(DataBaseAdapter.SELECT_RUN_LEVELS)
+            names = [description[0] for description in cursor.description]
+            return {row[0]: {'runs': row[1], **{name: value / row[1] for name, value in zip(names[2:], row[2:])}}
+                    for row in cursor.fetchall()}
+
+    def percentiles(self, column, level, qs=(50, 90, 99)):
+        """Nearest-rank percentiles of column (one of PERCENTILE_COLUMNS) over the runs that reached level, None
+        for each when there are none. SQLite finds each by stepping along the (level, column) index from whichever
+        end is nearer, so one costs up to half the level's run count in index entries: linear, not a seek."""
+        if column not in DataBaseAdapter.PERCENTILE_COLUMNS:
+            raise ValueError(f'no percentile index on {column}, only on {DataBaseAdapter.PERCENTILE_COLUMNS}')
+        with self.lock:
+            connection = self.create_connection()
+            row = connection.execute(DataBaseAdapter.SELECT_LEVEL_RUNS, (level,)).fetchone()
+            if row is None:
+                return [None] * len(qs)
+            ascending = DataBaseAdapter.SELECT_NTH.format(column=column, order='asc')
+            descending = DataBaseAdapter.SELECT_NTH.format(column=column, order='desc')
+            values = []
+            for q in qs:
+                offset = max(0, math.ceil(q / 100 * row[0]) - 1)
+                if offset < row[0] // 2:
+                    values.append(connection.execute(ascending, (level, offset)).fetchone()[0])
+                else:
+                    values.append(connection.execute(descending, (level, row[0] - 1 - offset)).fetchone()[0])
+            return values
+
+    def top_n(self, n=10):
+        """[(name, score)] of the n best games, best first, read straight off the score index."""
+        with self.lock:
+            top = self.tops.get(n)
+            if top is None:
+                top = self.tops[n] = self.create_connection().execute(DataBaseAdapter.SELECT_TOP_N, (n,)).fetchall()
+            return top
+
+    def rank(self, score):
+        """Leaderboard position a game scoring score holds, 1 for the best. Counts the index entries above it."""
+        with self.lock:
+            return self.create_connection().execute(DataBaseAdapter.SELECT_RANK, (score,)).fetchone()[0]
+
+    def trim(self, keep=None):
+        """Deletes, in one statement, every score below the keep-th best (RETAINED_SCORES by default); ties with
+        the keep-th best stay."""
+        keep = DataBaseAdapter.RETAINED_SCORES if keep is None else keep
+        with self.lock:
+            connection = self.create_connection()
+            self.due = DataBaseAdapter.TRIM_EVERY
+            with connection:
+                deleted = connection.execute(DataBaseAdapter.DELETE_BELOW_NTH, (keep - 1,)).rowcount
+            if deleted:
+                self.tops.clear()
+                logger.debug('trimmed %d scores from %s', deleted, self.path)
+            return deleted
+
+
+class WriteBehindAdapter:
+    """The DataBaseAdapter interface without database I/O on the calling thread. Writes go to a bounded pending
+    list that a persistence thread drains in one transaction; reads come from memory: the high score, the
+    leaderboard's top `rows` as last read merged with unwritten scores, and the ranks of written scores (rank() is
+    None until the thread has looked a score up). Finished games' statistics queue alongside the scores and go in the
+    same batch. close() writes what is pending before returning.
+
+    Only the top `rows` of the leaderboard are kept in memory, so top_n() never returns more than that, whatever n
+    asks for. Construct it with rows at least as long as the longest board shown."""
+    MAX_PENDING = 256  # unwritten scores, or runs, kept; past it the lowest scores are merged away, the oldest runs
+
+    CLOSE_TIMEOUT = 15  # seconds close() waits for the last write, past the connection's own timeout
+    writers = {}  # path -> the adapter shared() hands out
+
+    def __init__(self, adapter, rows=10):
+        self.adapter = adapter
+        self.rows = rows  # leaderboard entries kept in memory, the most top_n() returns
+        self.condition = threading.Condition()
+        self.high_score = 0  # until the thread has read it
+        self.top = []  # [(name, score)] as last read
+        self.ranks = {}  # score -> rank as last looked up
+        self.pending = []  # [(score, name)] not yet handed to the thread
+        self.writing = []  # handed to the thread and not yet committed
+        self.runs = []  # run statistics not yet handed to the thread
+        self.writing_runs = []
+        self.resets = []  # set_high_score values not yet handed to the thread, in call order
+        self.loaded = False  # the thread's first read is done
+        self.closed = False
+        self.stopped = False  # the thread has returned, or died
+        self.thread = threading.Thread(target=self.run, name='persistence', daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def shared(cls, path=None):
+        """The process-wide writer over DataBaseAdapter.shared(path), flushed at exit."""
+        adapter = DataBaseAdapter.shared(path)
+        writer = cls.writers.get(adapter.path)
+        if writer is None or writer.closed:
+            writer = cls.writers[adapter.path] = cls(adapter)
+            atexit.register(writer.close)  # runs before the connection's close, registered earlier
+        return writer
+
+    def get_high_score(self):
+        """The high score from memory, never waiting: 0, or the best score added, until the thread's first read."""
+        return self.high_score
+
+    def set_high_score(self, value):
+        """As DataBaseAdapter.set_high_score, 0 or less empties the leaderboard."""
+        with self.condition:
+            self.pending = [entry for entry in self.pending if 0 < value and entry[0] <= value]
+            self.resets.append(value)
+            self.top = [entry for entry in self.top if 0 < value and entry[1] <= value]
+            self.ranks.clear()
+            self.high_score = max(value, 0)
+            self.condition.notify()
+
+    def add_score(self, score, name=None):
+        with self.condition:
+            if self.closed:
+                logger.error('score %s %s added after close, not saved', name, score)
+                return
+            self.pending.append((score, name))
+            if len(self.pending) > WriteBehindAdapter.MAX_PENDING:  # only the best matter, drop the lowest
+                self.pending.remove(min(self.pending, key=lambda entry: entry[0]))
+            self.high_score = max(self.high_score, score)
+            self.condition.notify()
+
+    def add_run(self, run):
+        with self.condition:
+            if self.closed:
+                logger.error('run %s added after close, not saved', run)
+                return
+            self.runs.append(run)
+            if len(self.runs) > WriteBehindAdapter.MAX_PENDING:
+                logger.error('run %s dropped, %d waiting to be saved', self.runs.pop(0), len(self.runs))
+            self.condition.notify()
+
+    def top_n(self, n=10):
+        """[(name, score)] of the min(n, rows) best games from memory, unwritten scores included. Never more than
+        rows: entries past those read at the last write are not known here."""
+        with self.condition:
+            unwritten = [(name, score) for score, name in self.writing + self.pending]
+            return sorted(self.top + unwritten, key=lambda entry: -entry[1])[:min(n, self.rows)]
+
+    def rank(self, score):
+        with self.condition:
+            return self.ranks.get(score)
+
+    def flush(self, timeout=None):
+        """Waits until the first read and everything added so far are done, False if timeout ran out first."""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.loaded and not self.unwritten() or self.stopped, timeout)
+
+    def unwritten(self):
+        return self.pending or self.writing or self.runs or self.writing_runs or self.resets
+
+    def close(self):
+        """Writes what is pending and stops the thread. Safe to call more than once."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join(WriteBehindAdapter.CLOSE_TIMEOUT)
+        if self.thread.is_alive():
+            logger.error('persistence thread still writing %s after %ss', self.writing,
+                         WriteBehindAdapter.CLOSE_TIMEOUT)
+
+    def run(self):
+        try:
+            self.write_behind()
+        finally:
+            with self.condition:
+                self.stopped = True
+                self.condition.notify_all()
+
+    def write_behind(self):
+        self.refresh([])
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.unwritten() or self.closed)
+                if not self.unwritten():
+                    return
+                self.writing, self.pending = self.pending, []
+                self.writing_runs, self.runs = self.runs, []
+                resets, self.resets = self.resets, []
+            begin = time.perf_counter()
+            try:
+                for value in resets:
+                    self.adapter.set_high_score(value)
+                if self.writing:
+                    self.adapter.add_scores(self.writing)
+            except sqlite3.Error as e:
+                logger.error('scores %s not saved: %s', self.writing, e)
+            try:
+                if self.writing_runs:
+                    self.adapter.add_runs(self.writing_runs)
+            except sqlite3.Error as e:
+                logger.error('runs %s not saved: %s', self.writing_runs, e)
+            logger.debug('wrote %d scores and %d runs in %.1fms', len(self.writing), len(self.writing_runs),
+                         (time.perf_counter() - begin) * 1000)
+            self.refresh(self.writing)
+
+    def refresh(self, written):
+        """Reads the high score, top rows and the ranks of the written scores, then marks them committed."""
         try:
-            return sqlite3.connect(DataBaseAdapter.DB_FILE_NAME, timeout=10)
+            high_score = self.adapter.get_high_score()
+            top = self.adapter.top_n(self.rows)
+            ranks = {score: self.adapter.rank(score) for score, _ in written}
         except sqlite3.Error as e:
-            print(e)
-        return None
+            logger.error('cannot read scores: %s', e)
+            high_score, top, ranks = self.high_score, self.top, {}
+        with self.condition:
+            if not self.resets:  # else a reset came in meanwhile and these are stale
+                self.high_score = max(high_score, *(score for score, _ in self.pending), 0)
+                self.top = top
+                self.ranks.update(ranks)
+            self.writing = []
+            self.writing_runs = []
+            self.loaded = True
+            self.condition.notify_all()
+
+
+class MemoryDataBaseAdapter:
+    """Stands in for DataBaseAdapter when no database file should be touched (headless runs)."""
+
+    def __init__(self, high_score=0):
+        self.high_score = high_score
+        self.scores = []  # (-score, order, name), best first
+        self.runs = []
 
     def get_high_score(self):
-        connection = self.create_connection()
-        cursor = connection.cursor()
-        query = "select {cn} from {tn};".format(tn=DataBaseAdapter.HIGH_SCORE_DB_NAME, cn=DataBaseAdapter.COLUMN_SCORE)
-        print(query)
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        if len(rows) == 0:
-            self.set_high_score(0)
-            return 0
-        connection.close()
-        return rows[0][0]
+        return self.high_score
 
     def set_high_score(self, value):
-        connection = self.create_connection()
-        cursor = connection.cursor()
-        q1 = "delete from {tn};".format(tn=DataBaseAdapter.HIGH_SCORE_DB_NAME)
-        q2 = "insert into {tn} ({cn}) VALUES({val});".format(tn=DataBaseAdapter.HIGH_SCORE_DB_NAME,
-                                                             cn=DataBaseAdapter.COLUMN_SCORE,
-                                                             val=value)
-        script = q1 + ";\n" + q2
-        print(script)
-        cursor.executescript(script)
-        connection.commit()
-        connection.close()
+        self.high_score = 0
+        self.scores = [entry for entry in self.scores if 0 < value and -entry[0] <= value]
+        if value > 0:
+            self.add_score(value)
+
+    def add_scores(self, scores):
+        for score, name in scores:
+            self.add_score(score, name)
+
+    def add_score(self, score, name=None):
+        insort(self.scores, (-score, len(self.scores), name))
+        self.high_score = max(self.high_score, score)
+
+    def add_run(self, run):
+        self.runs.append(run)
+
+    def add_runs(self, runs):
+        self.runs.extend(runs)
+
+    def level_averages(self):
+        levels = {}
+        for run in self.runs:
+            levels.setdefault(run['level'], []).append(run)
+        return {level: {'runs': len(runs), **{column: sum(run[column] for run in runs) / len(runs)
+                                              for column in list(runs[0])[2:]}}
+                for level, runs in sorted(levels.items())}
+
+    def percentiles(self, column, level, qs=(50, 90, 99)):
+        values = sorted(run[column] for run in self.runs if run['level'] == level)
+        return [values[max(0, math.ceil(q / 100 * len(values)) - 1)] if values else None for q in qs]
+
+    def top_n(self, n=10):
+        return [(name, -score) for score, _, name in self.scores[:n]]
+
+    def rank(self, score):
+        return bisect_left(self.scores, (-score,)) + 1
+
+    def trim(self, keep=None):
+        keep = DataBaseAdapter.RETAINED_SCORES if keep is None else keep
+        if len(self.scores) <= keep:
+            return 0
+        cut = bisect_right(self.scores, (self.scores[keep - 1][0], len(self.scores)))
+        deleted = len(self.scores) - cut
+        del self.scores[cut:]
+        return deleted
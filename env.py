@@ -0,0 +1,197 @@
+import argparse
+import time
+
+import numpy as np
+
+from batch_env import NOOP, LEFT, RIGHT, FIRE_Q, FIRE_W
+from controls import Key, KEY_PRESS, KEY_RELEASE
+from db_adapter import MemoryDataBaseAdapter
+from headless import HeadlessRunner
+from model import Model, GameEvent
+
+"""env.py: Gym-style reinforcement learning environment over a single Model, without pyglet.
+
+reset(seed) starts a game and step(action) plays frame_skip ticks of it, following the same scene flow as the
+headless runner (next level, restart after a lost life) until game over. Actions are the bit flags of batch_env:
+LEFT, RIGHT, FIRE_Q and FIRE_W combined with |, so there are N_ACTIONS of them. Movement is held while its bit is set
+and each fire bit taps its gun once per step.
+
+The observation is one float64 array allocated at construction and refreshed in place every step, with named views
+into it (player, heat, aliens, bullets, alien_bullets, boxes) that stay valid for the life of the environment. Rows
+of the object views are (x, y, alive). Bullets are copied straight out of the model's flat arrays and alien
+positions are the formation offsets plus its origin, so apart from power boxes no per-object Python work happens
+per step. Copy the observation to keep one past the next step.
+
+Each model carries its lives on to the next, so environments share no game state and can be stepped interleaved.
+
+Usage: python env.py --steps 100000 --frame-skip 4 [--seed 7]"""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+N_ACTIONS = 16
+PLAYER_FIELDS = ('x', 'y', 'dx', 'is_blown', 'is_double_blown', 'lives', 'difficulty')
+HEAT_FIELDS = ('countdown', 'overheat_variable', 'jam')
+
+
+class SpaceCloneEnv:
+    def __init__(self, frame_skip=4, difficulty=0, seed=None, max_steps=None, bullet_capacity=24, box_capacity=16,
+                 swarm=None, dt=1 / 60):
+        self.frame_skip = frame_skip
+        self.difficulty = difficulty
+        self.seed = seed
+        self.max_steps = max_steps
+        self.swarm = swarm
+        self.dt = dt
+        self.runner = None
+        self.model = None
+        self.steps = 0
+        self.held = None  # movement key held down in the model
+        self.alien_model = None  # model whose aliens alien_offsets holds
+        self.alien_count = -1
+
+        probe = Model(db_adapter=MemoryDataBaseAdapter(), swarm=swarm)
+        sizes = {'player': len(PLAYER_FIELDS), 'heat': len(probe.heat.guns) * len(HEAT_FIELDS),
+                 'aliens': len(probe.objects) * 3, 'bullets': bullet_capacity * 3,
+                 'alien_bullets': probe.alien_bullet_max * 3, 'boxes': box_capacity * 3}
+        self.obs = np.zeros(sum(sizes.values()))
+        views, offset = {}, 0
+        for name, size in sizes.items():
+            views[name] = self.obs[offset:offset + size]
+            offset += size
+        self.player = views['player']
+        self.heat = views['heat'].reshape(-1, len(HEAT_FIELDS))
+        self.aliens = views['aliens'].reshape(-1, 3)
+        self.bullets = views['bullets'].reshape(-1, 3)
+        self.alien_bullets = views['alien_bullets'].reshape(-1, 3)
+        self.boxes = views['boxes'].reshape(-1, 3)
+        self.alien_offsets = np.zeros((len(self.aliens), 2))
+        self.observation_size = len(self.obs)
+
+    def reset(self, seed=None):
+        """Starts a new game and returns the observation. Without a seed each game is seeded from the last."""
+        if seed is None and self.runner is not None:
+            seed = self.model.rand.getrandbits(64)
+        elif seed is None:
+            seed = self.seed
+        self.runner = HeadlessRunner(seed=seed, difficulty=self.difficulty, dt=self.dt, swarm=self.swarm)
+        self.model = self.runner.model = self.runner.new_model(0, self.difficulty)
+        self.steps = 0
+        self.held = None
+        self.alien_model = None
+        self.observe()
+        return self.obs
+
+    def step(self, action):
+        """Plays frame_skip ticks. Returns (observation, reward, done, info); reward is the points scored."""
+        model, start_points, done = self.play(action)
+        reward = model.points - start_points
+        self.steps += 1
+        truncated = self.max_steps is not None and self.steps >= self.max_steps
+        self.observe()
+        return self.obs, reward, done or truncated, {'points': model.points, 'difficulty': model.difficulty,
+                                                     'lives': model.lives, 'truncated': truncated and not done}
+
+    def play(self, action):
+        model = self.model
+        start_points = model.points
+        self.move(action & (LEFT | RIGHT))
+        for bit, key_val in ((FIRE_Q, Key.Q), (FIRE_W, Key.W)):
+            if action & bit:
+                model.action(key_val, KEY_PRESS)
+                model.action(key_val, KEY_RELEASE)
+
+        done = False
+        for _ in range(self.frame_skip):
+            model.update(self.dt)
+            events = model.events
+            if events.pending(GameEvent.EventType.GAME_OVER) or events.pending(GameEvent.EventType.EXIT_MENU):
+                done = True
+            elif events.pending(GameEvent.EventType.NEXT_LEVEL):
+                model = self.next_model(model.points, model.difficulty + 1, model.lives)
+            elif events.pending(GameEvent.EventType.RESET_SCREEN):
+                model = self.next_model(model.points, 0, model.lives)
+            events.clear()
+            if done:
+                break
+        return model, start_points, done
+
+    def next_model(self, points, difficulty, lives):
+        # Points and lives carry over; the previous level seeds the next, as in the headless runner.
+        self.model = self.runner.model = self.runner.new_model(points, difficulty, lives)
+        self.held = None
+        return self.model
+
+    def move(self, bits):
+        key_val = Key.LEFT if bits == LEFT else Key.RIGHT if bits == RIGHT else None
+        if key_val != self.held:
+            if self.held is not None:
+                self.model.action(self.held, KEY_RELEASE)
+            if key_val is not None:
+                self.model.action(key_val, KEY_PRESS)
+            self.held = key_val
+
+    def observe(self):
+        model = self.model
+        player = model.player
+        self.player[:] = (player.x, player.y, player.dx, player.is_blown, player.is_double_blown, model.lives,
+                          model.difficulty)
+        heat = model.heat
+        for i, gun in enumerate(heat.guns):
+            self.heat[i] = (heat.countdown(i), gun.variable, gun.jam)
+
+        objects = model.objects
+        if model is not self.alien_model or len(objects) != self.alien_count:  # aliens only ever leave the block
+            self.alien_model, self.alien_count = model, len(objects)
+            if objects:
+                self.alien_offsets[:len(objects)] = [(mob.ox, mob.oy) for mob in objects]
+            self.aliens[len(objects):] = 0
+            self.aliens[:len(objects), 2] = 1
+        n = self.alien_count
+        np.add(self.alien_offsets[:n], (model.formation.x, model.formation.y), out=self.aliens[:n, :2])
+
+        for view, bullets in ((self.bullets, model.bullets), (self.alien_bullets, model.alien_bullets)):
+            n = len(bullets)
+            if n > len(view):  # more in flight than the view holds, the oldest fill it
+                n = len(view)
+                view[:, 0], view[:, 1] = bullets.xs[:n], bullets.ys[:n]
+            else:
+                view[:n, 0], view[:n, 1] = bullets.xs, bullets.ys  # copied through the buffer protocol
+            view[:n, 2] = 1
+            view[n:, 2] = 0
+
+        boxes = model.boxes[:len(self.boxes)]
+        for i, box in enumerate(boxes):
+            self.boxes[i] = (box.x, box.y, 1)
+        self.boxes[len(boxes):, 2] = 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Step the environment with random actions and report its speed.")
+    parser.add_argument('--steps', type=int, default=100000)
+    parser.add_argument('--frame-skip', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    env = SpaceCloneEnv(args.frame_skip, seed=args.seed)
+    rand = np.random.RandomState(args.seed)
+    actions = rand.randint(N_ACTIONS, size=args.steps)
+    env.reset(args.seed)
+    episodes, score = 0, 0
+    start = time.perf_counter()
+    for action in actions.tolist():
+        obs, reward, done, info = env.step(action)
+        score += reward
+        if done:
+            episodes += 1
+            env.reset()
+    seconds = time.perf_counter() - start
+    print(f'steps: {args.steps}\nseconds: {seconds:.3f}\nsteps/second: {args.steps / seconds:.0f}\n'
+          f'ticks/second: {args.steps * args.frame_skip / seconds:.0f}\nepisodes finished: {episodes}\n'
+          f'points: {score}\nobservation size: {env.observation_size}')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,12 +7,14 @@ import sys
 from pyglet import graphics
 from pyglet.graphics import Batch, GL_QUADS, GL_LINES
 
-from db_adapter import DataBaseAdapter
+from db_adapter import WriteBehindAdapter
+from labels import LabelCache
 from model import GameModel, GameEvent, GameObject
+from controls import KEY_PRESS, KEY_RELEASE
+from timestep import FixedTimestep
 from functools import partial
 import os
-
-KEY_PRESS, KEY_RELEASE = 0, 1
+import log
 
 """frame.py: Parent class of game frame."""
 
@@ -41,15 +43,26 @@ class GameFrame(Window):
                    Scene.MAIN_MENU,
                    Scene.CLOSING]
 
+    profiler = None  # a FrameProfiler when frames are being timed
+    STEP_DT = 1 / 60  # simulation rate, independent of the display's
+    MAX_CATCH_UP_STEPS = 5
+    LOG_RING_SIZE = 2000  # records F5 dumps in dev mode
+
     main_width: int = 1700
     main_height: int = 800
     header_height: int = 50
 
-    def __init__(self, dev_mode=False):
+    def __init__(self, dev_mode=False, log_file=None):
+        # Console output as SPACE_CLONE_LOG asks for it; the ring is always kept for F5.
+        log.configure(console=bool(os.environ.get(log.ENV_VAR)), ring_size=self.LOG_RING_SIZE, file=log_file)
+        self.labels = LabelCache('8Bit Wonder')  # button and screen text, laid out once per text
+        self.db_adapter = WriteBehindAdapter.shared()  # starts reading the high score while the window opens
         if dev_mode:
-            DataBaseAdapter().set_high_score(0)
+            self.db_adapter.set_high_score(0)
         self.model = None
+        self.timestep = FixedTimestep(self.update, self.STEP_DT, self.MAX_CATCH_UP_STEPS)
         GameFrame.dev_mode = dev_mode
+        GameModel.dev_mode = dev_mode
         super(GameFrame, self).__init__(self.main_width, self.main_height + self.header_height, visible=False)
         self.line_width = 4
         pyglet.gl.glLineWidth(4)
@@ -86,7 +99,14 @@ class GameFrame(Window):
 
     def on_key_release(self, symbol, modifiers):
         if symbol == key.ESCAPE:
+            self.db_adapter.close()
             sys.exit()
+        elif symbol == key.F3 and self.profiler is not None:
+            self.profiler.visible = not self.profiler.visible
+        elif symbol == key.F4 and self.profiler is not None:
+            self.export_profile()
+        elif symbol == key.F5 and GameFrame.dev_mode:
+            log.dump()
         elif symbol == key.P:
             if self.scene == self.Scene.PLAYING:
                 self.change_scene(self.Scene.PAUSED)
@@ -100,6 +120,12 @@ class GameFrame(Window):
                                                    self.Scene.PAUSED}:
             self.menu_mouse_action(x, y)
 
+    def on_frame(self, dt):
+        """Scheduled every frame with the real time since the last, runs update() at the fixed STEP_DT."""
+        if self.profiler is not None:
+            self.profiler.next_frame()
+        self.timestep.advance(dt)
+
     def on_draw(self):
         if self.scene in {self.Scene.MAIN_MENU, self.Scene.MAIN_MENU_WITH_OPTIONS}:
             self.clear()
@@ -108,7 +134,7 @@ class GameFrame(Window):
             if self.scene == self.Scene.MAIN_MENU_WITH_OPTIONS:
                 self.draw_options_panel()
         else:
-            self.draw_game_screen()
+            self.draw_game_screen(self.timestep.alpha)
 
     def menu_mouse_action(self, x, y):
         if self.scene == self.Scene.MAIN_MENU:
@@ -135,14 +161,8 @@ class GameFrame(Window):
                                                 btn.x + btn.width // 2, btn.y + btn.height // 2,
                                                 btn.x + btn.width // 2, btn.y - btn.height // 2]],
                           ['c4B', tuple(btn.color)])
-            btn_lbl = pyglet.text.Label(btn.lbl,
-                                        font_name='8Bit Wonder',
-                                        font_size=0.3 * btn.height,
-                                        width=btn.width, height=0.5 * btn.height,
-                                        x=btn.x, y=btn.y,
-                                        anchor_x='center', anchor_y='center',
-                                        color=(255, 255, 255, btn.get_alpha()))
-            btn_lbl.draw()
+            self.labels.draw(btn, btn.lbl, 0.3 * btn.height, btn.x, btn.y, width=btn.width, height=0.5 * btn.height,
+                             anchor_x='center', anchor_y='center', alpha=btn.get_alpha())
 
     def draw_options_panel(self):
         origin_x = self.OPT_ORIGIN_X_PERCENT * self.width
@@ -173,14 +193,8 @@ class GameFrame(Window):
                                                     btn.x + btn.width // 2, btn.y - btn.height // 2,
                                                     btn.x - btn.width // 2, btn.y - btn.height // 2]])
 
-            btn_lbl = pyglet.text.Label(btn.lbl,
-                                        font_name='8Bit Wonder',
-                                        font_size=0.3 * btn.height,
-                                        width=btn.width, height=0.5 * btn.height,
-                                        x=btn.x, y=btn.y,
-                                        anchor_x='center', anchor_y='center',
-                                        color=(255, 255, 255, btn.get_alpha()))
-            btn_lbl.draw()
+            self.labels.draw(btn, btn.lbl, 0.3 * btn.height, btn.x, btn.y, width=btn.width, height=0.5 * btn.height,
+                             anchor_x='center', anchor_y='center', alpha=btn.get_alpha())
         btn = self.close_btn
         btn_width = self.height * GameFrame.MAIN_BTN_HEIGHT_PERCENT
         x1, y1 = btn.x - btn.width // 2, btn.y - btn.height // 2
@@ -230,14 +244,8 @@ class GameFrame(Window):
                                                 btn.x + btn.width // 2, btn.y + btn.height // 2,
                                                 btn.x + btn.width // 2, btn.y - btn.height // 2]],
                           ['c4B', tuple(btn.color)])
-            btn_lbl = pyglet.text.Label(btn.lbl,
-                                        font_name='8Bit Wonder',
-                                        font_size=0.3 * btn.height,
-                                        width=btn.width, height=0.5 * btn.height,
-                                        x=btn.x, y=btn.y,
-                                        anchor_x='center', anchor_y='center',
-                                        color=(255, 255, 255, btn.get_alpha()))
-            btn_lbl.draw()
+            self.labels.draw(btn, btn.lbl, 0.3 * btn.height, btn.x, btn.y, width=btn.width, height=0.5 * btn.height,
+                             anchor_x='center', anchor_y='center', alpha=btn.get_alpha())
 
     def set_btns(self):
         btn_width, btn_height = self.width * GameFrame.MAIN_BTN_WIDTH_PERCENT, \
@@ -361,7 +369,10 @@ class GameFrame(Window):
     def update(self, dt):
         raise NotImplementedError
 
-    def draw_game_screen(self):
+    def draw_game_screen(self, alpha=1.0):
+        raise NotImplementedError
+
+    def export_profile(self):
         raise NotImplementedError
 
     def get_font(self):
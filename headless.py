@@ -0,0 +1,189 @@
+import argparse
+import logging
+import random
+import time
+from collections import Counter
+
+import log
+from controls import Key, KEY_PRESS, KEY_RELEASE
+from db_adapter import MemoryDataBaseAdapter
+from model import Model, GameEvent, Swarm
+from replay import Recorder
+
+"""headless.py: Steps the model without a window or GL context, as fast as the CPU allows.
+
+Usage: python headless.py --ticks 100000 --seed 7 [--script inputs.txt] [--difficulty 0] [--swarm 40x75]"""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+ACTION_NAMES = {'press': KEY_PRESS, 'release': KEY_RELEASE}
+
+
+class ScriptedInput:
+    """Feeds a fixed list of (tick, key_val, action_type) entries to the model."""
+
+    def __init__(self, entries):
+        self.by_tick = {}
+        for tick, key_val, action_type in entries:
+            self.by_tick.setdefault(tick, []).append((key_val, action_type))
+
+    @staticmethod
+    def from_file(path):
+        """Reads lines of the form '<tick> <press|release> <KEY>', e.g. '120 press Q'. '#' starts a comment."""
+        entries = []
+        with open(path) as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                tick, action, key_name = line.split()
+                entries.append((int(tick), Key.NAMES[key_name.upper()], ACTION_NAMES[action.lower()]))
+        return ScriptedInput(entries)
+
+    def poll(self, tick, model):
+        return self.by_tick.get(tick, ())
+
+
+class RandomInput:
+    """Seeded stand-in player that wanders left and right and fires both guns."""
+
+    def __init__(self, seed=None, fire_chance=0.08, turn_chance=0.03):
+        self.rand = random.Random(seed)
+        self.fire_chance = fire_chance
+        self.turn_chance = turn_chance
+        self.held = None
+
+    def poll(self, tick, model):
+        actions = []
+        if self.held is not None and self.rand.random() < self.turn_chance:
+            actions.append((self.held, KEY_RELEASE))
+            self.held = None
+        elif self.held is None and self.rand.random() < self.turn_chance:
+            self.held = Key.LEFT if self.rand.random() < 0.5 else Key.RIGHT
+            actions.append((self.held, KEY_PRESS))
+        if self.rand.random() < self.fire_chance:
+            gun = Key.Q if self.rand.random() < 0.5 else Key.W
+            actions.append((gun, KEY_PRESS))
+            actions.append((gun, KEY_RELEASE))
+        return actions
+
+
+class RunResult:
+    def __init__(self, ticks, seconds, model, levels, event_counts, game_over):
+        self.ticks = ticks
+        self.seconds = seconds
+        self.points = model.points
+        self.difficulty = model.difficulty
+        self.levels = levels
+        self.event_counts = event_counts
+        self.game_over = game_over
+
+    @property
+    def ticks_per_second(self):
+        return self.ticks / self.seconds if self.seconds > 0 else float('inf')
+
+    def report(self):
+        lines = [f'ticks: {self.ticks}',
+                 f'seconds: {self.seconds:.3f}',
+                 f'ticks/second: {self.ticks_per_second:.0f}',
+                 f'final score: {self.points}',
+                 f'levels cleared: {self.levels}',
+                 f'game over: {self.game_over}',
+                 'events:']
+        lines.extend(f'  {name}: {count}' for name, count in sorted(self.event_counts.items()))
+        return '\n'.join(lines)
+
+
+class HeadlessRunner:
+    """Plays the same scene flow as SpaceWindow (next level, restart, game over) minus the countdowns."""
+
+    def __init__(self, inputs=None, seed=None, difficulty=0, dt=1 / 60, db_adapter=None, recorder=None, swarm=None):
+        self.seed = seed
+        self.inputs = RandomInput(seed) if inputs is None else inputs
+        self.difficulty = difficulty
+        self.dt = dt
+        self.db_adapter = MemoryDataBaseAdapter() if db_adapter is None else db_adapter
+        self.recorder = recorder
+        self.swarm = swarm
+        self.model = None
+
+    def new_model(self, pts=0, difficulty=0, lives=Model.START_LIVES):
+        # Each level is seeded from the previous one, so the run seed fixes the whole run.
+        seed = self.seed if self.model is None else self.model.rand.getrandbits(64)
+        return Model(pts, difficulty, db_adapter=self.db_adapter, seed=seed, recorder=self.recorder,
+                     swarm=self.swarm, lives=lives)
+
+    def run(self, ticks):
+        self.model = None
+        try:
+            return self._run(ticks)
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+
+    def _run(self, ticks):
+        self.model = self.new_model(0, self.difficulty)
+        counts = Counter()
+        levels = 0
+        game_over = False
+        tick = 0
+        start = time.perf_counter()
+        while tick < ticks and not game_over:
+            model = self.model
+            for key_val, action_type in self.inputs.poll(tick, model):
+                model.action(key_val, action_type)
+            model.update(self.dt)
+            tick += 1
+
+            for ev in model.get_game_events().drain():
+                counts[ev.type.name] += 1
+                if ev.type == GameEvent.EventType.NEXT_LEVEL:
+                    levels += 1
+                    self.model = self.new_model(model.points, model.difficulty + 1, model.lives)
+                    break
+                elif ev.type == GameEvent.EventType.RESET_SCREEN:
+                    self.model = self.new_model(model.points, 0, model.lives)
+                    break
+                elif ev.type in (GameEvent.EventType.GAME_OVER, GameEvent.EventType.EXIT_MENU):
+                    game_over = True
+        seconds = time.perf_counter() - start
+        return RunResult(tick, seconds, self.model, levels, dict(counts), game_over)
+
+
+def run(ticks, seed=None, inputs=None, difficulty=0, record=None, swarm=None):
+    """Python API: runs `ticks` model updates and returns a RunResult. record names a replay file to write."""
+    recorder = Recorder(record) if record else None
+    return HeadlessRunner(inputs, seed, difficulty, recorder=recorder, swarm=swarm).run(ticks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Space Clone without a window.")
+    parser.add_argument('--ticks', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--difficulty', type=int, default=0)
+    parser.add_argument('--script', help="input script, lines of '<tick> <press|release> <KEY>'")
+    parser.add_argument('--record', help="write a replay of the run to this file")
+    parser.add_argument('--swarm', help="ROWSxCOLUMNS formation, e.g. 40x75, aliens shrunk to fit")
+    parser.add_argument('--alien-bullets', type=int, default=100, help="alien bullet cap in swarm mode")
+    parser.add_argument('--player-bullets', type=int, default=None, help="player bullet cap in swarm mode")
+    parser.add_argument('--verbose', action='store_true', help="log model debug messages to stderr")
+    args = parser.parse_args(argv)
+    if args.swarm and args.record:
+        parser.error("swarm games cannot be recorded")
+
+    if args.verbose:
+        log.configure(logging.DEBUG, console=True)
+    inputs = ScriptedInput.from_file(args.script) if args.script else None
+    swarm = None
+    if args.swarm:
+        swarm = Swarm.from_spec(args.swarm, alien_bullet_max=args.alien_bullets,
+                                player_bullet_max=args.player_bullets)
+    result = run(args.ticks, args.seed, inputs, args.difficulty, record=args.record, swarm=swarm)
+    print(result.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import heapq
+import math
+from bisect import bisect_left
+
+from log import get_logger
+
+"""heat.py: Weapon heat for any number of guns, worked out when a gun fires or recovers rather than every tick.
+
+A gun's countdown drops by the recovery rate every step while above 0; at or below 0 it resets to `countdown` and the
+gun unjams. Firing while the countdown is above 0 raises it and the gun's overheat variable, and the gun jams once
+the variable reaches its limit. As the countdown cools through the phase table the variable drops back to the phase
+it is in. A gun's countdown is kept as its value at some step, so nothing is touched between fires and recoveries:
+the steps where a gun's phase can next change, or where it recovers, wait in heaps, and a step with nothing due costs
+a look at the top of each heap however many guns there are."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+logger = get_logger(__name__)
+
+
+def phase_table(countdown, overheat_constant, overheat_base, bullet_max):
+    overheat, i = overheat_base, 1
+    first = [overheat_constant / overheat for overheat in range(overheat, bullet_max + overheat)]
+    while 1 <= i < len(first):
+        first[i] += first[i - 1]
+        i += 1
+    return [i + countdown for i in first]
+
+
+class HeatGun:
+    __slots__ = ('name', 'value', 'since', 'variable', 'phase', 'jam', 'version')
+
+    def __init__(self, name, value, variable):
+        self.name = name
+        self.value = value  # the countdown at step `since`
+        self.since = 0
+        self.variable = variable
+        self.phase = 0
+        self.jam = False
+        self.version = 0  # bumped on every re-anchor, retiring the gun's queued wakeups
+
+
+class WeaponHeat:
+    def __init__(self, names, countdown=1000, overheat_constant=60, overheat_base=2, recovery_rate=15, bullet_max=6):
+        self.countdown_reset = countdown
+        self.overheat_constant = overheat_constant
+        self.overheat_base = overheat_base
+        self.recovery_rate = recovery_rate
+        self.phases = phase_table(countdown, overheat_constant, overheat_base, bullet_max)
+        self.now = 0  # steps taken
+        self.guns = [HeatGun(name, countdown, overheat_base) for name in names]
+        self.checks = []  # (step, version, gun) where the gun's heat phase may change
+        self.recoveries = []  # (step, version, gun) where the gun's countdown is at or below 0
+        for i in range(len(self.guns)):
+            self.anchor(i, countdown, 0)
+        logger.debug('heat phases %s', self.phases)
+
+    def countdown(self, i):
+        gun = self.guns[i]
+        return gun.value - self.recovery_rate * (self.now - gun.since)
+
+    def jammed(self):
+        return any(gun.jam for gun in self.guns)
+
+    def state(self):
+        """Countdowns, jams, overheat variables and phases, each for every gun in turn."""
+        guns = self.guns
+        return tuple(self.countdown(i) for i in range(len(guns))) + tuple(gun.jam for gun in guns) + \
+            tuple(gun.variable for gun in guns) + tuple(gun.phase for gun in guns)
+
+    def set_state(self, i, countdown, variable, phase, jam):
+        gun = self.guns[i]
+        gun.variable, gun.phase, gun.jam = variable, phase, jam
+        self.anchor(i, countdown, self.now)
+
+    def reset(self):
+        """Every gun cold and unjammed, as at the start of a level."""
+        for i in range(len(self.guns)):
+            self.set_state(i, self.countdown_reset, self.overheat_base, 0, False)
+
+    def anchor(self, i, value, step):
+        gun = self.guns[i]
+        gun.value, gun.since = value, step
+        gun.version += 1
+        heapq.heappush(self.checks, (step, gun.version, i))
+        heapq.heappush(self.recoveries, (self.step_reaching(gun, 0), gun.version, i))
+
+    def step_reaching(self, gun, level):
+        """First step at which gun's countdown is at or below level, counted the way countdown() counts."""
+        rate = self.recovery_rate
+        k = max(0, math.ceil((gun.value - level) / rate))
+        while k > 0 and gun.value - rate * (k - 1) <= level:
+            k -= 1
+        while gun.value - rate * k > level:
+            k += 1
+        return gun.since + k
+
+    def fire(self, i, jam_at):
+        """Gun i's trigger is pulled. False while it is jammed, a press at or below 0 unjams it without firing.
+        Otherwise the gun fires, heating up when its countdown is above 0 and jamming at jam_at overheat."""
+        gun = self.guns[i]
+        value = self.countdown(i)
+        if gun.jam:
+            if value <= 0:
+                logger.debug('%s unjammed %s', gun.name, value)
+                gun.jam = False
+            return False
+        if value > 0:
+            if gun.variable == self.overheat_base:  # first shot from cold adds the whole countdown
+                value += self.countdown_reset + self.overheat_constant / gun.variable
+            else:
+                value += self.overheat_constant / gun.variable
+            gun.variable += 1
+            if gun.variable >= jam_at:
+                gun.jam = True
+            self.anchor(i, value, self.now)
+        else:
+            logger.debug('%s_success', gun.name)
+        return True
+
+    def step(self):
+        now = self.now
+        checks, recoveries, guns = self.checks, self.recoveries, self.guns
+        while checks and checks[0][0] <= now:
+            _, version, i = heapq.heappop(checks)
+            if version == guns[i].version:
+                self.check_phase(i)
+        while recoveries and recoveries[0][0] <= now:
+            _, version, i = heapq.heappop(recoveries)
+            if version == guns[i].version:
+                guns[i].jam = False
+                self.anchor(i, self.countdown_reset, now + 1)
+        self.now = now + 1
+
+    def check_phase(self, i):
+        gun = self.guns[i]
+        value = self.countdown(i)
+        j = bisect_left(self.phases, value)  # phases[j - 1] < value <= phases[j]
+        if 0 < j < len(self.phases) and j - 1 != gun.phase:
+            gun.variable = j - 1 + self.overheat_base
+            gun.phase = j - 1
+            logger.debug('%s heat phase changed to %d %s', gun.name, gun.phase, value)
+        if j > 0:
+            heapq.heappush(self.checks, (self.step_reaching(gun, self.phases[j - 1]), gun.version, i))
@@ -0,0 +1,65 @@
+import string
+
+import pyglet
+
+"""labels.py: Text labels kept from frame to frame instead of rebuilt every draw.
+
+A screen asks for its label by key each frame it draws it. Only new text or a new size or layout lays the label out
+again; position and alpha are updated in place, which pyglet does without touching the glyphs. warm() rasterises a
+font's glyphs at the sizes the screens use before the first frame, so no frame pays for loading them."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+WARM_CHARACTERS = string.ascii_letters + string.digits + string.punctuation + ' '
+
+
+class LabelCache:
+    def __init__(self, font_name, batch=None):
+        self.font_name = font_name
+        self.batch = batch  # labels go in it when given, else each draws itself
+        self.labels = {}  # key -> [Label, (font_size, width, height, anchor_x, anchor_y), text, x, y, alpha]
+        self.fonts = []  # warmed fonts, held so pyglet keeps their glyph textures
+
+    def __len__(self):
+        return len(self.labels)
+
+    def get(self, key, text, font_size, x, y, width=None, height=None, anchor_x='left', anchor_y='baseline',
+            alpha=255):
+        layout = (font_size, width, height, anchor_x, anchor_y)
+        entry = self.labels.get(key)
+        if entry is None or entry[1] != layout:
+            if entry is not None:
+                entry[0].delete()
+            label = pyglet.text.Label(text, font_name=self.font_name, font_size=font_size, width=width,
+                                      height=height, x=x, y=y, anchor_x=anchor_x, anchor_y=anchor_y,
+                                      color=(255, 255, 255, alpha), batch=self.batch)
+            self.labels[key] = [label, layout, text, x, y, alpha]
+            return label
+        label = entry[0]
+        if entry[2] != text:
+            label.text = entry[2] = text
+        if entry[3] != x:
+            label.x = entry[3] = x
+        if entry[4] != y:
+            label.y = entry[4] = y
+        if entry[5] != alpha:
+            label.color = (255, 255, 255, alpha)
+            entry[5] = alpha
+        return label
+
+    def draw(self, key, text, font_size, x, y, **layout):
+        self.get(key, text, font_size, x, y, **layout).draw()
+
+    def retain(self, keys):
+        """Deletes every label whose key is not in keys."""
+        for key in [key for key in self.labels if key not in keys]:
+            self.labels.pop(key)[0].delete()
+
+    def warm(self, sizes, characters=WARM_CHARACTERS):
+        for size in sorted(set(sizes)):
+            font = pyglet.font.load(self.font_name, size)
+            font.get_glyphs(characters)
+            self.fonts.append(font)
@@ -0,0 +1,128 @@
+import atexit
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+"""log.py: Level-gated logging for the game modules, on top of the standard logging package.
+
+Modules log through get_logger(__name__); a call below its module's level returns after one cached level check, so
+hot paths cost next to nothing while quiet. configure() sets the levels and where records go: stderr, an in-memory
+ring buffer that dump() writes out on demand, and/or a file written from a background thread. The window keeps a
+ring from startup and dumps it to stderr on F5 in dev mode.
+
+Levels can also come from the environment, e.g. SPACE_CLONE_LOG="WARNING,model=DEBUG,db_adapter=INFO", and file=PATH
+in it adds the file sink."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+ROOT = 'space_clone'
+ENV_VAR = 'SPACE_CLONE_LOG'
+FILE_KEY = 'file'  # SPACE_CLONE_LOG entry naming the log file
+FORMAT = '%(relativeCreated)9.1f %(levelname)-7s %(name)s: %(message)s'
+
+root = logging.getLogger(ROOT)
+root.setLevel(logging.WARNING)
+root.propagate = False
+root.addHandler(logging.NullHandler())  # quiet until configured, not even the lastResort stderr handler
+
+ring = None
+listener = None
+
+
+def get_logger(module_name):
+    return logging.getLogger(f'{ROOT}.{module_name}')
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` records unformatted; formatting waits until dump()."""
+
+    def __init__(self, capacity=2000):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def dump(self, stream):
+        formatter = self.formatter or logging.Formatter(FORMAT)
+        for record in list(self.records):
+            stream.write(formatter.format(record) + '\n')
+        stream.flush()
+
+
+def parse_levels(spec):
+    """'WARNING,model=DEBUG,file=game.log' -> ('WARNING', {'model': 'DEBUG', 'file': 'game.log'})"""
+    level, levels = None, {}
+    for part in filter(None, (part.strip() for part in spec.split(','))):
+        if '=' in part:
+            name, value = (half.strip() for half in part.split('=', 1))
+            levels[name] = value if name == FILE_KEY else value.upper()
+        else:
+            level = part.upper()
+    return level, levels
+
+
+def configure(level=None, levels=None, console=False, ring_size=0, file=None):
+    """Replaces the current setup. level is the default for every module, levels maps module names to their own
+    level, console logs to stderr, ring_size > 0 keeps that many records for dump(), file logs asynchronously to
+    that path. Unset levels and file fall back to SPACE_CLONE_LOG, then WARNING and no file."""
+    global ring, listener
+    shutdown()
+    ring = None
+    env_level, env_levels = parse_levels(os.environ.get(ENV_VAR, ''))
+    file = file or env_levels.pop(FILE_KEY, None)
+    root.setLevel(level or env_level or logging.WARNING)
+    for name in list(logging.Logger.manager.loggerDict):
+        if name.startswith(ROOT + '.'):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+    for name, value in dict(env_levels, **(levels or {})).items():
+        get_logger(name).setLevel(value)
+
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    formatter = logging.Formatter(FORMAT)
+    if console:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    if ring_size:
+        ring = RingBufferHandler(ring_size)
+        ring.setFormatter(formatter)
+        root.addHandler(ring)
+    if file:
+        # The game thread only enqueues; a listener thread formats and writes.
+        records = queue.SimpleQueue()
+        file_handler = logging.FileHandler(file, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        listener = logging.handlers.QueueListener(records, file_handler)
+        listener.start()
+        root.addHandler(logging.handlers.QueueHandler(records))
+    if not root.handlers:
+        root.addHandler(logging.NullHandler())
+
+
+def dump(stream=None):
+    """Writes the ring buffer's records, oldest first, to stream (stderr by default)."""
+    if ring is not None:
+        ring.dump(stream or sys.stderr)
+
+
+def shutdown():
+    """Stops the file sink's thread once everything queued is written."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+
+atexit.register(shutdown)
+if os.environ.get(ENV_VAR):
+    configure(console=True)
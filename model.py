@@ -1,8 +1,14 @@
-from pyglet.window import key
 import enum
-from random import random as rando
+import math
+import random
+import struct
+from array import array
 from abc import ABCMeta, abstractmethod
-from db_adapter import DataBaseAdapter
+from db_adapter import WriteBehindAdapter
+from controls import Key, KEY_PRESS, KEY_RELEASE
+from collision import SpatialGrid, point_in_box, corner_in_box
+from heat import WeaponHeat
+from log import get_logger
 
 """view.py: Front end."""
 
@@ -11,10 +17,13 @@ __licence__ = "GNU General Public License v3.0"
 __email__ = "danielskyrme@hotmail.com"
 __credits__ = ["Daniel Skyrme"]
 
+logger = get_logger(__name__)
+
 
 class GameModel:
     MODEL_WIDTH = 800
     MODEL_HEIGHT = 600
+    dev_mode = False  # Set by the frame, enables debug keys
 
     @abstractmethod
     def update(self, dt):
@@ -30,6 +39,8 @@ class GameModel:
 
 
 class GameEvent:
+    __slots__ = ('type', 'coordinates', 'sound', 'args')
+
     class EventType(enum.Enum):
         ALIEN_DEATH = 1
         PLAYER_DEATH = 2
@@ -58,7 +69,102 @@ class GameEvent:
         return f'{self.type}, at: {self.coordinates}\nwith sound: {self.sound} and args: {self.args}.'
 
 
+class EventChannel:
+    """Ring of reusable GameEvent records for a single event type."""
+    __slots__ = ('type', 'records', 'head', 'size', 'emitted', 'overflows')
+
+    def __init__(self, type_of, capacity):
+        self.type = type_of
+        self.records = [GameEvent(type_of) for _ in range(capacity)]
+        self.head = 0
+        self.size = 0
+        self.emitted = 0
+        self.overflows = 0  # events dropped because the channel was full
+
+
+class EventQueue:
+    """Bounded event queue with one EventChannel per GameEvent.EventType and no allocation per event.
+
+    emit() fills the next free record of its type's channel and drops the event (counting an overflow) when that
+    channel is full. drain() hands back the pooled records themselves in emission order. A record is refilled once
+    its channel wraps round to it, so copy out anything that has to outlive the next update."""
+    __slots__ = ('channels', 'order', 'head', 'size')
+
+    def __init__(self, capacity=64):
+        self.channels = {type_of: EventChannel(type_of, capacity) for type_of in GameEvent.EventType}
+        self.order = [None] * (capacity * len(self.channels))  # channel of each pending event, oldest first
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def emit(self, type_of, coordinates=None, sound=None, args=None):
+        channel = self.channels[type_of]
+        size = channel.size
+        if size == len(channel.records):
+            channel.overflows += 1
+            return None
+        record = channel.records[(channel.head + size) % len(channel.records)]
+        record.coordinates = coordinates
+        record.sound = sound
+        record.args = args
+        channel.size = size + 1
+        channel.emitted += 1
+        self.order[(self.head + self.size) % len(self.order)] = channel
+        self.size += 1
+        return record
+
+    def pop(self):
+        channel = self.order[self.head]
+        self.head = (self.head + 1) % len(self.order)
+        self.size -= 1
+        record = channel.records[channel.head]
+        channel.head = (channel.head + 1) % len(channel.records)
+        channel.size -= 1
+        return record
+
+    def drain(self):
+        """Yields pending events oldest first until the queue is empty, including any emitted meanwhile."""
+        pop = self.pop
+        while self.size:
+            yield pop()
+
+    def drain_batches(self):
+        """Empties the queue as (event type, [records]) per pending type, oldest first within a type and types in
+        the order of their first pending event."""
+        firsts = {}
+        order, capacity = self.order, len(self.order)
+        for k in range(self.size):
+            channel = order[(self.head + k) % capacity]
+            if channel.type not in firsts:
+                firsts[channel.type] = channel
+        self.head = self.size = 0
+        for channel in firsts.values():
+            records, head, size = channel.records, channel.head, channel.size
+            channel.head = channel.size = 0
+            yield channel.type, [records[(head + k) % len(records)] for k in range(size)]
+
+    def clear(self):
+        for channel in self.channels.values():
+            channel.head = channel.size = 0
+        self.head = self.size = 0
+
+    def pending(self, type_of):
+        return self.channels[type_of].size
+
+    @property
+    def overflows(self):
+        return sum(channel.overflows for channel in self.channels.values())
+
+    def stats(self):
+        """{event name: (emitted, dropped)} since the queue was made."""
+        return {channel.type.name: (channel.emitted, channel.overflows) for channel in self.channels.values()}
+
+
 class GameObject:
+    __slots__ = ('x', 'y', 'img_name', 'width', 'height', 'dx', 'dy', 'is_active')
+
     def __init__(self, x, y, width, height, img_name):
         self.x = x  # x-coordinate from 0 to MODEL_WIDTH
         self.y = y  # y-coordinate from 0 to MODEL_HEIGHT
@@ -75,6 +181,8 @@ class Projectile(enum.Enum):
 
 
 class Player(GameObject):
+    __slots__ = ('is_blown', 'is_double_blown')
+
     def __init__(self, x, y, width, height, img_name):
         super().__init__(x, y, width, height, img_name)
         self.is_blown = False
@@ -82,6 +190,8 @@ class Player(GameObject):
 
 
 class Box(GameObject):
+    __slots__ = ('box_type',)
+
     class BoxType(enum.Enum):
         SHOOT_FAST = 1
 
@@ -91,14 +201,112 @@ class Box(GameObject):
         self.box_type = box_type
 
 
+class Formation:
+    """Origin of the alien block. A march step moves the origin, aliens keep their offsets from it."""
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+
 class Alien(GameObject):
-    def __init__(self, x, y, width, height, img_name):
+    __slots__ = ('formation', 'ox', 'oy')
+
+    def __init__(self, x, y, width, height, img_name, formation=None):
+        self.formation = Formation() if formation is None else formation
         super().__init__(x, y, width, height, img_name)
         self.dx = 1
 
+    @property
+    def x(self):
+        return self.formation.x + self.ox
+
+    @x.setter
+    def x(self, x):
+        self.ox = x - self.formation.x
+
+    @property
+    def y(self):
+        return self.formation.y + self.oy
+
+    @y.setter
+    def y(self, y):
+        self.oy = y - self.formation.y
+
+
+class BulletArray:
+    """Bullet positions as two flat arrays of doubles rather than a list of [x, y] lists. Indexing and iteration
+    give (x, y) tuples."""
+    __slots__ = ('xs', 'ys')
+
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, i):
+        return self.xs[i], self.ys[i]
+
+    def __iter__(self):
+        return zip(self.xs, self.ys)
+
+    def append(self, x, y):
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def pop(self, i):
+        return self.xs.pop(i), self.ys.pop(i)
+
+    def clear(self):
+        del self.xs[:], self.ys[:]
+
 
 change_dict = {'points': 0, 'lives': 3, 'tick_speed': 60, 'alien_shoot_rate': 56}
 
+# Model.snapshot() layout, little-endian: the fixed fields of SNAPSHOT_HEAD (heat steps taken after the tick), then
+# SNAPSHOT_GUN per gun, x, y per alien (screen positions, restored as offsets from a new formation at the origin), x, y
+# per bullet and per alien bullet, x, y, dx, dy per power box, then the Mersenne Twister state (gauss_next d + 625
+# words).
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEAD = struct.Struct('<BQqqiiQib3?id2d4d3?B5I')
+SNAPSHOT_GUN = struct.Struct('<?dii')
+SNAPSHOT_RNG = struct.Struct('<d625I')
+PLAYER_IMAGES = ("x-wing.png", "x-wing_burnt.png", "x-wing_very_burnt.png")
+
+
+class Swarm:
+    """Formation size, alien size and bullet caps for swarm mode, for pushing the game to its scaling limits.
+
+    Alien width and height default to the largest that fit `columns` across the standard spacing and `rows` into the
+    top half of the screen. player_bullet_max None leaves the player's bullets uncapped, as in a normal game.
+    Swarm games are not recorded by replay.Recorder."""
+
+    def __init__(self, rows, columns, alien_width=None, alien_height=None, alien_bullet_max=100,
+                 player_bullet_max=None):
+        if rows < 1 or columns < 1:
+            raise ValueError(f'a swarm needs at least one row and column, got {rows}x{columns}')
+        self.rows = rows
+        self.columns = columns
+        span_x = Model.MODEL_WIDTH - Model.ALIEN_X_OFF * 7
+        span_y = Model.MODEL_HEIGHT / 2 - Model.ALIEN_Y_OFF
+        self.alien_width = alien_width or min(Model.ALIEN_WIDTH, span_x / (1.5 * columns - 0.5))
+        self.alien_height = alien_height or min(Model.ALIEN_HEIGHT, span_y / (1.3 * rows - 0.3))
+        self.alien_bullet_max = alien_bullet_max
+        self.player_bullet_max = player_bullet_max
+
+    @staticmethod
+    def from_spec(spec, **kwargs):
+        """'40x75' -> Swarm(40, 75, **kwargs)"""
+        rows, columns = (int(n) for n in spec.lower().split('x'))
+        return Swarm(rows, columns, **kwargs)
+
+    def __repr__(self):
+        return f'Swarm({self.rows}x{self.columns}, alien {self.alien_width:.1f}x{self.alien_height:.1f}, ' \
+               f'bullets {self.player_bullet_max}/{self.alien_bullet_max})'
+
 
 class Model(GameModel):
     PLAYER_SPEED = GameModel.MODEL_WIDTH / 130
@@ -106,19 +314,27 @@ class Model(GameModel):
     ALIEN_HEIGHT = GameModel.MODEL_HEIGHT / 15
     ALIEN_Y_OFF = GameModel.MODEL_HEIGHT / 30  # Offset from top of screen.
     ALIEN_X_OFF = GameModel.MODEL_WIDTH / 40  # Offset from side of screen.
-    PLAYER_LIVES = 2  # TODO temp while better solution not present
+    START_LIVES = 2
     HEAT_RECOVERY_RATE = 15
     OVERHEAT_THRESHOLD = 5
+    # Gun key, name, barrel (the ship's width over this from its left edge), and whether a press while jammed
+    # raises GUN_JAM. Each gun heats and jams on its own.
+    GUNS = ((Key.Q, 'q', 32, True), (Key.W, 'e', 1.04065, False))
+    GUN_KEYS = {gun[0]: i for i, gun in enumerate(GUNS)}
     LAST_STAND_THREASHOLD_RISE = 2
     PLAYER_BULLET_SPEED = 0.012
     BASE_ALIEN_BULLET_SPEED = 0.01
     DELTA_BULLET_SPEED_ON_DIFF = 0.002
+    EVENT_CAPACITY = 64  # per event type, between two drains
 
-    def __init__(self, pts=0, difficulty=0):
+    def __init__(self, pts=0, difficulty=0, db_adapter=None, seed=None, recorder=None, swarm=None, lives=START_LIVES):
         super().__init__()
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rand = random.Random(self.seed)  # all gameplay randomness, so a seed and the inputs replay a game
+        self.recorder = recorder
         self.difficulty = difficulty
         self.points = pts
-        self.db_adapter = DataBaseAdapter()
+        self.db_adapter = WriteBehindAdapter.shared() if db_adapter is None else db_adapter
         self.highscore = self.db_adapter.get_high_score()
         self.game_over = False
         self.tick = 1
@@ -127,68 +343,69 @@ class Model(GameModel):
         self.tick_speed = 25
         self.time = None
         self.ALIEN_MOVE_RIGHT = True
-        self.bullets = []
-        self.alien_bullets = []
+        self.bullets = BulletArray()
+        self.alien_bullets = BulletArray()
         self.bullet_max = 6
         self.alien_bullet_max = 3
+        self.player_bullet_max = None  # bullets in flight, None for no cap
+        self.swarm = swarm
+        if swarm is not None:
+            self.ALIEN_WIDTH, self.ALIEN_HEIGHT = swarm.alien_width, swarm.alien_height
+            self.alien_bullet_max = swarm.alien_bullet_max
+            self.player_bullet_max = swarm.player_bullet_max
         self.bullet_height = Model.MODEL_HEIGHT / 19
         self.alien_bullet_dy = (
                                            self.BASE_ALIEN_BULLET_SPEED + self.difficulty * self.DELTA_BULLET_SPEED_ON_DIFF) * Model.MODEL_HEIGHT
         self.player_bullet_dy = self.PLAYER_BULLET_SPEED * Model.MODEL_HEIGHT
         self.countdown = 1000  # Change for addition to timer in first heat phase
         self.input = True
-        self.q_countdown = self.countdown
-        self.e_countdown = self.countdown
         self.overheat_constant = 60  # Change for overheat_constant / overheat_variable added to countdown in action
-        self.overheat_base = 2  # Used for reference in action        |                 |
-        self.overheat_variable_e = self.overheat_base  # ""                                            ""
-        self.overheat_variable_q = self.overheat_base  # ""                                            ""
-
-        self.q_jam = False
-        self.e_jam = False
+        self.overheat_base = 2  # Used for reference in action
         self.keys_pressed = 0
         self.boxes = []
-        self.events = []
+        self.events = EventQueue(max(self.EVENT_CAPACITY, self.alien_bullet_max))
 
         self.objects = []  # list of Game Objects, will automatically draw on screen
+        self.formation = Formation()
+        # broadphase over self.objects by their offsets in the formation, so it never changes as the block marches
+        self.alien_grid = SpatialGrid(self.ALIEN_WIDTH, self.ALIEN_HEIGHT, 'ox', 'oy')
         self.player = Player(self.MODEL_WIDTH / 2, self.MODEL_WIDTH / 20,
-                             self.ALIEN_WIDTH, self.ALIEN_HEIGHT, "x-wing.png")
-        self.player_lives = 3
-
-        overheat, i = self.overheat_base, 1
-        first = [self.overheat_constant / overheat for overheat in range(overheat, self.bullet_max + overheat)]
-        while 1 <= i < len(first):
-            first[i] += first[i - 1]
-            i += 1
-        self.heat_phases = [i + self.countdown for i in first]
-        self.q_heat_phase = 0
-        self.e_heat_phase = 0
-        print(self.heat_phases)
-
-        alien_number = 0
-        alien_rows = 0
-        alien_columns = 0
-        alien_y = self.MODEL_HEIGHT - self.ALIEN_Y_OFF - self.ALIEN_HEIGHT  # Alien spawn y starting point.
-        while alien_y > self.MODEL_HEIGHT / 2 and alien_rows < 4:  # Alien y spawn endpoint.
-            alien_x = Model.ALIEN_X_OFF * 3  # Alien spawn x starting point.
-            while alien_x < self.MODEL_WIDTH - self.ALIEN_X_OFF * 4 and alien_columns < 15:  # Alien x spawn endpoint.
-                self.objects.append(Alien(alien_x, alien_y, self.ALIEN_WIDTH, self.ALIEN_HEIGHT, "alien.png"))
-                alien_number += 1
+                             Model.ALIEN_WIDTH, Model.ALIEN_HEIGHT, "x-wing.png")
+        self.lives = lives  # left after this level; the next model is built with them
 
-                if alien_columns == 0 and alien_rows == 0:
-                    self.BOX_START = self.objects[-1].x
+        self.heat = WeaponHeat([gun[1] for gun in self.GUNS], self.countdown, self.overheat_constant,
+                               self.overheat_base, self.HEAT_RECOVERY_RATE, self.bullet_max)
 
-                alien_x += self.ALIEN_WIDTH * 1.5  # Next alien spawn in row.
-                alien_columns += 1
-
-                if alien_columns == 14 and alien_rows == 0:
-                    self.BOX_END = self.objects[-1].x + Model.ALIEN_WIDTH  # Dynamic Box end spawn
-
-            alien_y -= self.ALIEN_HEIGHT * 1.3  # Next alien spawn in column.
-            alien_rows += 1
-            alien_columns = 0
-
-        self.aliens = alien_number
+        if swarm is None:
+            positions, self.BOX_START, self.BOX_END = self.formation_layout()
+        else:
+            positions, self.BOX_START, self.BOX_END = self.formation_layout(swarm.rows, swarm.columns,
+                                                                            swarm.alien_width, swarm.alien_height)
+        for alien_x, alien_y in positions:
+            self.objects.append(Alien(alien_x, alien_y, self.ALIEN_WIDTH, self.ALIEN_HEIGHT, "alien.png",
+                                      self.formation))
+            self.alien_grid.insert(self.objects[-1])
+
+        self.aliens = len(positions)
+        if recorder is not None:
+            recorder.record_model(self)
+
+    @classmethod
+    def formation_layout(cls, rows=4, columns=14, alien_width=None, alien_height=None):
+        """Spawn points of the alien block, row by row from the top, with the block's BOX_START and BOX_END.
+        The defaults are the standard 4 by 14 block; any other size is a swarm."""
+        alien_width = alien_width or cls.ALIEN_WIDTH
+        alien_height = alien_height or cls.ALIEN_HEIGHT
+        positions = []
+        alien_y = cls.MODEL_HEIGHT - cls.ALIEN_Y_OFF - alien_height  # Alien spawn y starting point.
+        for _ in range(rows):
+            alien_x = cls.ALIEN_X_OFF * 3  # Alien spawn x starting point.
+            for _ in range(columns):
+                positions.append((alien_x, alien_y))
+                alien_x += alien_width * 1.5  # Next alien spawn in row.
+            alien_y -= alien_height * 1.3  # Next alien spawn in column.
+
+        return positions, positions[0][0], positions[columns - 1][0] + alien_width
 
     @property
     def player_center(self):
@@ -197,25 +414,117 @@ class Model(GameModel):
     def get_game_events(self):
         return self.events
 
+    def snapshot(self):
+        """Packs the whole game state, RNG included, into bytes for restore(). Events, tuning attributes and the
+        db adapter are left out."""
+        player = self.player
+        floats = []
+        for mob in self.objects:
+            floats += (mob.x, mob.y)
+        for bullet in self.bullets:
+            floats += bullet
+        for bullet in self.alien_bullets:
+            floats += bullet
+        for box in self.boxes:
+            floats += (box.x, box.y, box.dx, box.dy)
+        _, words, gauss_next = self.rand.getstate()
+        return b''.join((
+            SNAPSHOT_HEAD.pack(SNAPSHOT_VERSION, self.seed, self.points, self.highscore, self.difficulty, self.tick,
+                               self.heat.now, -1 if self.aliens == "-" else self.aliens, self.lives,
+                               self.game_over, self.input, self.ALIEN_MOVE_RIGHT,
+                               self.keys_pressed, math.nan if self.time is None else self.time,
+                               self.BOX_START, self.BOX_END,
+                               player.x, player.y, player.dx, player.dy,
+                               player.is_blown, player.is_double_blown, player.is_active,
+                               PLAYER_IMAGES.index(player.img_name),
+                               len(self.heat.guns), len(self.objects), len(self.bullets), len(self.alien_bullets),
+                               len(self.boxes)),
+            b''.join(SNAPSHOT_GUN.pack(gun.jam, self.heat.countdown(i), gun.variable, gun.phase)
+                     for i, gun in enumerate(self.heat.guns)),
+            struct.pack(f'<{len(floats)}d', *floats),
+            SNAPSHOT_RNG.pack(math.nan if gauss_next is None else gauss_next, *words)))
+
+    def restore(self, blob):
+        """Puts this model back into the state a snapshot() was taken in."""
+        (version, self.seed, self.points, self.highscore, self.difficulty, self.tick, steps, aliens, self.lives,
+         self.game_over, self.input, self.ALIEN_MOVE_RIGHT, self.keys_pressed, time, self.BOX_START, self.BOX_END,
+         px, py, pdx, pdy, blown, double_blown, active, img,
+         n_guns, n_aliens, n_bullets, n_alien_bullets, n_boxes) = SNAPSHOT_HEAD.unpack_from(blob)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f'snapshot version {version}, expected {SNAPSHOT_VERSION}')
+        if n_guns != len(self.heat.guns):
+            raise ValueError(f'snapshot has {n_guns} guns, this model {len(self.heat.guns)}')
+        self.heat.now = steps  # before the guns, which are anchored at it
+        offset = SNAPSHOT_HEAD.size
+        for i in range(n_guns):
+            jam, countdown, variable, phase = SNAPSHOT_GUN.unpack_from(blob, offset)
+            self.heat.set_state(i, countdown, variable, phase, jam)
+            offset += SNAPSHOT_GUN.size
+        self.aliens = "-" if aliens == -1 else aliens
+        self.time = None if math.isnan(time) else time
+        self.alien_bullet_dy = (self.BASE_ALIEN_BULLET_SPEED + self.difficulty * self.DELTA_BULLET_SPEED_ON_DIFF) \
+            * Model.MODEL_HEIGHT
+
+        player = self.player
+        player.x, player.y, player.dx, player.dy = px, py, pdx, pdy
+        player.is_blown, player.is_double_blown, player.is_active = blown, double_blown, active
+        player.img_name = PLAYER_IMAGES[img]
+
+        count = 2 * n_aliens + 2 * n_bullets + 2 * n_alien_bullets + 4 * n_boxes
+        floats = struct.unpack_from(f'<{count}d', blob, offset)
+        i = 0
+        self.objects = []
+        self.formation = Formation()
+        self.alien_grid.clear()
+        for _ in range(n_aliens):
+            mob = Alien(floats[i], floats[i + 1], self.ALIEN_WIDTH, self.ALIEN_HEIGHT, "alien.png", self.formation)
+            self.objects.append(mob)
+            self.alien_grid.insert(mob)
+            i += 2
+        for bullets, n in ((self.bullets, n_bullets), (self.alien_bullets, n_alien_bullets)):
+            bullets.xs[:] = array('d', floats[i:i + 2 * n:2])
+            bullets.ys[:] = array('d', floats[i + 1:i + 2 * n:2])
+            i += 2 * n
+        self.boxes = []
+        for _ in range(n_boxes):
+            box = Box(floats[i], floats[i + 1], self.ALIEN_WIDTH * 0.5, self.ALIEN_HEIGHT * 0.5, "pickup.png",
+                      Box.BoxType.SHOOT_FAST)
+            box.dx, box.dy = floats[i + 2], floats[i + 3]
+            self.boxes.append(box)
+            i += 4
+
+        gauss_next, *words = SNAPSHOT_RNG.unpack_from(blob, offset + 8 * count)
+        self.rand.setstate((3, tuple(words), None if math.isnan(gauss_next) else gauss_next))
+        self.events.clear()
+
     def alien_shoot(self, mob):
-        if rando() <= self.alien_shoot_chance and len(
-                self.alien_bullets) < self.alien_bullet_max and mob.y >= Model.MODEL_HEIGHT / 3:
-            self.alien_bullets.append([mob.x + mob.width / 2, mob.y + mob.height / 2])
-            self.events.append(GameEvent(GameEvent.EventType.ALIEN_1_FIRE, sound="bomb1.mp3"))
+        if self.rand.random() <= self.alien_shoot_chance:
+            self.alien_fire(mob)
+
+    def alien_fire(self, mob):
+        if len(self.alien_bullets) < self.alien_bullet_max:
+            y = mob.y
+            if y >= Model.MODEL_HEIGHT / 3:
+                self.alien_bullets.append(mob.x + mob.width / 2, y + mob.height / 2)
+                self.events.emit(GameEvent.EventType.ALIEN_1_FIRE, sound="bomb1.mp3")
 
     def alien_movement_update(self, x_update, y_update):
-        for mob in self.objects[:]:
-            self.update_position(mob, x_update, y_update)
-            # self.events.append(GameEvent(GameEvent.EventType.ALIEN_MOVE, sound="x.mp3"))  #  Alien move sound
-            self.alien_shoot(mob)
+        self.formation.x += x_update
+        self.formation.y += y_update
+        # self.events.emit(GameEvent.EventType.ALIEN_MOVE, sound="x.mp3")  #  Alien move sound
+        # Each alien still rolls to shoot in turn, which keeps seeded games and replays as they were.
+        roll, chance = self.rand.random, self.alien_shoot_chance
+        for mob in self.objects:
+            if roll() <= chance:
+                self.alien_fire(mob)
 
     def alien_update(self):
         if self.ALIEN_MOVE_RIGHT:
             self.BOX_START += Model.MODEL_WIDTH / 40
             self.BOX_END += Model.MODEL_WIDTH / 40
             if self.BOX_END >= Model.MODEL_WIDTH - Model.ALIEN_X_OFF:  # Checks if box is off screen also
-                # self.events.append(GameEvent(GameEvent.EventType.EDGE_SCREEN, sound="x.mp3"))  # Alien hit screen edge
-                self.alien_movement_update(0, -Model.ALIEN_HEIGHT / 2)
+                # self.events.emit(GameEvent.EventType.EDGE_SCREEN, sound="x.mp3")  # Alien hit screen edge
+                self.alien_movement_update(0, -self.ALIEN_HEIGHT / 2)
                 self.ALIEN_MOVE_RIGHT = False
             else:
                 self.alien_movement_update(Model.MODEL_WIDTH / 40, 0)
@@ -224,59 +533,46 @@ class Model(GameModel):
             self.BOX_START -= Model.MODEL_WIDTH / 40
             self.BOX_END -= Model.MODEL_WIDTH / 40
             if self.BOX_START <= 0 + Model.ALIEN_X_OFF:
-                # self.events.append(GameEvent(GameEvent.EventType.EDGE_SCREEN, sound="x.mp3"))  # Alien hit screen edge
-                self.alien_movement_update(0, -Model.ALIEN_HEIGHT)
+                # self.events.emit(GameEvent.EventType.EDGE_SCREEN, sound="x.mp3")  # Alien hit screen edge
+                self.alien_movement_update(0, -self.ALIEN_HEIGHT)
                 self.ALIEN_MOVE_RIGHT = True
             else:
                 self.alien_movement_update(-Model.MODEL_WIDTH / 40, 0)
 
-    def hitbox_check(self, hitter, hitee):
-        if hitter in self.objects or hitter in self.boxes and hitee == self.player:
-            point_list = ((hitter.x, hitter.y), (hitter.x + hitter.width, hitter.y),
-                          (hitter.x, hitter.y + hitter.height),
-                          (hitter.x + hitter.width, hitter.y + hitter.height))
-        elif hitter in self.bullets:
-            point_list = [(hitter[0], hitter[1] + self.bullet_height)]
-        elif hitter in self.alien_bullets:
-            point_list = [(hitter[0], hitter[1])]
-        else:
-            return 0
-
-        for point in point_list:
-            if hitee.x <= point[0] <= hitee.x + hitee.width and hitee.y <= point[1] <= hitee.y + hitee.height:
-                return True
-
     def player_edge_check(self):
         if self.player.x <= 0:
-            # self.events.append(GameEvent(GameEvent.EventType.SCREEN_EDGE, sound="x.mp3")) player hit screen edge
+            # self.events.emit(GameEvent.EventType.SCREEN_EDGE, sound="x.mp3") player hit screen edge
             if self.player.dx < 0:  # Stops infinite dx = 0 at edges
                 self.player.dx = 0
         elif self.player.x + self.player.width >= Model.MODEL_WIDTH:
-            # self.events.append(GameEvent(GameEvent.EventType.SCREEN_EDGE, sound="x.mp3")) player hit screen edge
+            # self.events.emit(GameEvent.EventType.SCREEN_EDGE, sound="x.mp3") player hit screen edge
             if self.player.dx > 0:
                 self.player.dx = 0
 
     def player_speed_trunc(self):
         if self.player.dx < -Model.PLAYER_SPEED:
             self.player.dx = -Model.PLAYER_SPEED
-            print('speed_trunc!')
+            logger.debug('speed_trunc!')
         elif self.player.dx > Model.PLAYER_SPEED:
             self.player.dx = Model.PLAYER_SPEED
-            print('speed_trunc!')
+            logger.debug('speed_trunc!')
 
-    def player_death_check(self, bullet=(0, 0)):
-        for mob in self.objects[:]:
+    def player_death_check(self, bullet=None):
+        """bullet is an index into alien_bullets, if an alien bullet has reached the player's height."""
+        player = self.player
+        fx, fy = self.formation.x, self.formation.y  # grid queries are relative to the formation
+        for mob in self.alien_grid.query_below(-fy):
             if mob.y <= 0:  # Monsters off bottom edge of screen
-                self.player.is_double_blown, self.player.is_blown = True, True
-                self.player.img_name = "x-wing_very_burnt.png"
+                player.is_double_blown, player.is_blown = True, True
+                player.img_name = "x-wing_very_burnt.png"
 
-            elif mob.y <= self.player.y + self.player.height:
-                if self.hitbox_check(mob, self.player):
-                    self.player.is_double_blown, self.player.is_blown = True, True
-                    self.player.img_name = "x-wing_very_burnt.png"
+        for mob in self.alien_grid.query_rect(player.x - fx, player.y - fy, player.width, player.height):
+            if mob.y <= player.y + player.height and corner_in_box(mob, player):
+                player.is_double_blown, player.is_blown = True, True
+                player.img_name = "x-wing_very_burnt.png"
 
-        if self.hitbox_check(bullet, self.player):
-            self.alien_bullets.remove(bullet)
+        if bullet is not None and point_in_box(*self.alien_bullets[bullet], player):
+            self.alien_bullets.pop(bullet)
             if self.player.is_blown:  # If player hit once
                 self.player.is_double_blown = True
                 self.player.img_name = "x-wing_very_burnt.png"
@@ -285,17 +581,20 @@ class Model(GameModel):
                 self.player.img_name = "x-wing_burnt.png"
 
     def alien_death_check(self, bullet):
-        for mob in self.objects[:]:
-            if self.hitbox_check(bullet, mob):
-                if rando() < self.power_box_spawn_chance:
+        """bullet is an index into bullets."""
+        tip_x, tip_y = self.bullets.xs[bullet], self.bullets.ys[bullet] + self.bullet_height
+        for mob in self.alien_grid.query_point(tip_x - self.formation.x, tip_y - self.formation.y):
+            if point_in_box(tip_x, tip_y, mob):
+                if self.rand.random() < self.power_box_spawn_chance:
                     self.power_box_spawn(mob)
-                self.events.append(GameEvent(GameEvent.EventType.ALIEN_DEATH,
-                                             (bullet[0], bullet[1] + self.bullet_height), args=[100]))
+                self.events.emit(GameEvent.EventType.ALIEN_DEATH, (tip_x, tip_y), args=[100])
                 self.points += 100
                 self.objects.remove(mob)
+                self.alien_grid.remove(mob)
                 if not self.player.is_double_blown:
                     self.aliens -= 1
-                self.bullets.remove(bullet)
+                self.bullets.pop(bullet)
+                break  # bullet is spent
 
     def screen_change(self, dt):
         if self.player.is_double_blown:  # Aliens reach bottom of screen or Alien kill player or aliens shoot player
@@ -304,55 +603,72 @@ class Model(GameModel):
                     if self.input:
                         self.player.is_active = False
                         self.aliens = "-"
-                        self.events.append(GameEvent(GameEvent.EventType.PLAYER_DEATH, coordinates=self.player_center))
+                        self.events.emit(GameEvent.EventType.PLAYER_DEATH, coordinates=self.player_center)
 
                     self.key_neutraliser()
                     self.alien_ending()
             else:
-                Model.PLAYER_LIVES -= 1
-                self.events.append(GameEvent(GameEvent.EventType.LIFE_LOST, args=self.player_lives))
-                if Model.PLAYER_LIVES == 0:
-                    if self.points > self.highscore:
-                        self.highscore = self.points
-                        self.db_adapter.set_high_score(self.points)
-                    self.events.append(GameEvent(GameEvent.EventType.GAME_OVER))
+                self.lives -= 1
+                self.events.emit(GameEvent.EventType.LIFE_LOST, args=self.lives)
+                if self.lives == 0:
+                    self.db_adapter.add_score(self.points)
+                    self.highscore = max(self.highscore, self.points)
+                    self.events.emit(GameEvent.EventType.GAME_OVER)
                     self.game_over = True
-                    Model.PLAYER_LIVES = 2
                 else:
-                    self.events.append(GameEvent(GameEvent.EventType.RESET_SCREEN))
+                    self.events.emit(GameEvent.EventType.RESET_SCREEN)
 
         elif self.player.is_active and type(self.aliens) == int and self.aliens <= 0:  # Player defeated aliens
-            self.events.append(GameEvent(
-                GameEvent.EventType.NEXT_LEVEL))
+            self.events.emit(GameEvent.EventType.NEXT_LEVEL)
 
     def alien_ending(self, rand=0):
-        for mob in self.objects:
+        """The block falls off screen. An alien just after one that leaves is passed over for that step (neither
+        shooting nor falling), as when this looped over the list while removing from it."""
+        drop = Model.MODEL_HEIGHT / 20
+        objects = self.objects
+        i = 0
+        while i < len(objects):
+            mob = objects[i]
             if rand:
                 self.alien_shoot(mob)
             if mob.y + mob.height < 0:
-                self.objects.remove(mob)
+                del objects[i]
+                self.alien_grid.remove(mob)
                 if not self.player.is_double_blown:
                     self.aliens -= 1
-            self.update_position(mob, 0, -Model.MODEL_HEIGHT / 20)
+                if i < len(objects):  # stays put while the formation falls
+                    objects[i].oy += drop
+                    self.alien_grid.move(objects[i])
+            i += 1
+        self.formation.y -= drop
 
+    # Both loops step past the bullet after a removed one, as iterating a list while removing from it used to.
     def alien_bullet_update(self):
-        for bullet in self.alien_bullets:
-            bullet[1] -= self.alien_bullet_dy
+        ys = self.alien_bullets.ys
+        i = 0
+        while i < len(ys):
+            ys[i] -= self.alien_bullet_dy
+            y = ys[i]
 
-            if bullet[1] <= 0:
-                self.alien_bullets.remove(bullet)
+            spent = y <= 0
+            if spent:
+                self.alien_bullets.pop(i)
 
-            if bullet[1] <= self.player.y + self.player.height:
-                self.player_death_check(bullet)
+            if y <= self.player.y + self.player.height:
+                self.player_death_check(None if spent else i)
+            i += 1
 
     def bullet_update(self):
-        for bullet in self.bullets:
-            bullet[1] += self.player_bullet_dy
-
-            if bullet[1] >= Model.MODEL_HEIGHT:
-                self.bullets.remove(bullet)
+        ys = self.bullets.ys
+        i = 0
+        while i < len(ys):
+            ys[i] += self.player_bullet_dy
 
-            self.alien_death_check(bullet)
+            if ys[i] >= Model.MODEL_HEIGHT:
+                self.bullets.pop(i)
+            else:
+                self.alien_death_check(i)
+            i += 1
 
     def power_box_update(self):
         for box in self.boxes:
@@ -361,16 +677,20 @@ class Model(GameModel):
             if box.x <= 0:
                 self.boxes.remove(box)
 
-            if self.hitbox_check(box, self.player):
+            elif corner_in_box(box, self.player):
                 self.boxes.remove(box)
-                self.events.append(GameEvent(GameEvent.EventType.POWER_UP_COLLECT,
-                                             (self.player.x, self.player.y + 1.5 * self.player.height)))
+                self.events.emit(GameEvent.EventType.POWER_UP_COLLECT,
+                                 (self.player.x, self.player.y + 1.5 * self.player.height))
                 self.points += 500
 
     def power_box_spawn(self, mob):
         self.boxes.append(Box(mob.x + mob.width * 0.25, mob.y + mob.height * 0.25, mob.width * 0.5, mob.height * 0.5,
                               "pickup.png", Box.BoxType.SHOOT_FAST))
 
+    def fire_bullet(self, x, y):
+        if self.player_bullet_max is None or len(self.bullets) < self.player_bullet_max:
+            self.bullets.append(x, y)
+
     def update_position(self, obj, dx, dy):
         obj.dx = dx
         obj.dy = dy
@@ -384,10 +704,11 @@ class Model(GameModel):
         self.power_box_update()
         self.bullet_update()
         self.alien_bullet_update()
-        self.overheat_variable_logic()
         self.timekeeper()
 
     def update(self, dt):
+        if self.recorder is not None:
+            self.recorder.record_update(dt)
         self.player_death_check()
         self.screen_change(dt)
 
@@ -396,22 +717,13 @@ class Model(GameModel):
             if not self.player.is_blown:
                 self.alien_update()
             elif not self.player.is_double_blown and self.aliens > 0 and self.player.is_active:
-                self.events.append(GameEvent(GameEvent.EventType.EXPLOSION, self.player_center))
+                self.events.emit(GameEvent.EventType.EXPLOSION, self.player_center)
                 self.alien_ending(rand=True)
 
         self.position_update_central()
 
     def timekeeper(self):
-        if self.q_countdown > 0:
-            self.q_countdown -= self.HEAT_RECOVERY_RATE
-        else:
-            self.q_countdown = self.countdown
-            self.q_jam = False
-        if self.e_countdown > 0:
-            self.e_countdown -= self.HEAT_RECOVERY_RATE
-        else:
-            self.e_countdown = self.countdown
-            self.e_jam = False
+        self.heat.step()
         self.tick += 1
 
     def real_timer(self, dt, time):
@@ -419,7 +731,7 @@ class Model(GameModel):
             self.time = time
 
         if self.time <= 0:
-            print("Time's up")
+            logger.debug("Time's up")
             self.time = None
             return False
         else:
@@ -438,10 +750,10 @@ class Model(GameModel):
     def controller_logic(self, input_type):
         if input_type == 'release':
             if self.player.x <= 0 or self.player.x + self.player.width >= Model.MODEL_WIDTH:
-                print('a')
+                logger.debug('release ignored at screen edge')
                 return True
             if self.keys_pressed == 0 and self.player.dx == 0:
-                print('b')
+                logger.debug('release ignored, ship already still')
                 return True
 
         elif input_type == 'press':
@@ -450,114 +762,57 @@ class Model(GameModel):
             if self.player.x + self.player.width >= Model.MODEL_WIDTH and self.player.dx > 0:
                 return True
 
-    def overheat_variable_logic(self):
-        i = 0
-        counter = 0
-        while i < len(self.heat_phases) - 1 and counter < 2:
-            if self.heat_phases[i] < self.q_countdown <= self.heat_phases[i + 1] and i != self.q_heat_phase:
-                self.overheat_variable_q = i + self.overheat_base  # TODO overheat_variable_q changed here
-                self.q_heat_phase = i
-                counter += 1
-                print(f'q_heat phase changed to {i}', self.q_countdown)
-            if self.heat_phases[i] < self.e_countdown <= self.heat_phases[i + 1] and i != self.e_heat_phase:
-                self.overheat_variable_e = i + self.overheat_base  # TODO overheat_variable_e changed here
-                self.e_heat_phase = i
-                counter += 1
-                print(f'e_heat phase changed to {i}', self.e_countdown)
-            i += 1
+    def pull_trigger(self, gun):
+        _, name, barrel, reports_jam = self.GUNS[gun]
+        logger.debug('%s pressed, countdown %s', name, self.heat.countdown(gun))
+        if self.heat.guns[gun].jam and reports_jam:
+            self.events.emit(GameEvent.EventType.GUN_JAM, args=gun)
+        jam_at = self.overheat_base + self.OVERHEAT_THRESHOLD \
+            + self.LAST_STAND_THREASHOLD_RISE * (1 if self.player.is_blown else 0)
+        if self.heat.fire(gun, jam_at):
+            self.events.emit(GameEvent.EventType.PLAYER_FIRE, sound="laser1.mp3", args=gun)
+            self.fire_bullet(self.player.x + self.player.width / barrel, self.player.y + self.player.height / 1.6)
 
     def action(self, key_val: str, action_type: int):
-        import view, frame  # avoids circular imports
-        x1_ship = self.player.width / 32
-        x2_ship = self.player.width / float(1.04065)
-        y_ship = self.player.height / 1.6
-
-        if action_type == view.KEY_PRESS:
+        if self.recorder is not None:
+            self.recorder.record_action(key_val, action_type)
+        if action_type == KEY_PRESS:
             if self.game_over:
-                if key_val == key.SPACE:
+                if key_val == Key.SPACE:
                     self.points = 0
-                    self.events.append(GameEvent(GameEvent.EventType.RESET_SCREEN))
+                    self.events.emit(GameEvent.EventType.RESET_SCREEN)
 
-                elif key_val == key.R:
-                    self.events.append(GameEvent(GameEvent.EventType.EXIT_MENU))
+                elif key_val == Key.R:
+                    self.events.emit(GameEvent.EventType.EXIT_MENU)
 
             if self.input:
-                if key_val == key.LEFT or key_val == key.RIGHT:
+                if key_val == Key.LEFT or key_val == Key.RIGHT:
                     self.keys_pressed += 1
                     if not self.controller_logic('press'):
-                        if key_val == key.LEFT:
+                        if key_val == Key.LEFT:
                             self.player.dx -= Model.PLAYER_SPEED
                         else:
                             self.player.dx += Model.PLAYER_SPEED
 
-                elif key_val == key.Q:
-                    print(self.q_countdown)
-                    print("Wow! The Q has been pressed")
-                    if self.q_jam:  # if jammed
-                        self.events.append(GameEvent(GameEvent.EventType.GUN_JAM))
-                        print('jammin')
-                        if self.q_countdown <= 0:
-                            print("unjammed", self.q_countdown)
-                            self.q_jam = False
-
-                    elif self.q_countdown > 0:  # normal flow
-                        if self.overheat_variable_q == self.overheat_base:  # If overheat timer in first phase
-                            self.q_countdown += self.countdown + self.overheat_constant / self.overheat_variable_q  # Intended for initial fire.
-                        else:  # This is place where time is added to countdown.
-                            self.q_countdown += self.overheat_constant / self.overheat_variable_q  # For times when heat phase > 1.
-
-                        self.overheat_variable_q += 1
-                        if self.overheat_variable_q >= self.overheat_base + self.OVERHEAT_THRESHOLD \
-                                + self.LAST_STAND_THREASHOLD_RISE * (1 if self.player.is_blown else 0):
-                            self.q_jam = True
-                        self.events.append(GameEvent(GameEvent.EventType.PLAYER_FIRE, sound="laser1.mp3"))
-                        self.bullets.append([self.player.x + x1_ship, self.player.y + y_ship])
-
-                    else:
-                        print('q_success')
-                        self.events.append(GameEvent(GameEvent.EventType.PLAYER_FIRE, sound="laser1.mp3"))
-                        self.bullets.append([self.player.x + x1_ship, self.player.y + y_ship])
-
-                elif key_val == key.W:
-                    print("Wow! The E has been pressed")
-                    if self.e_jam:
-                        if self.e_countdown <= 0:
-                            print("unjammed", self.e_countdown)
-                            self.e_jam = False
-                    elif self.e_countdown > 0:
-                        if self.overheat_variable_e == self.overheat_base:
-                            self.e_countdown += self.countdown + self.overheat_constant / self.overheat_variable_e
-                        else:
-                            self.e_countdown += self.overheat_constant / self.overheat_variable_e
-
-                        self.overheat_variable_e += 1
-                        if self.overheat_variable_e >= self.overheat_base + self.OVERHEAT_THRESHOLD \
-                                + self.LAST_STAND_THREASHOLD_RISE * (1 if self.player.is_blown else 0):
-                            self.e_jam = True
-                        self.events.append(GameEvent(GameEvent.EventType.PLAYER_FIRE, sound="laser1.mp3"))
-                        self.bullets.append([self.player.x + x2_ship, self.player.y + y_ship])
-
-                    else:
-                        print('e_success')
-                        self.events.append(GameEvent(GameEvent.EventType.PLAYER_FIRE, sound="laser1.mp3"))
-                        self.bullets.append([self.player.x + x2_ship, self.player.y + y_ship])
-
-                if frame.GameFrame.dev_mode:
-                    if key_val == key.G:
-                        self.events.append(GameEvent(GameEvent.EventType.GAME_OVER))
+                elif key_val in self.GUN_KEYS:
+                    self.pull_trigger(self.GUN_KEYS[key_val])
+
+                if self.dev_mode:
+                    if key_val == Key.G:
+                        self.events.emit(GameEvent.EventType.GAME_OVER)
                         self.game_over = True
 
-                    elif key_val == key.T:
-                        self.events.append(GameEvent(GameEvent.EventType.EXIT_MENU))
+                    elif key_val == Key.T:
+                        self.events.emit(GameEvent.EventType.EXIT_MENU)
 
-                    elif key_val == key.Y:
-                        self.events.append(GameEvent(GameEvent.EventType.NEXT_LEVEL))
+                    elif key_val == Key.Y:
+                        self.events.emit(GameEvent.EventType.NEXT_LEVEL)
 
-        if action_type == view.KEY_RELEASE:
+        if action_type == KEY_RELEASE:
             if self.input:
-                if key_val == key.LEFT or key_val == key.RIGHT:
+                if key_val == Key.LEFT or key_val == Key.RIGHT:
                     self.keys_pressed -= 1
                     if self.keys_pressed < 0:
                         self.keys_pressed = 0
                     if not self.controller_logic('release'):
-                        self.player.dx += (1 if key_val == key.LEFT else -1) * Model.PLAYER_SPEED
+                        self.player.dx += (1 if key_val == Key.LEFT else -1) * Model.PLAYER_SPEED
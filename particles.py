@@ -0,0 +1,124 @@
+import numpy as np
+import pyglet
+from pyglet.graphics import GL_QUADS
+
+"""particles.py: Square particles kept as a structure of fixed-capacity NumPy arrays.
+
+Each attribute (x, y, velocity, size, colour) is one array with the live particles packed at its front, so spawning a
+burst, stepping every particle and culling the dead are a handful of array operations however many there are. A
+particle's size is its lifetime where the system decays sizes, it dies at zero; anything below the floor dies too.
+draw() writes the quads straight into one persistent vertex list, grown to the most particles seen so far; quads of
+particles that have died since are collapsed to a point rather than the list shrunk."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+class ParticleSystem:
+    MIN_VERTEX_LIST = 256  # particles the vertex list holds at first
+
+    def __init__(self, capacity, tick_rate=1, gravity=0, size_decay=0, floor=0):
+        self.capacity = capacity
+        self.tick_rate = tick_rate  # ticks per step
+        self.gravity = gravity  # taken off dy every step
+        self.size_decay = size_decay  # taken off size every step
+        self.floor = floor
+        self.count = 0
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.dx = np.zeros(capacity, np.float32)
+        self.dy = np.zeros(capacity, np.float32)
+        self.size = np.zeros(capacity, np.float32)
+        self.colour = np.zeros((capacity, 12), np.uint8)  # RGB once per corner, as the vertex list takes it
+        self.arrays = (self.x, self.y, self.dx, self.dy, self.size, self.colour)
+        self.vertex_list = None
+        self.drawn = 0  # particles in the vertex list that may not be collapsed
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays)
+
+    def spawn(self, x, y, dx, dy, size, colour):
+        """Adds a particle per element of x, y, dx, dy and size broadcast together; colour is one RGB triple or one
+        per particle in the same shape. Past capacity the oldest particles make room."""
+        burst = np.broadcast(x, y, dx, dy, size)
+        shape, n = burst.shape, burst.size
+        if n > self.capacity:  # keeps the burst's newest
+            x, y, dx, dy, size = (array.ravel()[-self.capacity:] for array in np.broadcast_arrays(x, y, dx, dy, size))
+            colour = np.broadcast_to(colour, shape + (3,)).reshape(-1, 3)[-self.capacity:]
+            shape, n = x.shape, self.capacity
+        overflow = self.count + n - self.capacity
+        if overflow > 0:
+            self.keep(slice(overflow, None))
+        start, self.count = self.count, self.count + n
+        for array, values in zip(self.arrays, (x, y, dx, dy, size)):
+            array[start:self.count].reshape(shape)[...] = values
+        self.colour[start:self.count].reshape(shape + (4, 3))[...] = np.expand_dims(colour, -2)
+
+    def update(self, tick):
+        if tick % self.tick_rate or not self.count:
+            return
+        n = self.count
+        x, y, dy, size = self.x[:n], self.y[:n], self.dy[:n], self.size[:n]
+        dead = y < self.floor  # before the move, so debris falls just out of sight
+        x += self.dx[:n]
+        y += dy
+        if self.gravity:
+            dy -= self.gravity
+        if self.size_decay:
+            size -= self.size_decay
+            dead |= size <= 0
+        if dead.any():
+            self.keep(~dead)
+
+    def keep(self, index):
+        """Packs the live particles index picks out, in order, at the front and drops the rest."""
+        n = self.count
+        for array in self.arrays:
+            kept = array[:n][index]
+            array[:len(kept)] = kept
+        self.count = len(kept)
+
+    def clear(self):
+        self.count = 0
+
+    def fill(self, vertices, colours):
+        """Writes the live particles' quads into vertices, shaped (particles, 8), and colours, (particles, 12). Rows
+        past the live ones up to the last fill's are collapsed."""
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        right, top = x + self.size[:n], y + self.size[:n]
+        corners = vertices[:n].T  # a row per coordinate, bottom left corner then clockwise
+        corners[0], corners[1], corners[2], corners[3] = x, y, x, top
+        corners[4], corners[5], corners[6], corners[7] = right, top, right, y
+        colours[:n] = self.colour[:n]
+        vertices[n:self.drawn] = 0
+        self.drawn = n
+
+    def draw(self):
+        if not self.count and not self.drawn:
+            return
+        allocated = 0 if self.vertex_list is None else self.vertex_list.get_size() // 4
+        if self.count > allocated:  # needs the GL context, so made on the first draw
+            grown = min(self.capacity, max(self.MIN_VERTEX_LIST, 2 * allocated, self.count))
+            if self.vertex_list is None:
+                self.vertex_list = pyglet.graphics.vertex_list(4 * grown, 'v2f/stream', 'c3B/stream')
+            else:
+                self.vertex_list.resize(4 * grown)
+            self.drawn = grown  # the new rows hold whatever the buffer did
+        vertices = np.ctypeslib.as_array(self.vertex_list.vertices).reshape(-1, 8)
+        colours = np.ctypeslib.as_array(self.vertex_list.colors).reshape(-1, 12)
+        self.fill(vertices, colours)
+        if self.count:
+            self.vertex_list.draw(GL_QUADS)
+
+    def delete(self):
+        if self.vertex_list is not None:
+            self.vertex_list.delete()
+            self.vertex_list = None
+        self.drawn = 0
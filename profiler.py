@@ -0,0 +1,94 @@
+import csv
+import time
+from array import array
+
+import numpy as np
+
+"""profiler.py: Per-frame timing of named stages, for the dev mode overlay and CSV export.
+
+Stages nest: a stage's time is its own, exclusive of stages timed inside it, so a frame's stages add up to the time
+spent in instrumented code and stack cleanly in a bar graph."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+class FrameProfiler:
+    def __init__(self, stages, history=120):
+        self.stages = list(stages)
+        self.index = {name: i for i, name in enumerate(self.stages)}
+        self.current = [0.0] * len(self.stages)
+        self.stack = []  # [stage index, start, time spent in stages nested inside]
+        self.history = np.zeros((history, len(self.stages)))  # recent frames for the overlay, a ring
+        self.history_pos = 0
+        self.frames = 0
+        self.rows = [array('d') for _ in range(len(self.stages) + 1)]  # every frame, columns plus frame time
+        self.frame_start = None
+        self.visible = True
+
+    def begin(self, stage):
+        self.stack.append([self.index[stage], time.perf_counter(), 0.0])
+
+    def end(self):
+        i, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.current[i] += elapsed - nested
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def timed(self, stage, fn):
+        def wrapper(*args, **kwargs):
+            self.begin(stage)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.end()
+        return wrapper
+
+    def instrument(self, obj, stages):
+        """Times obj's methods from then on by shadowing each with an instance attribute. stages maps a method name
+        to its stage, or is a list of method names that are also the stage names."""
+        if not isinstance(stages, dict):
+            stages = {name: name for name in stages}
+        for method, stage in stages.items():
+            setattr(obj, method, self.timed(stage, getattr(obj, method)))
+
+    def next_frame(self):
+        """Closes the frame in progress, call once at the start of every frame."""
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.history[self.history_pos] = self.current
+            self.history_pos = (self.history_pos + 1) % len(self.history)
+            for column, value in zip(self.rows, self.current):
+                column.append(value)
+            self.rows[-1].append(now - self.frame_start)
+            self.frames += 1
+            self.current = [0.0] * len(self.stages)
+        self.frame_start = now
+
+    def recent(self):
+        """Stage times (seconds) of up to `history` recent frames, oldest first, shape (frames, stages)."""
+        if self.frames < len(self.history):
+            return self.history[:self.frames]
+        return np.roll(self.history, -self.history_pos, axis=0)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        """{stage: [ms at each percentile]} over the recent frames, plus 'total' for their sums."""
+        recent = self.recent()
+        if not len(recent):
+            return {}
+        recent = recent * 1000
+        result = dict(zip(self.stages, np.percentile(recent, qs, axis=0).T.tolist()))
+        result['total'] = np.percentile(recent.sum(axis=1), qs).tolist()
+        return result
+
+    def export_csv(self, path):
+        """One row per recorded frame: frame number, each stage's ms and the frame's wall clock ms."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame'] + self.stages + ['frame_time'])
+            for frame, values in enumerate(zip(*self.rows)):
+                writer.writerow([frame] + [round(v * 1000, 4) for v in values])
+        return self.frames
@@ -0,0 +1,169 @@
+import argparse
+import atexit
+import hashlib
+import struct
+import time
+
+from db_adapter import MemoryDataBaseAdapter
+from model import GameModel, Model
+
+"""replay.py: Records every Model.action and Model.update of a session into a compact binary file and plays it back
+headlessly at full speed, reproducing the final state exactly.
+
+Usage: python replay.py session.scr
+
+File layout, little-endian: the header b'SCRP' + version byte + dev_mode byte, then tagged records:
+    M  points q, difficulty i, seed Q, highscore q, lives b   a new Model was built
+    U  count I, dt d                                         count consecutive updates with the same dt
+    A  tick I, key I, action B                               Model.action during the model's tick-th update
+    E  digest 20s                                            end of session, state_digest of the last model"""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+MAGIC = b'SCRP'
+VERSION = 1
+MODEL = struct.Struct('<cqiQqb')
+UPDATE = struct.Struct('<cId')
+ACTION = struct.Struct('<cIIB')
+END = struct.Struct('<c20s')
+
+
+def state_digest(model):
+    """SHA-1 over everything that decides how the game plays on, including the RNG position."""
+    player = model.player
+    state = (model.points, model.highscore, model.difficulty, model.tick, model.aliens, model.game_over, model.input,
+             (player.x, player.y, player.dx, player.dy, player.is_blown, player.is_double_blown, player.is_active,
+              player.img_name),
+             [(mob.x, mob.y) for mob in model.objects], [(box.x, box.y) for box in model.boxes],
+             [tuple(bullet) for bullet in model.bullets], [tuple(bullet) for bullet in model.alien_bullets],
+             model.BOX_START, model.BOX_END, model.ALIEN_MOVE_RIGHT, model.keys_pressed, model.time,
+             *model.heat.state(),
+             model.lives, model.rand.getstate())
+    return hashlib.sha1(repr(state).encode()).digest()
+
+
+class Recorder:
+    """Hand one to every Model of a session (Model(..., recorder=rec)); it appends each call as it happens."""
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + bytes((VERSION, int(bool(GameModel.dev_mode)))))
+        self.model = None
+        self.ticks = 0
+        self.pending_dt = None
+        self.pending_count = 0
+        atexit.register(self.close)  # the window leaves through sys.exit()
+
+    def flush_updates(self):
+        if self.pending_count:
+            self.file.write(UPDATE.pack(b'U', self.pending_count, self.pending_dt))
+            self.pending_count = 0
+
+    def record_model(self, model):
+        self.flush_updates()
+        self.model = model
+        self.ticks = 0
+        self.file.write(MODEL.pack(b'M', model.points, model.difficulty, model.seed, model.highscore, model.lives))
+
+    def record_update(self, dt):
+        if dt != self.pending_dt or self.pending_count == 0xFFFFFFFF:
+            self.flush_updates()
+            self.pending_dt = dt
+        self.pending_count += 1
+        self.ticks += 1
+
+    def record_action(self, key_val, action_type):
+        self.flush_updates()
+        self.file.write(ACTION.pack(b'A', self.ticks, key_val, action_type))
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush_updates()
+        if self.model is not None:
+            self.file.write(END.pack(b'E', state_digest(self.model)))
+        self.file.close()
+
+
+def read_records(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC or data[4] != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} replay')
+    dev_mode = bool(data[5])
+    records = []
+    offset = 6
+    layouts = {b'M': MODEL, b'U': UPDATE, b'A': ACTION, b'E': END}
+    while offset < len(data):
+        layout = layouts[data[offset:offset + 1]]
+        records.append(layout.unpack_from(data, offset))
+        offset += layout.size
+    return dev_mode, records
+
+
+class ReplayResult:
+    def __init__(self, model, ticks, seconds, expected_digest):
+        self.model = model
+        self.ticks = ticks
+        self.seconds = seconds
+        self.digest = state_digest(model) if model is not None else None
+        self.expected_digest = expected_digest
+
+    @property
+    def matches(self):
+        return self.expected_digest is not None and self.digest == self.expected_digest
+
+
+def play(path, on_tick=None):
+    """Re-runs a recording as fast as possible. on_tick(model, tick), if given, is called after every update."""
+    dev_mode, records = read_records(path)
+    saved_dev_mode = GameModel.dev_mode
+    GameModel.dev_mode = dev_mode
+    model = None
+    expected = None
+    ticks = 0
+    start = time.perf_counter()
+    try:
+        for record in records:
+            tag = record[0]
+            if tag == b'U':
+                for _ in range(record[1]):
+                    model.update(record[2])
+                    model.events.clear()
+                    ticks += 1
+                    if on_tick is not None:
+                        on_tick(model, ticks)
+            elif tag == b'A':
+                model.action(record[2], record[3])
+            elif tag == b'M':
+                _, points, difficulty, seed, highscore, lives = record
+                model = Model(points, difficulty, db_adapter=MemoryDataBaseAdapter(highscore), seed=seed, lives=lives)
+            else:
+                expected = record[1]
+        seconds = time.perf_counter() - start
+        return ReplayResult(model, ticks, seconds, expected)
+    finally:
+        GameModel.dev_mode = saved_dev_mode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back a recorded Space Clone session without a window.")
+    parser.add_argument('path')
+    args = parser.parse_args(argv)
+    result = play(args.path)
+    rate = result.ticks / result.seconds if result.seconds > 0 else float('inf')
+    print(f'ticks: {result.ticks}')
+    print(f'seconds: {result.seconds:.3f}')
+    print(f'ticks/second: {rate:.0f}')
+    print(f'final score: {result.model.points if result.model else None}')
+    if result.expected_digest is None:
+        print('final state: recording has no end marker, nothing to compare')
+    else:
+        print(f"final state: {'matches' if result.matches else 'DIFFERS from'} the recording")
+
+
+if __name__ == '__main__':
+    main()
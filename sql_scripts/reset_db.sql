@@ -8,4 +8,5 @@ insert into highscores(_id, name, score) values(6, "RON",5000);
 insert into highscores(_id, name, score) values(7, "RIK",4000);
 insert into highscores(_id, name, score) values(8, "FIL",3000);
 insert into highscores(_id, name, score) values(9, "MCD",2000);
-insert into highscores(_id, name, score) values(10, "DUD",1000);
\ No newline at end of file
+insert into highscores(_id, name, score) values(10, "DUD",1000);
+create index if not exists highscores_score on highscores (score desc);
\ No newline at end of file
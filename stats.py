@@ -0,0 +1,83 @@
+import argparse
+import time
+
+from db_adapter import DataBaseAdapter
+from model import Model, GameEvent
+
+"""stats.py: Statistics of a game, counted from its events as the view hands them out, and a report over every game
+recorded.
+
+RunStats is fed each tick's event batches (tally) and each finished level's model (end_level). A batch costs a
+dictionary lookup, plus one increment per shot, so ticks without events cost nothing. row() is the game's row of the
+runs table, which the database adapters write in batches.
+
+Usage: python stats.py [--db res/space_clones.db] [--column points]"""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+class RunStats:
+    COUNTERS = {GameEvent.EventType.ALIEN_DEATH: 'kills', GameEvent.EventType.POWER_UP_COLLECT: 'power_ups',
+                GameEvent.EventType.GUN_JAM: 'jams'}
+
+    def __init__(self, guns=Model.GUNS, dt=1 / 60):
+        self.gun_names = [gun[1] for gun in guns]
+        self.dt = dt
+        self.shots = [0] * len(guns)  # PLAYER_FIRE events carry the gun's index
+        self.kills = 0
+        self.power_ups = 0
+        self.jams = 0
+        self.level = 0  # highest difficulty reached
+        self.ticks = 0  # of the levels ended so far
+        self.points = 0
+
+    def tally(self, type_of, events):
+        if type_of is GameEvent.EventType.PLAYER_FIRE:
+            shots = self.shots
+            for ev in events:
+                shots[ev.args] += 1
+        else:
+            counter = self.COUNTERS.get(type_of)
+            if counter is not None:
+                setattr(self, counter, getattr(self, counter) + len(events))
+
+    def end_level(self, model):
+        self.ticks += model.heat.now  # heat steps once per update, its clock is the level's length
+        self.level = max(self.level, model.difficulty)
+        self.points = model.points
+
+    def row(self):
+        shots = sum(self.shots)
+        row = {'finished': int(time.time()), 'level': self.level, 'points': self.points,
+               'duration': self.ticks * self.dt, 'kills': self.kills, 'power_ups': self.power_ups, 'jams': self.jams,
+               'shots': shots, 'accuracy': self.kills / shots if shots else 0.0}
+        row.update((f'shots_{name}', count) for name, count in zip(self.gun_names, self.shots))
+        return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-level averages and percentiles of the recorded games.")
+    parser.add_argument('--db', default=DataBaseAdapter.DB_FILE_NAME)
+    parser.add_argument('--column', default='points', choices=DataBaseAdapter.PERCENTILE_COLUMNS)
+    args = parser.parse_args(argv)
+
+    adapter = DataBaseAdapter(args.db)
+    begin = time.perf_counter()
+    averages = adapter.level_averages()
+    percentiles = {level: adapter.percentiles(args.column, level) for level in averages}
+    seconds = time.perf_counter() - begin
+    columns = [column for column in next(iter(averages.values()), {}) if column != 'runs']
+    print(f'{"level":>5} {"runs":>8} ' + ' '.join(f'{column:>10}' for column in columns) +
+          f'  {args.column} p50/p90/p99')
+    for level, average in averages.items():
+        print(f'{level:>5} {average["runs"]:>8} ' + ' '.join(f'{average[column]:>10.3f}' for column in columns) +
+              '  ' + '/'.join(f'{value:g}' for value in percentiles[level]))
+    print(f'report took {seconds * 1000:.1f}ms')
+    adapter.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import unittest
+
+import numpy as np
+
+from batch_env import BatchEnv, LEFT, RIGHT, FIRE_Q, FIRE_W
+from controls import Key, KEY_PRESS, KEY_RELEASE
+from headless import HeadlessRunner
+
+"""test_batch_env.py: BatchEnv against Model played through HeadlessRunner. The two only agree statistically, so the
+same action streams are played on both over a few hundred seeds and the score and survival distributions compared."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+GAMES = 300
+TICKS = 20000  # cap per game; with the policy below every game is over long before
+KS_CRITICAL = 1.95 * np.sqrt(2 / GAMES)  # two sample Kolmogorov-Smirnov at the 0.001 level
+
+
+def policy(games, ticks, seed=0):
+    """Held movement that changes now and then (still, left or right) with each gun tapped on a few percent of
+    ticks, as (games, ticks) action bits."""
+    rand = np.random.RandomState(seed)
+    turn = rand.random_sample((games, ticks)) < 0.03
+    direction = rand.randint(0, 3, (games, ticks))
+    move = np.where(turn, direction, -1)
+    held = np.zeros(games, np.int64)
+    actions = np.zeros((games, ticks), np.int64)
+    for tick in range(ticks):
+        held = np.where(move[:, tick] >= 0, move[:, tick], held)
+        actions[:, tick] = held
+    actions |= (rand.random_sample((games, ticks)) < 0.08) * FIRE_Q
+    actions |= (rand.random_sample((games, ticks)) < 0.08) * FIRE_W
+    return actions
+
+
+class ActionInput:
+    """Turns one game's action bits into the key presses and releases HeadlessRunner polls for."""
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.held = None
+
+    def poll(self, tick, model):
+        action = int(self.actions[tick]) if tick < len(self.actions) else 0
+        key = {LEFT: Key.LEFT, RIGHT: Key.RIGHT}.get(action & (LEFT | RIGHT))
+        keys = []
+        if key != self.held:
+            if self.held is not None:
+                keys.append((self.held, KEY_RELEASE))
+            if key is not None:
+                keys.append((key, KEY_PRESS))
+            self.held = key
+        for bit, gun in ((FIRE_Q, Key.Q), (FIRE_W, Key.W)):
+            if action & bit:
+                keys += [(gun, KEY_PRESS), (gun, KEY_RELEASE)]
+        return keys
+
+
+def ks_statistic(a, b):
+    values = np.sort(np.concatenate([a, b]))
+    cdf_a = np.searchsorted(np.sort(a), values, 'right') / len(a)
+    cdf_b = np.searchsorted(np.sort(b), values, 'right') / len(b)
+    return np.abs(cdf_a - cdf_b).max()
+
+
+class DistributionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        actions = policy(GAMES, TICKS)
+        runs = [HeadlessRunner(ActionInput(actions[game]), seed=1000 + game).run(TICKS) for game in range(GAMES)]
+        cls.model_points = np.array([run.points for run in runs])
+        cls.model_ticks = np.array([run.ticks for run in runs])
+
+        env = BatchEnv(GAMES, seed=1000, auto_reset=False)
+        cls.batch_ticks = np.full(GAMES, TICKS)
+        for tick in range(TICKS):
+            _, dones = env.step(actions[:, tick])
+            cls.batch_ticks[dones & (cls.batch_ticks == TICKS)] = tick + 1
+            if env.done.all():
+                break
+        cls.batch_points = env.points.copy()
+
+    def assert_same_distribution(self, a, b):
+        self.assertLess(ks_statistic(a, b), KS_CRITICAL)
+        standard_error = np.sqrt(a.var() / len(a) + b.var() / len(b))
+        self.assertLess(abs(a.mean() - b.mean()), 4 * standard_error)
+
+    def test_every_game_ends(self):
+        self.assertTrue((self.model_ticks < TICKS).all())
+        self.assertTrue((self.batch_ticks < TICKS).all())
+
+    def test_points(self):
+        self.assert_same_distribution(self.model_points, self.batch_points)
+
+    def test_survival(self):
+        self.assert_same_distribution(self.model_ticks, self.batch_ticks)
+
+
+class BatchCompositionTest(unittest.TestCase):
+    def test_game_independent_of_batch(self):
+        actions = policy(8, 600, seed=1)
+        batch = BatchEnv(8, seed=1000, auto_reset=False)
+        alone = BatchEnv(1, seed=1005, auto_reset=False)
+        for tick in range(600):
+            batch.step(actions[:, tick])
+            alone.step(actions[5:6, tick])
+        self.assertEqual(batch.points[5], alone.points[0])
+        self.assertEqual(batch.player_x[5], alone.player_x[0])
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+from calibrate import build_jobs, load_results, run_sweep
+
+"""test_calibrate.py: Sweeps give the same rows on any number of workers and resume where an interrupted one stopped."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+GRID = {'alien_shoot_chance': [0.1, 0.3], 'tick_speed': [25], 'OVERHEAT_THRESHOLD': [5],
+        'power_box_spawn_chance': [0.15]}
+
+
+def rows(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class SweepTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.jobs = build_jobs([0, 1], GRID, games=3, seed=0, max_ticks=150)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.folder.name, name)
+
+    def test_workers_agree(self):
+        one = run_sweep(self.jobs, self.path('one.jsonl'), workers=1)
+        two = run_sweep(self.jobs, self.path('two.jsonl'), workers=2)
+        self.assertEqual(len(one), len(self.jobs))
+        self.assertEqual(one, two)
+
+    def test_resume_from_truncated(self):
+        expected = run_sweep(self.jobs, self.path('whole.jsonl'), workers=2)
+        with open(self.path('whole.jsonl')) as f:
+            lines = f.readlines()
+        with open(self.path('cut.jsonl'), 'w') as f:
+            f.writelines(lines[:5])
+            f.write(lines[5][:len(lines[5]) // 2])  # killed mid-write
+        self.assertEqual(len(load_results(self.path('cut.jsonl'))), 5)
+
+        self.assertEqual(run_sweep(self.jobs, self.path('cut.jsonl'), workers=2), expected)
+        self.assertEqual(load_results(self.path('cut.jsonl')), expected)
+        with open(self.path('cut.jsonl')) as f:
+            self.assertEqual(len(f.readlines()), len(self.jobs) + 1)  # only the missing games were played
+
+    def test_max_ticks_not_resumed_across(self):
+        path = self.path('sweep.jsonl')
+        run_sweep(self.jobs, path, workers=2)
+        shorter = build_jobs([0, 1], GRID, games=3, seed=0, max_ticks=30)
+        results = run_sweep(shorter, path, workers=2)
+        self.assertEqual(len(rows(path)), 2 * len(self.jobs))
+        self.assertTrue(all(results[(job[0], job[3])]['ticks'] <= 30 for job in shorter))
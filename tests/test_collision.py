@@ -0,0 +1,104 @@
+import random
+import unittest
+
+from collision import SpatialGrid, point_in_box
+
+"""test_collision.py: SpatialGrid queries against brute-force overlap tests over every object."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+class Box:
+    def __init__(self, x, y, width, height):
+        self.x, self.y, self.width, self.height = x, y, width, height
+        self.off_x, self.off_y = x - 100, y - 50
+
+
+def overlaps(box, x, y, width, height):
+    return box.x <= x + width and x <= box.x + box.width and box.y <= y + height and y <= box.y + box.height
+
+
+def random_box(rand):
+    return Box(rand.uniform(-50, 850), rand.uniform(-50, 650), rand.uniform(0, 60), rand.uniform(0, 40))
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.rand = random.Random(7)
+        self.grid = SpatialGrid(45, 30)
+        self.boxes = [random_box(self.rand) for _ in range(300)]
+        for box in self.boxes:
+            self.grid.insert(box)
+
+    def assert_queries(self):
+        rand, grid = self.rand, self.grid
+        self.assertEqual(len(grid), len(self.boxes))
+        for _ in range(500):
+            x, y, width, height = rand.uniform(-60, 860), rand.uniform(-60, 660), rand.uniform(0, 80), \
+                rand.uniform(0, 80)
+            found = grid.query_rect(x, y, width, height)
+            self.assertEqual(len(found), len(set(found)))
+            self.assertTrue(set(found) <= set(self.boxes))
+            self.assertEqual({box for box in found if overlaps(box, x, y, width, height)},
+                             {box for box in self.boxes if overlaps(box, x, y, width, height)})
+            self.assertEqual({box for box in grid.query_point(x, y) if point_in_box(x, y, box)},
+                             {box for box in self.boxes if point_in_box(x, y, box)})
+            self.assertEqual({box for box in grid.query_below(y) if box.y <= y},
+                             {box for box in self.boxes if box.y <= y})
+
+    def test_static(self):
+        self.assert_queries()
+
+    def test_move_and_remove(self):
+        for box in self.rand.sample(self.boxes, 100):
+            box.x += self.rand.uniform(-100, 100)
+            box.y += self.rand.uniform(-100, 100)
+            self.grid.move(box)
+        for box in self.boxes[:50]:
+            self.grid.remove(box)
+            self.assertNotIn(box, self.grid)
+        self.boxes = self.boxes[50:]
+        self.assert_queries()
+
+    def test_cell_edges(self):
+        # Boxes and queries lying exactly on cell boundaries, where the edge-inclusive tests still count a touch.
+        self.grid = SpatialGrid(10, 10)
+        self.boxes = [Box(5 * self.rand.randint(-2, 20), 5 * self.rand.randint(-2, 20), 5 * self.rand.randint(0, 4),
+                          5 * self.rand.randint(0, 4)) for _ in range(200)]
+        for box in self.boxes:
+            self.grid.insert(box)
+        for x in range(-10, 110, 5):
+            for y in range(-10, 110, 5):
+                self.assertEqual({box for box in self.grid.query_rect(x, y, 10, 5) if overlaps(box, x, y, 10, 5)},
+                                 {box for box in self.boxes if overlaps(box, x, y, 10, 5)})
+                self.assertEqual({box for box in self.grid.query_point(x, y) if point_in_box(x, y, box)},
+                                 {box for box in self.boxes if point_in_box(x, y, box)})
+
+    def test_clear(self):
+        self.grid.clear()
+        self.assertEqual(len(self.grid), 0)
+        self.assertEqual(self.grid.query_rect(-100, -100, 1000, 800), [])
+        self.assertEqual(self.grid.rows, {})
+
+    def test_remove_all_leaves_no_empty_cells(self):
+        for box in self.boxes:
+            self.grid.remove(box)
+        self.assertEqual(self.grid.rows, {})
+
+
+class AttributeTest(unittest.TestCase):
+    def test_offsets(self):
+        # Bucketed by off_x and off_y, so queries are in offset coordinates.
+        rand = random.Random(3)
+        grid = SpatialGrid(40, 40, x_attr='off_x', y_attr='off_y')
+        boxes = [random_box(rand) for _ in range(100)]
+        for box in boxes:
+            grid.insert(box)
+        for _ in range(200):
+            x, y = rand.uniform(-150, 750), rand.uniform(-100, 600)
+            expected = {box for box in boxes if box.off_x <= x <= box.off_x + box.width and
+                        box.off_y <= y <= box.off_y + box.height}
+            self.assertTrue(expected <= set(grid.query_point(x, y)))
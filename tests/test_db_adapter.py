@@ -0,0 +1,165 @@
+import unittest
+
+from db_adapter import DataBaseAdapter, MemoryDataBaseAdapter, WriteBehindAdapter
+
+"""test_db_adapter.py: The leaderboard on an in-memory SQLite database, checked against the pure Python adapter, and
+the write-behind adapter in front of it."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+SCORES = [(300, 'a'), (100, 'b'), (500, 'c'), (300, 'd'), (0, 'e'), (200, 'f'), (500, 'g'), (50, 'h')]
+
+
+def row_count(adapter):
+    return adapter.create_connection().execute(f'select count(*) from {DataBaseAdapter.HIGH_SCORE_DB_NAME};') \
+        .fetchone()[0]
+
+
+class LeaderboardTest(unittest.TestCase):
+    def setUp(self):
+        self.db = DataBaseAdapter(':memory:')
+        self.db.due = len(SCORES)  # no trim on the first add
+        self.memory = MemoryDataBaseAdapter()
+        for adapter in (self.db, self.memory):
+            for score, name in SCORES:
+                adapter.add_score(score, name)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_top_n_is_best_first_ties_oldest_first(self):
+        expected = [('c', 500), ('g', 500), ('a', 300), ('d', 300), ('f', 200)]
+        self.assertEqual(self.db.top_n(5), expected)
+        self.assertEqual(self.memory.top_n(5), expected)
+
+    def test_rank_counts_strictly_better_scores(self):
+        for score, rank in ((600, 1), (500, 1), (400, 3), (300, 3), (250, 5), (0, 8), (-1, 9)):
+            self.assertEqual(self.db.rank(score), rank, score)
+            self.assertEqual(self.memory.rank(score), rank, score)
+
+    def test_high_score_follows_adds(self):
+        self.assertEqual(self.db.get_high_score(), 500)
+        self.db.add_score(700)
+        self.memory.add_score(700)
+        self.assertEqual(self.db.get_high_score(), 700)
+        self.assertEqual(self.memory.get_high_score(), 700)
+
+    def test_trim_keeps_ties_with_the_last_kept(self):
+        self.assertEqual(self.db.trim(3), 4)  # 500, 500, 300 and the tied 300 stay
+        self.assertEqual(self.memory.trim(3), 4)
+        self.assertEqual(row_count(self.db), 4)
+        self.assertEqual(self.db.top_n(10), self.memory.top_n(10))
+        self.assertEqual(self.db.trim(10), 0)
+
+    def test_first_add_trims_then_every_trim_every(self):
+        db = DataBaseAdapter(':memory:')
+        try:
+            db.add_score(1)  # a process's first add trims
+            self.assertEqual(db.due, DataBaseAdapter.TRIM_EVERY)
+            for score in range(DataBaseAdapter.TRIM_EVERY):
+                db.add_score(score)
+            self.assertEqual(db.due, 0)
+            db.add_score(1)
+            self.assertEqual(db.due, DataBaseAdapter.TRIM_EVERY)
+        finally:
+            db.close()
+
+    def test_set_high_score_drops_higher_scores(self):
+        for adapter in (self.db, self.memory):
+            adapter.set_high_score(250)
+            self.assertEqual(adapter.get_high_score(), 250)
+            self.assertEqual(adapter.top_n(3), [(None, 250), ('f', 200), ('b', 100)])
+
+    def test_set_high_score_zero_empties_the_leaderboard(self):
+        for adapter in (self.db, self.memory):
+            adapter.set_high_score(0)
+            adapter.set_high_score(0)
+            self.assertEqual(adapter.get_high_score(), 0)
+            self.assertEqual(adapter.top_n(10), [])
+            self.assertEqual(adapter.rank(0), 1)
+        self.assertEqual(row_count(self.db), 0)
+        self.db.high_score = None  # read back from the table
+        self.assertEqual(self.db.get_high_score(), 0)
+
+
+def run(level, points, accuracy=0.5, **shots):
+    return {'finished': 0, 'level': level, 'points': points, 'duration': points / 100, 'kills': 1, 'power_ups': 0,
+            'jams': 0, 'shots': 2, 'accuracy': accuracy, **shots}
+
+
+class RunsTest(unittest.TestCase):
+    def setUp(self):
+        self.db = DataBaseAdapter(':memory:')
+        self.memory = MemoryDataBaseAdapter()
+        runs = [run(1, points) for points in (70, 10, 40, 100, 20, 90, 30, 60, 80, 50)] + [run(2, 5), run(2, 5)]
+        for adapter in (self.db, self.memory):
+            adapter.add_runs(runs)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_percentiles_are_nearest_rank(self):
+        qs = (0, 10, 11, 50, 51, 90, 99, 100)
+        expected = [10, 10, 20, 50, 60, 90, 100, 100]
+        self.assertEqual(self.db.percentiles('points', 1, qs), expected)
+        self.assertEqual(self.memory.percentiles('points', 1, qs), expected)
+        self.assertEqual(self.db.percentiles('duration', 2), [0.05] * 3)
+
+    def test_percentiles_of_an_unreached_level(self):
+        self.assertEqual(self.db.percentiles('points', 7), [None] * 3)
+        self.assertEqual(self.memory.percentiles('points', 7), [None] * 3)
+
+    def test_percentiles_only_on_indexed_columns(self):
+        with self.assertRaises(ValueError):
+            self.db.percentiles('kills', 1)
+
+    def test_level_averages_from_running_sums(self):
+        averages = self.db.level_averages()
+        self.assertEqual(sorted(averages), [1, 2])
+        self.assertEqual(averages[1]['runs'], 10)
+        self.assertAlmostEqual(averages[1]['points'], 55)
+        self.assertAlmostEqual(averages[2]['duration'], 0.05)
+        self.assertEqual(averages, self.memory.level_averages())
+
+    def test_a_new_gun_column_is_added(self):
+        self.db.add_runs([run(1, 110, shots_laser=3), run(3, 0, shots_laser=4)])
+        self.assertEqual(self.db.level_averages()[3]['shots_laser'], 4)
+        self.assertEqual(self.db.percentiles('points', 1, (100,)), [110])
+
+
+class WriteBehindTest(unittest.TestCase):
+    def setUp(self):
+        self.db = DataBaseAdapter(':memory:')
+        self.db.add_scores(SCORES)
+        self.db.high_score = None
+        self.writer = WriteBehindAdapter(self.db, rows=3)
+
+    def tearDown(self):
+        self.writer.close()
+        self.db.close()
+
+    def test_high_score_read_in_the_background(self):
+        self.assertTrue(self.writer.flush(5))
+        self.assertEqual(self.writer.get_high_score(), 500)
+
+    def test_top_n_is_capped_at_rows(self):
+        self.writer.flush(5)
+        self.writer.add_score(400, 'new')
+        self.assertEqual(self.writer.top_n(10), [('c', 500), ('g', 500), ('new', 400)])
+        self.writer.flush(5)
+        self.assertEqual(self.writer.rank(400), 3)
+
+    def test_high_score_resets_apply_in_order(self):
+        self.writer.set_high_score(0)
+        self.writer.add_score(50)
+        self.writer.set_high_score(100)
+        self.assertTrue(self.writer.flush(5))
+        self.assertEqual(self.db.top_n(10), [(None, 100), (None, 50)])
+        self.assertEqual(self.writer.get_high_score(), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
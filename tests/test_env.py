@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from env import SpaceCloneEnv, N_ACTIONS
+
+"""test_env.py: SpaceCloneEnv games stepped interleaved play as they do alone."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+STEPS = 1500
+
+
+def trajectory(env, actions, steps, seed):
+    """One game's (reward, done, info, observation) per step, from a reset with seed."""
+    env.reset(seed)
+    for action in actions[:steps]:
+        obs, reward, done, info = env.step(int(action))
+        yield reward, done, info, obs.copy()
+        if done:
+            return
+
+
+class InterleavedTest(unittest.TestCase):
+    def test_lives_kept_per_env(self):
+        rand = np.random.RandomState(0)
+        actions = rand.randint(N_ACTIONS, size=(2, STEPS))
+        alone = [list(trajectory(SpaceCloneEnv(), actions[i], STEPS, seed=i + 1)) for i in range(2)]
+        self.assertTrue(any(info['lives'] < 2 for _, _, info, _ in alone[0] + alone[1]))
+
+        games = [trajectory(SpaceCloneEnv(), actions[i], STEPS, seed=i + 1) for i in range(2)]
+        together = [[], []]
+        for _ in range(STEPS):  # a step of each in turn
+            for i, game in enumerate(games):
+                step = next(game, None)
+                if step is not None:
+                    together[i].append(step)
+        for i in range(2):
+            self.assertEqual(len(together[i]), len(alone[i]))
+            for step, (a, b) in enumerate(zip(alone[i], together[i])):
+                self.assertEqual(a[:3], b[:3], f'env {i} step {step}')
+                np.testing.assert_array_equal(a[3], b[3])
@@ -0,0 +1,94 @@
+import unittest
+
+from model import EventQueue, GameEvent
+
+"""test_event_queue.py: Ordering, batching and overflow of the pooled EventQueue."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+Type = GameEvent.EventType
+
+
+def contents(events):
+    return [(event.type, event.args) for event in events]
+
+
+class OrderTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = EventQueue(capacity=4)
+
+    def test_drain_in_emission_order(self):
+        emitted = [(Type.PLAYER_FIRE, 1), (Type.ALIEN_DEATH, 2), (Type.PLAYER_FIRE, 3), (Type.EXPLOSION, 4)]
+        for type_of, args in emitted:
+            self.queue.emit(type_of, coordinates=(args, 0), sound=f'{args}.wav', args=args)
+        self.assertEqual(len(self.queue), 4)
+        events = list(self.queue.drain())
+        self.assertEqual(contents(events), emitted)
+        self.assertEqual([event.coordinates for event in events], [(1, 0), (2, 0), (3, 0), (4, 0)])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_drain_takes_events_emitted_meanwhile(self):
+        self.queue.emit(Type.ALIEN_DEATH, args=1)
+        seen = []
+        for event in self.queue.drain():
+            seen.append((event.type, event.args))
+            if event.type is Type.ALIEN_DEATH:
+                self.queue.emit(Type.EXPLOSION, args=2)
+        self.assertEqual(seen, [(Type.ALIEN_DEATH, 1), (Type.EXPLOSION, 2)])
+
+    def test_order_kept_across_wrap(self):
+        # Many times round both rings, a few events behind.
+        expected, seen = [], []
+        for n in range(200):
+            type_of = (Type.PLAYER_FIRE, Type.ALIEN_1_FIRE)[n % 2]
+            self.queue.emit(type_of, args=n)
+            expected.append((type_of, n))
+            if len(self.queue) == 3:
+                seen += contents([self.queue.pop()])
+        seen += contents(self.queue.drain())
+        self.assertEqual(seen, expected)
+        self.assertEqual(self.queue.overflows, 0)
+
+    def test_drain_batches(self):
+        emitted = [(Type.EXPLOSION, 1), (Type.ALIEN_DEATH, 2), (Type.EXPLOSION, 3), (Type.PLAYER_FIRE, 4),
+                   (Type.ALIEN_DEATH, 5)]
+        for type_of, args in emitted:
+            self.queue.emit(type_of, args=args)
+        batches = [(type_of, [record.args for record in records]) for type_of, records in self.queue.drain_batches()]
+        self.assertEqual(batches, [(Type.EXPLOSION, [1, 3]), (Type.ALIEN_DEATH, [2, 5]), (Type.PLAYER_FIRE, [4])])
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(self.queue.pending(Type.EXPLOSION), 0)
+        self.queue.emit(Type.GUN_JAM, args=6)
+        self.assertEqual(contents(self.queue.drain()), [(Type.GUN_JAM, 6)])
+
+    def test_clear(self):
+        self.queue.emit(Type.PLAYER_FIRE)
+        self.queue.emit(Type.ALIEN_DEATH)
+        self.queue.clear()
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(list(self.queue.drain()), [])
+
+
+class OverflowTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = EventQueue(capacity=2)
+
+    def test_full_channel_drops_and_counts(self):
+        first = self.queue.emit(Type.PLAYER_FIRE, args=1)
+        self.queue.emit(Type.PLAYER_FIRE, args=2)
+        self.assertIsNone(self.queue.emit(Type.PLAYER_FIRE, args=3))
+        self.assertIsNone(self.queue.emit(Type.PLAYER_FIRE, args=4))
+        self.assertIsNotNone(self.queue.emit(Type.ALIEN_DEATH, args=5))  # other channels keep their own room
+        self.assertEqual(self.queue.overflows, 2)
+        stats = self.queue.stats()
+        self.assertEqual(stats['PLAYER_FIRE'], (2, 2))
+        self.assertEqual(stats['ALIEN_DEATH'], (1, 0))
+        self.assertEqual(contents(self.queue.drain()), [(Type.PLAYER_FIRE, 1), (Type.PLAYER_FIRE, 2),
+                                                        (Type.ALIEN_DEATH, 5)])
+        # Drained records go back to the pool and are refilled in turn.
+        self.assertIs(self.queue.emit(Type.PLAYER_FIRE, args=6), first)
+        self.assertEqual(first.args, 6)
+        self.assertEqual(self.queue.stats()['PLAYER_FIRE'], (3, 2))
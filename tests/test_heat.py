@@ -0,0 +1,127 @@
+import random
+import unittest
+
+from heat import WeaponHeat, phase_table
+
+"""test_heat.py: WeaponHeat against the per-tick countdown it replaced, which cooled every gun every step and looked up
+every gun's heat phase every step."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+COUNTDOWN, OVERHEAT_CONSTANT, OVERHEAT_BASE, RECOVERY_RATE, BULLET_MAX = 1000, 60, 2, 15, 6
+JAM_AT = OVERHEAT_BASE + 5  # Model.OVERHEAT_THRESHOLD; last stand adds Model.LAST_STAND_THREASHOLD_RISE
+
+
+class BaselineGun:
+    """One gun as Model.action, Model.overheat_variable_logic and Model.timekeeper ran it."""
+
+    def __init__(self):
+        self.phases = phase_table(COUNTDOWN, OVERHEAT_CONSTANT, OVERHEAT_BASE, BULLET_MAX)
+        self.countdown = COUNTDOWN
+        self.variable = OVERHEAT_BASE
+        self.phase = 0
+        self.jam = False
+
+    def fire(self, jam_at):
+        if self.jam:
+            if self.countdown <= 0:
+                self.jam = False
+            return False
+        if self.countdown > 0:
+            if self.variable == OVERHEAT_BASE:
+                self.countdown += COUNTDOWN + OVERHEAT_CONSTANT / self.variable
+            else:
+                self.countdown += OVERHEAT_CONSTANT / self.variable
+            self.variable += 1
+            if self.variable >= jam_at:
+                self.jam = True
+        return True
+
+    def step(self):
+        for i in range(len(self.phases) - 1):
+            if self.phases[i] < self.countdown <= self.phases[i + 1] and i != self.phase:
+                self.variable = i + OVERHEAT_BASE
+                self.phase = i
+        if self.countdown > 0:
+            self.countdown -= RECOVERY_RATE
+        else:
+            self.countdown = COUNTDOWN
+            self.jam = False
+
+    def state(self):
+        return self.countdown, self.jam, self.variable, self.phase
+
+
+def heat_state(heat, i):
+    gun = heat.guns[i]
+    return heat.countdown(i), gun.jam, gun.variable, gun.phase
+
+
+class BaselineTest(unittest.TestCase):
+    def setUp(self):
+        self.heat = WeaponHeat(['q', 'w'], COUNTDOWN, OVERHEAT_CONSTANT, OVERHEAT_BASE, RECOVERY_RATE, BULLET_MAX)
+        self.baseline = [BaselineGun(), BaselineGun()]
+
+    def play(self, steps, presses):
+        """Steps both engines, pulling the triggers presses(step) names before each step, and compares them."""
+        for step in range(steps):
+            for i, jam_at in presses(step):
+                self.assertEqual(self.heat.fire(i, jam_at), self.baseline[i].fire(jam_at), f'fire {i} at {step}')
+            self.heat.step()
+            for i, gun in enumerate(self.baseline):
+                gun.step()
+                self.assertEqual(heat_state(self.heat, i), gun.state(), f'gun {i} after step {step}')
+
+    def test_countdown_from_cold(self):
+        # The first shot adds a whole countdown; both guns then cool by the recovery rate a step.
+        self.play(50, lambda step: [(0, JAM_AT)] if step == 0 else [])
+        self.assertEqual(self.heat.countdown(0), 2 * COUNTDOWN + OVERHEAT_CONSTANT / OVERHEAT_BASE - 50 * RECOVERY_RATE)
+        self.assertEqual(self.heat.countdown(1), COUNTDOWN - 50 * RECOVERY_RATE)
+
+    def test_jam_and_recovery(self):
+        # Firing every step jams at the shot that takes the overheat variable to jam_at; the gun then refuses to
+        # fire until the step that runs its countdown down past 0 and resets it.
+        shots = JAM_AT - OVERHEAT_BASE
+        recovery = self.jam_steps(shots)
+        fired = []
+        for step in range(recovery + 1):
+            fired.append(self.heat.fire(0, JAM_AT))
+            self.baseline[0].fire(JAM_AT)
+            self.heat.step()
+            self.baseline[0].step()
+            self.assertEqual(heat_state(self.heat, 0), self.baseline[0].state(), f'after step {step}')
+            self.assertEqual(self.heat.guns[0].jam, shots - 1 <= step < recovery - 1, f'jam after step {step}')
+        self.assertEqual(fired, [True] * shots + [False] * (recovery - shots) + [True])
+
+    @staticmethod
+    def jam_steps(shots):
+        """Steps from the first of shots fired on successive steps until the countdown has been reset."""
+        countdown = COUNTDOWN + COUNTDOWN
+        for variable in range(OVERHEAT_BASE, OVERHEAT_BASE + shots):
+            countdown += OVERHEAT_CONSTANT / variable
+        countdown -= RECOVERY_RATE * (shots - 1)  # cooled between the shots
+        steps = shots - 1
+        while countdown > 0:
+            countdown -= RECOVERY_RATE
+            steps += 1
+        return steps + 1
+
+    def test_random_presses(self):
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.setUp()
+                rand = random.Random(seed)
+                chance = rand.choice([0.02, 0.1, 0.5])
+
+                def presses(step):
+                    return [(i, JAM_AT + 2 * (rand.random() < 0.2)) for i in range(2) if rand.random() < chance]
+                self.play(3000, presses)
+
+    def test_reset(self):
+        self.play(5, lambda step: [(0, JAM_AT), (1, JAM_AT)])
+        self.heat.reset()
+        for i in range(2):
+            self.assertEqual(heat_state(self.heat, i), (COUNTDOWN, False, OVERHEAT_BASE, 0))
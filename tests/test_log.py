@@ -0,0 +1,46 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import log
+
+"""test_log.py: The ring buffer dump() writes out and the log file SPACE_CLONE_LOG can name."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+class ConfigureTest(unittest.TestCase):
+    def tearDown(self):
+        with mock.patch.dict(os.environ, {log.ENV_VAR: ''}):
+            log.configure()
+
+    def test_parse_keeps_file_case(self):
+        self.assertEqual(log.parse_levels('warning,model=debug,file=Logs/Game.log'),
+                         ('WARNING', {'model': 'DEBUG', 'file': 'Logs/Game.log'}))
+
+    def test_ring_dump(self):
+        with mock.patch.dict(os.environ, {log.ENV_VAR: ''}):
+            log.configure('INFO', ring_size=2)
+        logger = log.get_logger('test_log')
+        for n in range(3):
+            logger.info('record %d', n)
+        logger.debug('below the level')
+        out = io.StringIO()
+        log.dump(out)
+        self.assertEqual([line.split(': ', 1)[1] for line in out.getvalue().splitlines()], ['record 1', 'record 2'])
+
+    def test_file_from_environment(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'game.log')
+            with mock.patch.dict(os.environ, {log.ENV_VAR: f'INFO,file={path}'}):
+                log.configure()
+            log.get_logger('test_log').info('to the file')
+            log.shutdown()
+            with open(path, encoding='utf-8') as file:
+                self.assertIn('test_log: to the file', file.read())
+            log.configure()  # drops the stopped file sink
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+import pyglet
+
+pyglet.options['shadow_window'] = False  # fill() needs no GL context
+from particles import ParticleSystem  # noqa: E402
+
+"""test_particles.py: ParticleSystem overflow, culling and the quads fill() writes."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+RED, GREEN = (255, 0, 0), (0, 255, 0)
+
+
+def spawn_row(system, xs, size=5, colour=RED, y=10):
+    xs = np.asarray(xs, np.float32)
+    system.spawn(xs, y, 0, 0, size, colour)
+
+
+class OverflowTest(unittest.TestCase):
+    def test_oldest_make_room(self):
+        system = ParticleSystem(10)
+        spawn_row(system, range(6), colour=RED)
+        spawn_row(system, range(6, 12), colour=GREEN)
+        self.assertEqual(len(system), 10)
+        np.testing.assert_array_equal(system.x[:10], range(2, 12))
+        self.assertEqual(system.colour[:4].tolist(), [list(RED) * 4] * 4)  # colours moved with their particles
+        self.assertEqual(system.colour[4:10].tolist(), [list(GREEN) * 4] * 6)
+
+    def test_burst_over_capacity_keeps_its_newest(self):
+        system = ParticleSystem(10)
+        spawn_row(system, range(3))
+        spawn_row(system, range(100, 125))
+        self.assertEqual(len(system), 10)
+        np.testing.assert_array_equal(system.x[:10], range(115, 125))
+
+
+class CullTest(unittest.TestCase):
+    def test_size_runs_out(self):
+        system = ParticleSystem(8, size_decay=1)
+        system.spawn(np.arange(3, dtype=np.float32), 10, 1, 0, np.array([1, 2, 3], np.float32), RED)
+        lives = []
+        for tick in range(4):
+            system.update(tick)
+            lives.append(len(system))
+        self.assertEqual(lives, [2, 1, 0, 0])
+
+    def test_survivors_packed_in_order(self):
+        system = ParticleSystem(8, size_decay=1)
+        system.spawn(np.arange(5, dtype=np.float32), 10, 1, 0, np.array([3, 1, 3, 1, 3], np.float32), RED)
+        system.update(0)
+        self.assertEqual(len(system), 3)
+        np.testing.assert_array_equal(system.x[:3], [1, 3, 5])  # moved by dx before the dead were dropped
+        np.testing.assert_array_equal(system.size[:3], [2, 2, 2])
+
+    def test_below_floor(self):
+        system = ParticleSystem(8, tick_rate=2, gravity=1)
+        system.spawn(np.zeros(2, np.float32), np.array([0.5, 5], np.float32), 0, 0, 4, RED)
+        system.update(1)  # not a step on this tick rate
+        self.assertEqual(system.y[:2].tolist(), [0.5, 5])
+        for tick in (2, 4):
+            system.update(tick)
+        self.assertEqual(len(system), 2)  # y was 0.5, then -0.5 after the second step
+        system.update(6)
+        self.assertEqual(len(system), 1)
+
+
+class FillTest(unittest.TestCase):
+    def setUp(self):
+        self.system = ParticleSystem(16)
+        self.vertices = np.full((16, 8), 7, np.float32)
+        self.colours = np.zeros((16, 12), np.uint8)
+
+    def test_quads(self):
+        spawn_row(self.system, [0, 20, 40], size=5, colour=GREEN)
+        self.system.fill(self.vertices, self.colours)
+        n = len(self.system)
+        self.assertEqual(self.vertices[:n].tolist(), [[x, 10, x, 15, x + 5, 15, x + 5, 10] for x in (0, 20, 40)])
+        self.assertEqual(self.colours[:n].tolist(), [list(GREEN) * 4] * n)
+        self.assertTrue((self.vertices[n:] == 7).all())  # nothing written past the live particles
+
+    def test_dead_quads_collapsed(self):
+        spawn_row(self.system, range(5))
+        self.system.fill(self.vertices, self.colours)
+        self.system.keep(slice(3, None))
+        self.system.fill(self.vertices, self.colours)
+        self.assertEqual(self.vertices[:2, 0].tolist(), [3, 4])
+        self.assertTrue((self.vertices[2:5] == 0).all())
+        self.assertTrue((self.vertices[5:] == 7).all())
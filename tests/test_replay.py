@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+import replay
+from headless import HeadlessRunner
+from replay import Recorder, state_digest
+
+"""test_replay.py: A recorded headless run plays back to the recorded final state, and a seed fixes a whole run."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+SEED = 3
+
+
+def final_digest(seed, ticks):
+    runner = HeadlessRunner(seed=seed)
+    runner.run(ticks)
+    return state_digest(runner.model)
+
+
+class ReplayTest(unittest.TestCase):
+    def test_recording_plays_back(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'run.scr')
+            runner = HeadlessRunner(seed=SEED, recorder=Recorder(path))  # as headless.py --record builds it
+            result = runner.run(5000)
+            self.assertTrue(result.game_over)
+            self.assertGreater(result.event_counts['RESET_SCREEN'], 0)  # several models in the one file
+
+            played = replay.play(path)
+        self.assertTrue(played.matches)
+        self.assertEqual(played.digest, state_digest(runner.model))
+        self.assertEqual(played.ticks, result.ticks)
+        self.assertEqual(played.model.points, result.points)
+
+    def test_seed_fixes_the_run(self):
+        self.assertEqual(final_digest(SEED, 600), final_digest(SEED, 600))
+        self.assertNotEqual(final_digest(SEED, 600), final_digest(SEED + 1, 600))
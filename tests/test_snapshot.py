@@ -0,0 +1,57 @@
+import unittest
+
+from db_adapter import MemoryDataBaseAdapter
+from headless import RandomInput
+from model import Model
+
+"""test_snapshot.py: Model.snapshot() and restore() round trips, heat clock included."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+def played(seed, ticks):
+    model = Model(0, seed % 3, db_adapter=MemoryDataBaseAdapter(), seed=seed)
+    inputs = RandomInput(seed, fire_chance=0.2)
+    for tick in range(ticks):
+        for key_val, action_type in inputs.poll(tick, model):
+            model.action(key_val, action_type)
+        model.update(1 / 60)
+        model.events.clear()
+    return model
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_restore_reproduces_snapshot(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                model = played(seed, 150 * (1 + seed))
+                blob = model.snapshot()
+                twin = Model(db_adapter=MemoryDataBaseAdapter(), seed=0)
+                twin.restore(blob)
+                self.assertEqual(twin.heat.now, model.heat.now)
+                self.assertEqual(twin.lives, model.lives)
+                self.assertEqual(twin.snapshot(), blob)
+
+                for _ in range(300):
+                    model.update(1 / 60)
+                expected = model.snapshot()
+                twin.restore(blob)
+                for _ in range(300):
+                    twin.update(1 / 60)
+                self.assertEqual(twin.snapshot(), expected)
+
+    def test_lives_restored(self):
+        model = Model(db_adapter=MemoryDataBaseAdapter(), seed=0, lives=1)
+        twin = Model(db_adapter=MemoryDataBaseAdapter(), seed=0)
+        twin.restore(model.snapshot())
+        self.assertEqual(twin.lives, 1)
+        self.assertEqual(Model(db_adapter=MemoryDataBaseAdapter(), seed=0).lives, Model.START_LIVES)
+
+    def test_version_checked(self):
+        blob = bytearray(played(0, 10).snapshot())
+        blob[0] -= 1
+        with self.assertRaises(ValueError):
+            Model(db_adapter=MemoryDataBaseAdapter(), seed=0).restore(bytes(blob))
@@ -0,0 +1,62 @@
+import random
+import unittest
+
+from timestep import FixedTimestep
+
+"""test_timestep.py: FixedTimestep's catch-up cap, dropped backlog, leftover accumulator and alpha."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+class AdvanceTest(unittest.TestCase):
+    def setUp(self):
+        self.dts = []
+        self.timestep = FixedTimestep(self.dts.append, dt=0.25, max_steps=3)  # binary fractions, exact arithmetic
+
+    def test_leftover_carried(self):
+        self.assertEqual(self.timestep.advance(0.625), 2)
+        self.assertEqual(self.timestep.accumulator, 0.125)
+        self.assertEqual(self.timestep.alpha, 0.5)
+        self.assertEqual(self.timestep.advance(0.125), 1)
+        self.assertEqual(self.timestep.accumulator, 0)
+        self.assertEqual(self.timestep.advance(0.125), 0)
+        self.assertEqual(self.dts, [0.25] * 3)
+        self.assertEqual((self.timestep.steps, self.timestep.dropped_steps), (3, 0))
+
+    def test_catch_up_capped(self):
+        self.assertEqual(self.timestep.advance(0.75), 3)  # exactly the cap, nothing dropped
+        self.assertEqual(self.timestep.dropped_steps, 0)
+        self.assertEqual(self.timestep.advance(2.125), 3)
+        self.assertEqual(len(self.dts), 6)
+
+    def test_backlog_dropped_and_counted(self):
+        self.timestep.advance(2.125)  # 8 steps due, 3 run
+        self.assertEqual(self.timestep.dropped_steps, 5)
+        self.assertEqual(self.timestep.accumulator, 0.125)  # the part step stays
+        self.timestep.advance(1.25)
+        self.assertEqual((self.timestep.steps, self.timestep.dropped_steps), (6, 7))
+        self.assertEqual(self.timestep.accumulator, 0.125)
+
+    def test_reset(self):
+        self.timestep.advance(0.375)
+        self.timestep.reset()
+        self.assertEqual(self.timestep.alpha, 0)
+        self.assertEqual(self.timestep.advance(0.125), 0)
+
+
+class AlphaTest(unittest.TestCase):
+    def test_alpha_in_range(self):
+        # Display rates and hitches that do not divide 1/60, where rounding could leave a whole step behind.
+        rand = random.Random(5)
+        timestep = FixedTimestep(lambda dt: None, dt=1 / 60, max_steps=5)
+        elapsed = 0
+        for frame in range(20000):
+            frame_time = rand.choice([1 / 144, 1 / 75, 1 / 60, 1 / 30, 0.05, 0.1, 0.5, rand.uniform(0, 0.2)])
+            elapsed += frame_time
+            steps = timestep.advance(frame_time)
+            self.assertLessEqual(steps, 5)
+            self.assertTrue(0 <= timestep.alpha < 1, f'alpha {timestep.alpha} after frame {frame}')
+        self.assertAlmostEqual((timestep.steps + timestep.dropped_steps + timestep.alpha) / 60, elapsed, places=6)
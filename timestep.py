@@ -0,0 +1,44 @@
+"""timestep.py: Fixed-timestep driver, steps the simulation at a constant rate whatever the display refresh."""
+
+__author__ = "Daniel Skyrme, Joe Lovell"
+__licence__ = "GNU General Public License v3.0"
+__email__ = "danielskyrme@hotmail.com"
+__credits__ = ["Joe Lovell"]
+
+
+class FixedTimestep:
+    """Feeds real frame times into an accumulator and calls step(dt) once per whole dt it holds.
+
+    At most max_steps steps run per advance(); any backlog beyond that is dropped (and counted) rather than carried,
+    so a machine that cannot keep up slows down instead of spiralling. alpha is how far the accumulator is into the
+    next step, for drawing between the last two simulated states."""
+
+    def __init__(self, step, dt=1 / 60, max_steps=5):
+        self.step = step
+        self.dt = dt
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.steps = 0
+        self.dropped_steps = 0
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
+
+    def advance(self, elapsed):
+        """Returns the number of steps run for elapsed seconds of real time."""
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.max_steps:
+            self.step(self.dt)
+            self.accumulator -= self.dt
+            steps += 1
+        if self.accumulator >= self.dt:
+            backlog = int(self.accumulator // self.dt)
+            self.dropped_steps += backlog
+            self.accumulator -= backlog * self.dt
+        self.steps += steps
+        return steps
+
+    def reset(self):
+        self.accumulator = 0.0
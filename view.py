@@ -1,18 +1,24 @@
+import atexit
 import math, random
 import pyglet
 import sys
 from pyglet import graphics
 from pyglet.graphics import Batch, GL_QUADS, GL_LINES, GL_TRIANGLE_FAN
-from model import Model, GameModel, GameEvent, GameObject
+from model import Model, GameModel, GameEvent, GameObject, Swarm
 import numpy as np
 from frame import GameFrame, GameButton
 from functools import partial
 from enum import Enum
 from abc import ABC, abstractmethod
 from db_adapter import DataBaseAdapter
+from replay import Recorder
 import os
-
-KEY_PRESS, KEY_RELEASE = 0, 1
+from controls import KEY_PRESS, KEY_RELEASE
+from log import get_logger
+from labels import LabelCache
+from particles import ParticleSystem
+from profiler import FrameProfiler
+from stats import RunStats
 
 """view.py: Front end."""
 
@@ -21,6 +27,8 @@ __licence__ = "GNU General Public License v3.0"
 __email__ = "danielskyrme@hotmail.com"
 __credits__ = ["Joe Lovell"]
 
+logger = get_logger(__name__)
+
 
 class SpaceWindow(GameFrame):
     class Scene(Enum):
@@ -50,12 +58,52 @@ class SpaceWindow(GameFrame):
     MAIN_BTN_WIDTH_PERCENT, MAIN_BTN_HEIGHT_PERCENT, MAIN_BTN_LBLS_PADDING_Y_PERCENT = 0.25, 0.1, 0.1
     STAR_MOVE_SPEED = 3
     STAR_SIZE = 1
+    STAR_LAYERS = ((220, STAR_SIZE, 0.5, 120), (140, STAR_SIZE, 1, 200), (40, 2 * STAR_SIZE, 1.5, 255))  # 400 stars
     COOLDOWN = 120
     MAX_GLOW_INTENSITY = 200
+    LEADERBOARD_ROWS = 10
     GLOW_INTENSITY_REDUCTION_RATE = 4
-
-    def __init__(self, dev_mode=False):
-        super(SpaceWindow, self).__init__(dev_mode)
+    BLOOD_COLOUR = (102, 0, 0)
+    FLAME_COLOURS = ((255, 91, 20), (255, 35, 35), (255, 162, 85))
+    DEBRIS_COLOUR = (80, 80, 80)
+    SPILL_CAPACITY, DEBRIS_CAPACITY = 16384, 8192  # past these the oldest particles go first
+    SPILL_BURST, SPILL_SPEED, SPILL_SIZE, SPILL_SIZE_DECAY, SPILL_SCATTER = 15, 2, 9, 0.2, 15
+    DEBRIS_BURST, DEBRIS_SPEED, DEBRIS_SIZE, DEBRIS_SCATTER, DEBRIS_TICK_RATE = 80, 30, 10, 10, 2
+    # Method called once a tick with all of that tick's events of a type, oldest first. Types without one only
+    # play their sounds.
+    EVENT_HANDLERS = {GameEvent.EventType.ALIEN_DEATH: 'on_alien_deaths',
+                      GameEvent.EventType.EXPLOSION: 'on_explosions',
+                      GameEvent.EventType.GAME_OVER: 'on_game_over',
+                      GameEvent.EventType.EXIT_MENU: 'on_exit_menu',
+                      GameEvent.EventType.RESET_SCREEN: 'on_reset_screen',
+                      GameEvent.EventType.NEXT_LEVEL: 'on_next_level',
+                      GameEvent.EventType.PLAYER_DEATH: 'on_player_deaths',
+                      GameEvent.EventType.POWER_UP_COLLECT: 'on_power_ups',
+                      GameEvent.EventType.GUN_JAM: 'on_gun_jams'}
+    # Timed in dev mode. Each is exclusive of those nested in it, update excludes model_update and trigger_events.
+    PROFILE_STAGES = ('update', 'model_update', 'trigger_events', 'draw_stars', 'draw_lasers', 'draw_sprite_objs',
+                      'draw_pixel_spills', 'draw_falling_parts', 'draw_point_lbls', 'draw_header')
+    PROFILE_COLOURS = ((230, 230, 230), (255, 80, 80), (255, 170, 0), (120, 120, 255), (0, 200, 255),
+                       (80, 220, 80), (255, 91, 200), (160, 100, 40), (255, 255, 0), (150, 60, 255))
+    PROFILE_PX_PER_MS = 6
+    FRAME_BUDGET_MS = 1000 / 60
+
+    def __init__(self, dev_mode=False, record_path=None, profile_csv=None, swarm=None, log_file=None):
+        self.swarm = swarm
+        self.stats = RunStats(dt=self.STEP_DT)  # of the game being played, counted from its events
+        self.rand = random.Random()  # effects only, gameplay randomness lives in each Model
+        self.numbers = np.random.RandomState(self.rand.getrandbits(32))  # the same for effects spawned in bulk
+        self.pixel_spills = ParticleSystem(self.SPILL_CAPACITY, size_decay=self.SPILL_SIZE_DECAY)
+        self.falling_parts = ParticleSystem(self.DEBRIS_CAPACITY, tick_rate=self.DEBRIS_TICK_RATE, gravity=1)
+        self.recorder = Recorder(record_path) if record_path else None
+        self.profile_csv = profile_csv or 'frame_profile.csv'
+        self.profile_lbls = []
+        if dev_mode or profile_csv:
+            self.profiler = FrameProfiler(self.PROFILE_STAGES)
+            self.profiler.instrument(self, [stage for stage in self.PROFILE_STAGES if stage != 'model_update'])
+            if profile_csv:
+                atexit.register(self.export_profile)
+        super(SpaceWindow, self).__init__(dev_mode, log_file)
         pyglet.gl.glEnable(pyglet.gl.GL_BLEND)
         pyglet.gl.glBlendFunc(pyglet.gl.GL_SRC_ALPHA, pyglet.gl.GL_ONE_MINUS_SRC_ALPHA)
         self.player_glow_colour = [255, 255, 255]
@@ -66,18 +114,24 @@ class SpaceWindow(GameFrame):
         self.large_txt_size = self.main_width // 30
         self.medium_txt_size = self.main_width // 40
         self.small_txt_size = self.main_width // 50
+        self.header_txt_size = self.main_width // 65
+        self.pts_txt_size = self.main_width // 140
+        self.pt_labels = LabelCache('8Bit Wonder', Batch())  # one per FadingPoints while it fades
         self.set_caption("Space Clone")
         self.head_lbl = None
         self.tick = 0
+        self.ship_prev = (None, 0, 0)
         self.img_base = dict()
-        self.star_pts = []
+        self.stars = None
         self.generate_stars()
         self.flame_colours = []
-        self.rendered_sprite = []
-        self.pixel_spills = []
-        self.falling_parts = []
+        self.sprites = {}  # game object -> [its sprite, the img_name it shows], kept while the object lives
+        self.sprite_screen = None  # (main_width, height) the pooled sprites are scaled for
+        self.player_batch = Batch()
+        self.sprite_batch = Batch()
         self.pt_lbls = []
-        self.star_batch = []
+        self.leaderboard = []  # display lines, refreshed on game over until the rank is known
+        self.rank = None
         self.main_btns[0].func = partial(self.change_scene, self.Scene.MAIN_TO_PLAYING)
         self.main_btns[1].func = partial(self.change_scene, self.Scene.MAIN_MENU_WITH_OPTIONS)
         self.main_btns[2].func = partial(self.change_scene, self.Scene.CLOSING)
@@ -104,51 +158,88 @@ class SpaceWindow(GameFrame):
             self.settings.set_sound(False)
         else:
             self.settings.set_sound(True)
+        self.labels.warm([self.header_txt_size, self.pts_txt_size, self.small_txt_size // 2, self.small_txt_size,
+                          self.large_txt_size,
+                          *(0.3 * btn.height for btn in (*self.main_btns, *self.opt_btns, *self.pause_btns))])
 
     def trigger_events(self):
-        events = self.model.get_game_events()
-        ev: GameEvent
+        """Hands each event type's events for the tick to its handler in one call, then plays each requested
+        sound once however many events asked for it."""
+        sounds = {}
+        for type_of, events in self.model.get_game_events().drain_batches():
+            logger.debug('Events received: %s x%d', type_of, len(events))
+            self.stats.tally(type_of, events)
+            handler = self.EVENT_HANDLERS.get(type_of)
+            if handler is not None:
+                getattr(self, handler)(events)
+            for ev in events:
+                if ev.sound is not None:
+                    sounds[ev.sound] = True
+        if not GameFrame.dev_mode:
+            for sound in sounds:
+                self.play_sound(sound)
+
+    def on_alien_deaths(self, events):
+        xs = [self.to_screen_x(ev.coordinates[0]) for ev in events]
+        ys = [self.to_screen_y(ev.coordinates[1]) for ev in events]
+        self.trigger_pixel_spill(xs, ys, [self.BLOOD_COLOUR], 0.5, 1)
+        for ev, x, y in zip(events, xs, ys):
+            self.trigger_pts_lbl(str(ev.args[0]), x, y)
+
+    def on_explosions(self, events):
+        self.trigger_pixel_spill([self.to_screen_x(ev.coordinates[0]) for ev in events],
+                                 [self.to_screen_y(ev.coordinates[1]) for ev in events], self.FLAME_COLOURS, 1, 0.66)
+        self.player_glow_intensity = self.MAX_GLOW_INTENSITY
+
+    def on_game_over(self, events):
+        self.stats.end_level(self.model)
+        self.db_adapter.add_run(self.stats.row())
+        self.stats = RunStats(dt=self.STEP_DT)
+        self.rank = None
+        self.set_leaderboard()
+        self.change_scene(self.Scene.GAME_OVER)
+
+    def set_leaderboard(self):
+        # From memory; the rank shows up once the persistence thread has written the score and looked it up.
+        self.rank = self.db_adapter.rank(self.model.points)
+        self.leaderboard = [f'{i}  {name or "---"}  {score}'
+                            for i, (name, score) in enumerate(self.db_adapter.top_n(self.LEADERBOARD_ROWS), 1)]
+        if self.rank is not None:
+            self.leaderboard.append(f'You ranked {self.rank}')
+
+    def on_exit_menu(self, events):
+        self.exit_to_menu()
+
+    def on_reset_screen(self, events):
+        if not self.model.game_over:  # a life lost, else a new game after game over
+            self.stats.end_level(self.model)
+        self.change_scene(self.Scene.RESTART)
+
+    def on_next_level(self, events):
+        self.stats.end_level(self.model)
+        self.change_scene(self.Scene.NEXT_LEVEL)
+
+    def on_player_deaths(self, events):
+        self.trigger_falling_parts([self.to_screen_x(ev.coordinates[0]) for ev in events],
+                                   [self.to_screen_y(ev.coordinates[1]) for ev in events], self.DEBRIS_COLOUR,
+                                   self.model.player.width)
+
+    def on_power_ups(self, events):
         for ev in events:
-            print("Event recieved: ", ev.type)
-            if ev.type == GameEvent.EventType.ALIEN_DEATH:
-                colour = 4 * PixelSpillBlock.BLOOD_COLOUR
-                x, y = self.to_screen_x(ev.coordinates[0]), self.to_screen_y(ev.coordinates[1])
-                self.trigger_pixel_spill(x, y, [colour], 0.5, 1)
-                self.trigger_pts_lbl(str(ev.args[0]), x, y)
-            elif ev.type == GameEvent.EventType.EXPLOSION:
-                colours = [4 * col for col in PixelSpillBlock.FLAME_COLOURS]
-                self.trigger_pixel_spill(self.to_screen_x(ev.coordinates[0]), self.to_screen_y(ev.coordinates[1]),
-                                         colours, 1, 0.66)
-                self.player_glow_intensity = self.MAX_GLOW_INTENSITY
-            elif ev.type == GameEvent.EventType.GAME_OVER:
-                self.change_scene(self.Scene.GAME_OVER)
-            elif ev.type == GameEvent.EventType.EXIT_MENU:
-                self.exit_to_menu()
-            elif ev.type == GameEvent.EventType.RESET_SCREEN:
-                self.change_scene(self.Scene.RESTART)
-            elif ev.type == GameEvent.EventType.NEXT_LEVEL:
-                self.change_scene(self.Scene.NEXT_LEVEL)
-            elif ev.type == GameEvent.EventType.PLAYER_DEATH:
-                col = 4 * [80, 80, 80]
-                self.trigger_falling_parts(self.to_screen_x(ev.coordinates[0]),
-                                           self.to_screen_y(ev.coordinates[1]), col, self.model.player.width)
-            elif ev.type == GameEvent.EventType.POWER_UP_COLLECT:
-                self.pt_lbls.append(FadingPoints('1000', self.to_screen_x(ev.coordinates[0]),
-                                                 self.to_screen_y(ev.coordinates[1])))
-                self.player_glow_intensity = self.MAX_GLOW_INTENSITY
-                self.player_glow_colour = [0, 0, 255]
-            elif ev.type == GameEvent.EventType.GUN_JAM:
-                self.player_glow_intensity = self.MAX_GLOW_INTENSITY
-            if not GameFrame.dev_mode and hasattr(ev, 'sound') and ev.sound is not None:
-                self.play_sound(ev.sound)
-            self.model.events = []
+            self.pt_lbls.append(FadingPoints('1000', self.to_screen_x(ev.coordinates[0]),
+                                             self.to_screen_y(ev.coordinates[1])))
+        self.player_glow_intensity = self.MAX_GLOW_INTENSITY
+        self.player_glow_colour = [0, 0, 255]
+
+    def on_gun_jams(self, events):
+        self.player_glow_intensity = self.MAX_GLOW_INTENSITY
 
     def change_scene(self, scene):
         if not self.scene or self.scene != scene:
             if scene == self.Scene.PLAYING:
                 self.set_mouse_visible(True if GameFrame.dev_mode else False)
-                self.pixel_spills = []
-                self.falling_parts = []
+                self.pixel_spills.clear()
+                self.falling_parts.clear()
                 self.pts = []
                 self.is_counting = False
                 self.alpha = 0
@@ -162,7 +253,8 @@ class SpaceWindow(GameFrame):
                 self.set_mouse_visible(True if GameFrame.dev_mode else False)
                 self.is_counting = True
                 self.cooldown = self.COOLDOWN
-                self.model = Model()
+                self.model = self.new_model()
+                self.stats = RunStats(dt=self.STEP_DT)
             elif scene in {self.Scene.MAIN_MENU, self.Scene.MAIN_MENU_WITH_OPTIONS}:
                 self.set_mouse_visible(True)
                 if self.settings.has_sound and self.main_menu_song is None:
@@ -176,10 +268,13 @@ class SpaceWindow(GameFrame):
             elif scene == self.Scene.PAUSED:
                 self.set_mouse_visible(True)
             elif scene == self.Scene.CLOSING:
+                self.db_adapter.close()
                 sys.exit()
             self.scene = scene
 
     def update(self, dt):
+        self.tick += 1
+        self.update_particles()
         if self.player_glow_intensity > 0:
             self.player_glow_intensity -= self.GLOW_INTENSITY_REDUCTION_RATE
         for i in range(0, 3):
@@ -192,6 +287,8 @@ class SpaceWindow(GameFrame):
             self.update_stars()
         elif self.scene == self.Scene.PLAYING:
             self.alpha = 0
+            ship = self.model.player
+            self.ship_prev = (ship, ship.x, ship.y)  # drawn between this and the new position
             self.model.update(dt)
             self.trigger_events()
         elif self.scene == self.Scene.MAIN_TO_PLAYING:
@@ -202,40 +299,54 @@ class SpaceWindow(GameFrame):
                     self.change_scene(self.Scene.PLAYING)
             self.update_stars()
         elif self.scene == self.Scene.GAME_OVER:
+            if self.rank is None:
+                self.set_leaderboard()
             self.trigger_events()
         elif self.scene == self.Scene.NEXT_LEVEL or self.scene == self.Scene.RESTART:
             difficulty = self.model.difficulty + 1 if self.scene == self.Scene.NEXT_LEVEL else 0
+            lives = Model.START_LIVES if self.model.game_over else self.model.lives  # a new game after game over
             if self.cooldown <= 0:
-                self.model = Model(self.model.points, difficulty)
+                self.model = self.new_model(self.model.points, difficulty, lives)
                 self.change_scene(self.Scene.PLAYING)
 
     def set_model(self):
-        self.model = Model()
+        self.model = self.new_model()
+
+    def new_model(self, pts=0, difficulty=0, lives=Model.START_LIVES):
+        model = Model(pts, difficulty, db_adapter=self.db_adapter, recorder=self.recorder, swarm=self.swarm,
+                      lives=lives)
+        if self.profiler is not None:
+            self.profiler.instrument(model, {'update': 'model_update'})
+        return model
 
     def exit_to_menu(self):
         self.set_model()
-        self.pixel_spills = []
-        self.falling_parts = []
+        self.pixel_spills.clear()
+        self.falling_parts.clear()
         self.pt_lbls = []
         self.change_scene(self.Scene.MAIN_MENU)
 
     def trigger_pts_lbl(self, txt, x, y):
         self.pt_lbls.append(FadingPoints(txt, x, y))
 
-    def trigger_falling_parts(self, src_x, src_y, colours=(255, 255, 255, 255), span=10):
-        num_of = 80
-        for x in np.linspace(src_x - span / 2, src_x + span / 2, num_of):
-            offset = random.randint(-10, 10)
-            self.falling_parts.append(FallingBlock(x + offset, src_y, 30, colours, 10))
+    def trigger_falling_parts(self, src_x, src_y, colour=(255, 255, 255), span=10):
+        """DEBRIS_BURST blocks thrown up across span from each source; src_x and src_y are numbers or sequences."""
+        xs = np.linspace(-span / 2, span / 2, self.DEBRIS_BURST) + np.reshape(src_x, (-1, 1))
+        xs += self.numbers.randint(-self.DEBRIS_SCATTER, self.DEBRIS_SCATTER + 1, xs.shape)
+        speed = self.DEBRIS_SPEED
+        self.falling_parts.spawn(xs, np.reshape(src_y, (-1, 1)),
+                                 self.numbers.randint(-speed // 8, speed // 8 + 1, xs.shape),
+                                 self.numbers.random_sample(xs.shape) * speed, self.DEBRIS_SIZE, colour)
 
     def trigger_pixel_spill(self, src_x, src_y, colours, circ_range_ratio, speed_ratio):
-        start = 0
-        for theta in np.linspace(start, start + circ_range_ratio * 2 * math.pi, num=15):
-            ran_x = random.randint(0, 15)
-            ran_y = random.randint(0, 15)
-            self.pixel_spills.append(PixelSpillBlock(src_x + ran_x, src_y + ran_y, theta,
-                                                     colours[random.randint(0, len(colours) - 1)],
-                                                     speed=speed_ratio, size=1))
+        """SPILL_BURST pixels fanned over circ_range_ratio of a circle from each source, each in one of colours."""
+        thetas = np.linspace(0, circ_range_ratio * 2 * math.pi, num=self.SPILL_BURST)
+        shape = (np.size(src_x), self.SPILL_BURST)  # a row per source
+        speed = self.SPILL_SPEED * speed_ratio
+        scatter_x, scatter_y = self.numbers.randint(0, self.SPILL_SCATTER + 1, (2,) + shape)
+        self.pixel_spills.spawn(np.reshape(src_x, (-1, 1)) + scatter_x, np.reshape(src_y, (-1, 1)) + scatter_y,
+                                np.cos(thetas) * speed, np.sin(thetas) * speed, self.SPILL_SIZE,
+                                np.asarray(colours, np.uint8)[self.numbers.randint(len(colours), size=shape)])
 
     def get_btn_labels(self):
         return "START_GAME", "OPTIONS", "EXIT"
@@ -246,47 +357,42 @@ class SpaceWindow(GameFrame):
         pyglet.font.load(self.font_name)
 
     def generate_stars(self):
-        self.star_pts = []
-        for i in range(0, 400):
-            x = math.floor(random.random() * self.main_width)
-            y = math.floor(random.random() * self.main_height)
-            self.star_pts.extend([[x, y,
-                                   x + SpaceWindow.STAR_SIZE, y,
-                                   x + SpaceWindow.STAR_SIZE, y + SpaceWindow.STAR_SIZE,
-                                   x, y + SpaceWindow.STAR_SIZE]])
+        if self.stars is not None:
+            self.stars.delete()
+        self.stars = StarField(self.main_width, self.main_height, self.STAR_LAYERS, self.rand)
 
     def update_stars(self):
-        for i, val in enumerate(self.star_pts):
-            is_loop = False
-            to_move = SpaceWindow.STAR_MOVE_SPEED
-            if self.scene == self.Scene.MAIN_TO_PLAYING:
-                to_move = (self.cooldown / SpaceWindow.COOLDOWN) * SpaceWindow.STAR_MOVE_SPEED
-            if self.star_pts[i][2] + to_move >= self.width - SpaceWindow.STAR_SIZE:
-                is_loop = True
-            for j in range(0, len(self.star_pts[i]), 2):
-                self.star_pts[i][j] = (self.star_pts[i][j] + to_move)
-                if is_loop:
-                    self.star_pts[i][j] -= self.width
+        to_move = SpaceWindow.STAR_MOVE_SPEED
+        if self.scene == self.Scene.MAIN_TO_PLAYING:
+            to_move = (self.cooldown / SpaceWindow.COOLDOWN) * SpaceWindow.STAR_MOVE_SPEED
+        self.stars.scroll(to_move)
 
     def reset_flame_colours(self):
         self.flame_colours = []
         variation_blue = 100
         for i in range(0, 2):
-            blue_val_1 = 255 - random.randint(0, variation_blue)
-            blue_val_2 = 255 - random.randint(0, variation_blue)
+            blue_val_1 = 255 - self.rand.randint(0, variation_blue)
+            blue_val_2 = 255 - self.rand.randint(0, variation_blue)
             self.flame_colours.append(tuple([255, 255, 255, 255,
                                              0, 0, blue_val_1, 50,
                                              0, 0, blue_val_2, 50,
                                              255, 255, 255, 255]))
 
-    def draw_game_screen(self):
-        self.tick += 1
+    def update_particles(self):
+        self.pixel_spills.update(self.tick)
+        self.falling_parts.update(self.tick)
+        for pts in self.pt_lbls:
+            pts.update()
+        self.pt_lbls[:] = [pts for pts in self.pt_lbls if not pts.is_vanished]
+
+    def draw_game_screen(self, alpha=1.0):
+        """alpha is how far real time is between the last two model updates, moving things are drawn that far along."""
         if self.scene in (self.Scene.PLAYING, self.Scene.GAME_OVER, self.Scene.PAUSED):
             self.clear()
             self.draw_stars()
-            self.draw_lasers()
+            self.draw_lasers(alpha if self.scene == self.Scene.PLAYING else 1.0)
             if self.scene == self.Scene.PLAYING or self.scene == self.Scene.PAUSED:
-                self.draw_sprite_objs()
+                self.draw_sprite_objs(alpha if self.scene == self.Scene.PLAYING else 1.0)
             self.draw_pixel_spills()
             self.draw_falling_parts()
             self.draw_point_lbls()
@@ -294,10 +400,14 @@ class SpaceWindow(GameFrame):
             if self.scene == self.Scene.GAME_OVER:
                 lines = ["It's Game Over", "R to Exit.", "Space to retry"]
                 self.draw_display_txt(lines, 3 * [self.small_txt_size])
+                self.draw_display_txt(self.leaderboard, len(self.leaderboard) * [self.small_txt_size // 2],
+                                      origin_y=0.35 * self.height, y_padding=self.small_txt_size // 4)
             elif self.scene == self.Scene.PAUSED:
                 self.draw_pause_menu()
             if GameFrame.dev_mode:
                 self.fps_display.draw()
+            if self.profiler is not None and self.profiler.visible:
+                self.draw_profile_overlay()
         elif self.scene == self.Scene.MAIN_TO_PLAYING:
             self.clear()
             self.draw_stars()
@@ -315,75 +425,125 @@ class SpaceWindow(GameFrame):
                      str((self.cooldown // (math.ceil(self.COOLDOWN // 3))) + 1)]
             self.draw_display_txt(lines, [self.large_txt_size, self.large_txt_size])
 
+    def draw_profile_overlay(self):
+        """Stacked bar per recent frame, one colour per stage, against a line at the 60 Hz budget. The legend shows
+        each stage's p50 / p95 / p99 in ms, refreshed every 30 frames."""
+        ms = self.profiler.recent() * 1000
+        if not len(ms):
+            return
+        x0, y0, bar_w, scale = 10, 10, 3, self.PROFILE_PX_PER_MS
+        frames, stages = ms.shape
+        tops = y0 + np.cumsum(ms, axis=1) * scale
+        bottoms = tops - ms * scale
+        left = np.broadcast_to((x0 + np.arange(frames) * bar_w)[:, None], ms.shape)
+        right = left + bar_w
+        quads = np.stack((left, bottoms, left, tops, right, tops, right, bottoms), axis=2)
+        colours = np.broadcast_to(np.repeat(np.array(self.PROFILE_COLOURS[:stages]), 4, axis=0).reshape(stages, 12),
+                                  (frames, stages, 12))
+        batch = Batch()
+        batch.add(4 * frames * stages, GL_QUADS, None, ('v2f', quads.ravel().tolist()),
+                  ('c3B', colours.ravel().tolist()))
+        budget_y = y0 + self.FRAME_BUDGET_MS * scale
+        batch.add(2, GL_LINES, None, ('v2f', [x0, budget_y, x0 + self.profiler.history.shape[0] * bar_w, budget_y]),
+                  ('c3B', (255, 255, 255, 255, 255, 255)))
+
+        if not self.profile_lbls or self.profiler.frames % 30 == 0:
+            self.profile_lbls = []
+            rows = self.profiler.percentiles()
+            names = list(self.PROFILE_STAGES) + ['total']
+            lbl_colours = self.PROFILE_COLOURS + ((255, 255, 255),)
+            for i, name in enumerate(names):
+                p50, p95, p99 = rows[name]
+                self.profile_lbls.append(pyglet.text.Label(f'{name:<19}{p50:6.2f}{p95:7.2f}{p99:7.2f}',
+                                                           font_name='Courier New', font_size=9,
+                                                           x=x0 + self.profiler.history.shape[0] * bar_w + 12,
+                                                           y=y0 + 14 * (len(names) - i),
+                                                           color=lbl_colours[i] + (255,)))
+        batch.draw()
+        for lbl in self.profile_lbls:
+            lbl.draw()
+
+    def export_profile(self):
+        frames = self.profiler.export_csv(self.profile_csv)
+        logger.info('wrote %d frame timings to %s', frames, self.profile_csv)
+
     def draw_stars(self):
-        star_batch = Batch()
-        for i in self.star_pts:
-            star_batch.add(4, GL_QUADS, None, ('v2f', i))
-        star_batch.draw()
+        self.stars.draw()
 
     def draw_main_menu_background(self):
         self.draw_stars()
 
-    def draw_sprite_objs(self):
-        sprite_batch = Batch()
-        self.rendered_sprite = []
+    def draw_sprite_objs(self, alpha=1.0):
+        if self.sprite_screen != (self.main_width, self.height):
+            self.release_sprites(())
+            self.sprite_screen = (self.main_width, self.height)
         ship = self.model.player
+        ship_x, ship_y = ship.x, ship.y
+        if self.ship_prev[0] is ship:
+            ship_x = self.ship_prev[1] + (ship.x - self.ship_prev[1]) * alpha
+            ship_y = self.ship_prev[2] + (ship.y - self.ship_prev[2]) * alpha
         if ship.is_active:
             colour = self.player_glow_colour
             if self.model.player.is_blown:
                 colour = [255, 0, 0]
 
-            elif self.model.q_jam or self.model.e_jam:
+            elif self.model.heat.jammed():
                 colour = [255, 0, 255]
-            self.draw_illumination(self.to_screen_x(ship.x + ship.width // 2),
-                                   self.to_screen_y(ship.y), 150 + self.player_glow_intensity,
+            self.draw_illumination(self.to_screen_x(ship_x + ship.width // 2),
+                                   self.to_screen_y(ship_y), 150 + self.player_glow_intensity,
                                    colour)
-            player_batch = Batch()
-            player_sprite = self.get_rendered_sprite(ship, player_batch)
-            self.rendered_sprite.append(player_sprite)
-            self.draw_flame(self.to_screen_x(ship.x), self.to_screen_y(ship.y), self.to_screen_x(ship.width))
-            player_batch.draw()
-        objs = []
-        objs.extend(self.model.objects)
-        if hasattr(self.model, 'boxes'):
-            objs.extend(self.model.boxes)
-        for obj in objs:
-            if obj.is_active:
-                sprite = self.get_rendered_sprite(obj, sprite_batch)
-                self.rendered_sprite.append(sprite)
-
-        sprite_batch.draw()
-
-    def draw_display_txt(self, lines, font_sizes):
-        y_padding = self.main_width // 35
-        origin_y = 0.6 * self.height
+            self.place_sprite(ship, self.player_batch, ship_x, ship_y)
+            self.draw_flame(self.to_screen_x(ship_x), self.to_screen_y(ship_y), self.to_screen_x(ship.width))
+            self.player_batch.draw()
+        objects, boxes = self.model.objects, self.model.boxes
+        for obj in objects:  # aliens march in whole steps, so they are not interpolated
+            self.place_sprite(obj, self.sprite_batch)
+        lag = 1 - alpha
+        for box in boxes:  # boxes fall at a constant dx, dy per update
+            self.place_sprite(box, self.sprite_batch, box.x - box.dx * lag, box.y - box.dy * lag)
+        if len(self.sprites) > len(objects) + len(boxes) + 1:  # something died, or the level changed
+            self.release_sprites({ship, *objects, *boxes})
+        self.sprite_batch.draw()
+
+    def draw_display_txt(self, lines, font_sizes, origin_y=None, y_padding=None):
+        y_padding = self.main_width // 35 if y_padding is None else y_padding
+        origin_y = 0.6 * self.height if origin_y is None else origin_y
         y_add = 0
-        txt_batch = Batch()
         for i, line in enumerate(lines):
-            lbl = pyglet.text.Label(
-                line,
-                batch=txt_batch,
-                font_name='8Bit Wonder',
-                font_size=font_sizes[i],
-                width=self.main_width // 4, height=self.header_height * 2,
-                x=self.main_width // 2, y=origin_y - y_add,
-                anchor_x='center', anchor_y='center',
-                color=(255, 255, 255, 255))
+            self.labels.draw(('display', origin_y, i), line, font_sizes[i], self.main_width // 2, origin_y - y_add,
+                             width=self.main_width // 4, height=self.header_height * 2, anchor_x='center',
+                             anchor_y='center')
             y_add += font_sizes[i] + y_padding
-        txt_batch.draw()
 
-    def get_rendered_sprite(self, obj: GameObject, sprite_batch: Batch):
-        if obj.img_name not in self.img_base.keys():
+    def place_sprite(self, obj: GameObject, batch: Batch, x=None, y=None):
+        """Moves obj's pooled sprite to (x, y), obj's own position by default. The sprite is made the first time obj
+        is drawn and rescaled only when obj's image changes, e.g. the player's burnt ship."""
+        entry = self.sprites.get(obj)
+        if entry is None:
+            entry = self.sprites[obj] = [pyglet.sprite.Sprite(img=self.sprite_image(obj), batch=batch), None]
+        sprite = entry[0]
+        if entry[1] != obj.img_name:
+            if entry[1] is not None:
+                sprite.image = self.sprite_image(obj)
+            sprite.update(scale_x=obj.width / self.model.MODEL_WIDTH * self.main_width / sprite.image.width,
+                          scale_y=obj.height / self.model.MODEL_HEIGHT * self.height / sprite.image.height)
+            entry[1] = obj.img_name
+        if sprite.visible != obj.is_active:
+            sprite.visible = obj.is_active
+        x = self.main_width * ((obj.x if x is None else x) / self.model.MODEL_WIDTH)
+        y = self.main_height * ((obj.y if y is None else y) / self.model.MODEL_HEIGHT)
+        if sprite.x != x or sprite.y != y:
+            sprite.set_position(x, y)
+
+    def release_sprites(self, live):
+        """Deletes the sprites of every pooled object not in live, freeing their vertex lists."""
+        for obj in [obj for obj in self.sprites if obj not in live]:
+            self.sprites.pop(obj)[0].delete()
+
+    def sprite_image(self, obj):
+        if obj.img_name not in self.img_base:
             self.render_sprite(obj)
-        sprite = pyglet.sprite.Sprite(img=self.img_base[obj.img_name], batch=sprite_batch)
-        sprite.x = self.main_width * (obj.x / self.model.MODEL_WIDTH)
-        sprite.y = self.main_height * (obj.y / self.model.MODEL_HEIGHT)
-
-        tgt_x = obj.width / self.model.MODEL_WIDTH
-        tgt_y = obj.height / self.model.MODEL_HEIGHT
-        sprite.scale_x = tgt_x * self.main_width / sprite.width
-        sprite.scale_y = tgt_y * self.height / sprite.height
-        return sprite
+        return self.img_base[obj.img_name]
 
     def render_sprites(self):
         for obj in self.Sprites.get_sprite_names():
@@ -396,55 +556,18 @@ class SpaceWindow(GameFrame):
 
     def draw_point_lbls(self):
         pts: FadingPoints
-        font_size = self.main_width // 140
-        pts_batch = Batch()
-        for pts in self.pt_lbls:
-            pts.update()
-            if pts.is_vanished:
-                self.pt_lbls.remove(pts)
-            else:
-                pts_lbl = pyglet.text.Label(pts.txt,
-                                            font_name='8Bit Wonder',
-                                            font_size=font_size,
-                                            width=self.main_width // 10, height=self.header_height // 2,
-                                            x=pts.x, y=pts.y,
-                                            anchor_x='left', anchor_y='top',
-                                            color=(255, 255, 255, pts.alpha),
-                                            batch=pts_batch)
-        pts_batch.draw()
+        for pts in self.pt_lbls:  # each keeps its label while it fades, only position and alpha change
+            self.pt_labels.get(pts, pts.txt, self.pts_txt_size, pts.x, pts.y, width=self.main_width // 10,
+                               height=self.header_height // 2, anchor_y='top', alpha=pts.alpha)
+        if len(self.pt_labels) > len(self.pt_lbls):
+            self.pt_labels.retain(set(self.pt_lbls))
+        self.pt_labels.batch.draw()
 
     def draw_pixel_spills(self):
-        pxl_batch = Batch()
-        for px in self.pixel_spills:
-            px.update(self.tick)
-        self.pixel_spills[:] = [val for val in self.pixel_spills if not val.is_vanished]
-        num_of = 0
-        px_vertices = []
-        colours = []
-        for px in self.pixel_spills:
-            num_of += 4
-            px_vertices.extend((px.x, px.y, px.x, px.y + px.size,
-                                px.x + px.size, px.y + px.size, px.x + px.size, px.y))
-            colours.extend(px.colour)
-        pxl_batch.add(num_of, GL_QUADS, None, ('v2f', px_vertices), ('c3B', colours))
-        pxl_batch.draw()
+        self.pixel_spills.draw()
 
     def draw_falling_parts(self):
-        pxl_batch = Batch()
-        for bl in self.falling_parts:
-            bl.update(self.tick)
-        self.falling_parts[:] = [val for val in self.falling_parts if not val.is_vanished]
-        num_of = 0
-        px_vertices = []
-        colours = []
-        px: FallingBlock
-        for px in self.falling_parts:
-            num_of += 4
-            px_vertices.extend((px.x, px.y, px.x, px.y + px.size,
-                                px.x + px.size, px.y + px.size, px.x + px.size, px.y))
-            colours.extend(px.colour)
-        pxl_batch.add(num_of, GL_QUADS, None, ('v2f', px_vertices), ('c3B', colours))
-        pxl_batch.draw()
+        self.falling_parts.draw()
 
     def draw_flame(self, x, y, width):
         flame_height = (self.main_height + self.main_width) // 90
@@ -453,7 +576,7 @@ class SpaceWindow(GameFrame):
         offset = 15 * width // 64
         padding = 29 * width // 65
 
-        if random.random() < 0.2:
+        if self.rand.random() < 0.2:
             self.reset_flame_colours()
 
         flame_batch = Batch()
@@ -465,25 +588,30 @@ class SpaceWindow(GameFrame):
                             ('c4B', self.flame_colours[i]))
         flame_batch.draw()
 
-    def draw_lasers(self):
+    def draw_lasers(self, alpha=1.0):
         batch = Batch()
         inner_colors = (0, 200, 255, 0, 200, 255)
         radius = 3 * SpaceWindow.BULLET_RADIUS_PERCENT * self.width
-        for bullet in self.model.bullets:
-            # self.draw_illumination(self.to_screen_x(bullet[0]), self.to_screen_y(bullet[1]), radius, inner_colors[:3])
+        lag = 1 - alpha  # bullets move a constant distance per update, so step them back by the part not yet reached
+        laser_lag = lag * self.model.player_bullet_dy
+        for x, y in self.model.bullets:
+            y -= laser_lag
+            # self.draw_illumination(self.to_screen_x(x), self.to_screen_y(y), radius, inner_colors[:3])
             batch.add(2, GL_LINES, None,
-                      ('v2f', [self.to_screen_x(bullet[0]),
-                               self.to_screen_y(bullet[1]),
-                               self.to_screen_x(bullet[0]),
-                               self.to_screen_y(bullet[1] + int(self.BULLET_HEIGHT_PERCENT * self.main_height))]),
+                      ('v2f', [self.to_screen_x(x),
+                               self.to_screen_y(y),
+                               self.to_screen_x(x),
+                               self.to_screen_y(y + int(self.BULLET_HEIGHT_PERCENT * self.main_height))]),
                       ('c3B', inner_colors))
         radius = SpaceWindow.BULLET_RADIUS_PERCENT * self.width
         purple = [255, 0, 255]
+        bomb_lag = lag * self.model.alien_bullet_dy
         for x, y in self.model.alien_bullets:
+            y += bomb_lag
             self.draw_illumination(self.to_screen_x(x), self.to_screen_y(y), 6 * radius, purple)
             circ_pts = [self.to_screen_x(x), self.to_screen_y(y) + radius]
             for theta in np.linspace(0, 2 * math.pi, 8):
-                error = random.randint(-1 * radius // 4, radius // 4)
+                error = self.rand.randint(-1 * radius // 4, radius // 4)
                 circ_pts.extend([circ_pts[0] + (radius + error) * math.sin(theta),
                                  circ_pts[1] + (radius + error) * math.cos(theta)])
             num_of_vert = (len(circ_pts) // 2)
@@ -523,31 +651,17 @@ class SpaceWindow(GameFrame):
                                                      self.main_width, self.main_height]),
                          ('c4B', 2 * (255, 255, 255, complement)))
         header_batch.draw()
-        self.enemies_lbl = pyglet.text.Label("Enemies Remaining: " + ("" if not self.model else str(self.model.aliens)),
-                                             font_name='8Bit Wonder',
-                                             font_size=self.main_width // 65,
-                                             width=self.main_width, height=self.header_height,
-                                             x=self.main_width // 40, y=self.main_height + 0.9 * self.header_height,
-                                             anchor_x='left', anchor_y='top',
-                                             color=(255, 255, 255, complement))
-        self.enemies_lbl.draw()
-        self.score_lbl = pyglet.text.Label("Score: " + ("" if not self.model else str(self.model.points)),
-                                           font_name='8Bit Wonder',
-                                           font_size=self.main_width // 65,
-                                           width=self.main_width, height=self.header_height,
-                                           x=18 * self.main_width // 40, y=self.main_height + 0.9 * self.header_height,
-                                           anchor_x='left', anchor_y='top',
-                                           color=(255, 255, 255, complement))
-        self.score_lbl.draw()
-        self.high_score_lbl = pyglet.text.Label("Highscore: " + ("" if not self.model else str(self.model.highscore)),
-                                                font_name='8Bit Wonder',
-                                                font_size=self.main_width // 65,
-                                                width=self.main_width, height=self.header_height,
-                                                x=28 * self.main_width // 40,
-                                                y=self.main_height + 0.9 * self.header_height,
-                                                anchor_x='left', anchor_y='top',
-                                                color=(255, 255, 255, complement))
-        self.high_score_lbl.draw()
+        model, y = self.model, self.main_height + 0.9 * self.header_height
+        # The model keeps the high score it was built with; the adapter's shows once its first read lands.
+        high_score = "" if not model else str(max(model.highscore, self.db_adapter.get_high_score()))
+        for key, text, x in (('enemies', "Enemies Remaining: " + ("" if not model else str(model.aliens)),
+                              self.main_width // 40),
+                             ('score', "Score: " + ("" if not model else str(model.points)),
+                              18 * self.main_width // 40),
+                             ('highscore', "Highscore: " + high_score,
+                              28 * self.main_width // 40)):
+            self.labels.draw(key, text, self.header_txt_size, x, y, width=self.main_width, height=self.header_height,
+                             anchor_y='top', alpha=complement)
 
     def play_main_menu_music(self):
         if self.main_menu_song is None:
@@ -560,11 +674,14 @@ class SpaceWindow(GameFrame):
         return ["CONTINUE", "RETRY", "EXIT"]
 
     def clear_pts_and_restart(self):
+        self.stats = RunStats(dt=self.STEP_DT)
         self.model.points = 0
         self.change_scene(self.Scene.RESTART)
 
 
 class AnimatedObject(ABC):
+    __slots__ = ('x', 'y', 'vect', 'is_vanished', 'colour')  # every kill spawns one
+
     def __init__(self, x, y, vect=(0, 0), colour=None):
         self.x = x
         self.y = y
@@ -577,40 +694,12 @@ class AnimatedObject(ABC):
         pass
 
 
-class PixelSpillBlock(AnimatedObject):
-    DEF_COLOUR = (255, 255, 255)
-    BLOOD_COLOUR = (102, 0, 0)
-    FLAME_COLOURS = [(255, 91, 20),
-                     (255, 35, 35),
-                     (255, 162, 85)]
-    MAX_SPEED = 2
-    SIZE_DECAY: float = 0.2
-    TICK_RATE = 1
-    DEF_SIZE = 8
-
-    def __init__(self, x, y, vect, colour=None, speed=1, size=1):
-        super().__init__(x, y, vect, (self.DEF_COLOUR if colour is None else colour))
-        self.speed = self.MAX_SPEED * speed
-        self.size = self.DEF_SIZE
-        self.dx = 1
-        self.size = PixelSpillBlock.DEF_SIZE + size
-
-    def update(self, dt):
-        if dt % self.TICK_RATE != 0:
-            return
-        self.x += math.cos(self.vect) * self.speed
-        self.y += math.sin(self.vect) * self.speed
-        self.size -= self.SIZE_DECAY
-        if self.size <= 0:
-            self.is_vanished = True
-            self.size = 0
-
-
 class FadingPoints(AnimatedObject):
     FADE_DECAY = 0.95
+    __slots__ = ('alpha', 'txt')
 
     def __init__(self, txt, x, y, colour=None):
-        super().__init__(x, y, [0, 0], colour)
+        super().__init__(x, y, (0, 0), colour)
         self.alpha = 255
         self.txt = txt
 
@@ -621,36 +710,68 @@ class FadingPoints(AnimatedObject):
             self.alpha = int(self.alpha * self.FADE_DECAY)
 
 
-class FallingBlock(AnimatedObject):
-    DEF_COLOUR = (255, 255, 255)
-    BLOOD_COLOUR = (102, 0, 0)
-    FLAME_COLOURS = [(255, 91, 20),
-                     (255, 35, 35),
-                     (255, 162, 85)]
-    MAX_SPEED = 3
-    SIZE_DECAY: float = 0.2
-    TICK_RATE = 2
-    DEF_SIZE = 8
-    GRAVITY_CONST = 1
-
-    def __init__(self, x, y, upward_speed, colour=None, size=20):
-        v = [random.randint(-upward_speed // 8, upward_speed // 8), random.random() * upward_speed]
-        super().__init__(x, y, v, (self.DEF_COLOUR if colour is None else colour))
-        self.size = size
-        self.is_vanished = False
-
-    def update(self, dt):
-        if dt % self.TICK_RATE != 0:
-            return
-        if self.y < 0:
-            self.is_vanished = True
-        self.y += self.vect[1]
-        self.vect[1] -= self.GRAVITY_CONST
-        self.x += self.vect[0]
+class StarLayer:
+    __slots__ = ('speed', 'offset', 'vertices', 'colours', 'vertex_list')
+
+    def __init__(self, speed, vertices, colours):
+        self.speed = speed  # scroll per unit of StarField.scroll distance
+        self.offset = 0.0  # how far the layer has scrolled, modulo the field's width
+        self.vertices = vertices
+        self.colours = colours
+        self.vertex_list = None
+
+
+class StarField:
+    """Stars scrolling right in parallax layers. A layer's quads are generated once with NumPy and uploaded once
+    into a static vertex list, then scrolling only moves the layer's offset. draw() translates each layer by its
+    offset and again by offset - width, so a star carried off the right edge comes back in on the left with no
+    vertex touched, and a frame costs two draw calls per layer however many stars there are."""
+
+    def __init__(self, width, height, layers, rand=random):
+        """layers are (star count, star size, speed, brightness 0-255), farthest first."""
+        self.width = width
+        self.layers = []
+        numbers = np.random.RandomState(rand.getrandbits(32))
+        for count, size, speed, brightness in layers:
+            xy = np.floor(numbers.random_sample((count, 1, 2)) * (width - size, height - size))
+            corners = np.array([[0, 0], [size, 0], [size, size], [0, size]])
+            vertices = (xy + corners).astype(np.float32).ravel()
+            self.layers.append(StarLayer(speed, vertices, np.full(len(vertices) // 2 * 3, brightness, np.uint8)))
+
+    def __len__(self):
+        return sum(len(layer.vertices) // 8 for layer in self.layers)
+
+    def scroll(self, distance):
+        for layer in self.layers:
+            layer.offset = (layer.offset + distance * layer.speed) % self.width
+
+    def draw(self):
+        for layer in self.layers:
+            if layer.vertex_list is None:  # needs the GL context, so made on the first draw
+                layer.vertex_list = pyglet.graphics.vertex_list(len(layer.vertices) // 2,
+                                                                ('v2f/static', layer.vertices.tolist()),
+                                                                ('c3B/static', layer.colours.tolist()))
+            for shift in (layer.offset, layer.offset - self.width):
+                pyglet.gl.glPushMatrix()
+                pyglet.gl.glTranslatef(shift, 0, 0)
+                layer.vertex_list.draw(GL_QUADS)
+                pyglet.gl.glPopMatrix()
+
+    def delete(self):
+        for layer in self.layers:
+            if layer.vertex_list is not None:
+                layer.vertex_list.delete()
+                layer.vertex_list = None
 
 
 if __name__ == '__main__':
-    window = SpaceWindow(True if len(sys.argv) > 1 and str(sys.argv[1]).lower() == "true" else False)
-    delta = 1.0 / 60
-    pyglet.clock.schedule_interval(window.update, delta)
+    record = sys.argv[sys.argv.index('--record') + 1] if '--record' in sys.argv[:-1] else None  # replay.py plays it
+    profile_csv = sys.argv[sys.argv.index('--profile-csv') + 1] if '--profile-csv' in sys.argv[:-1] else None
+    swarm = Swarm.from_spec(sys.argv[sys.argv.index('--swarm') + 1]) if '--swarm' in sys.argv[:-1] else None
+    log_file = sys.argv[sys.argv.index('--log-file') + 1] if '--log-file' in sys.argv[:-1] else None
+    if swarm is not None:
+        record = None  # swarm games are not recordable
+    window = SpaceWindow(True if len(sys.argv) > 1 and str(sys.argv[1]).lower() == "true" else False, record,
+                         profile_csv, swarm, log_file)
+    pyglet.clock.schedule(window.on_frame)
     pyglet.app.run()